@@ -0,0 +1,58 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+
+# === Параллельные агрегаты для асинхронных страниц ===
+# Асинхронный ORM Django выполняет запросы по очереди в одном потоке,
+# поэтому независимые агрегаты запускаются в ограниченном пуле потоков:
+# у каждого потока своё соединение, и SQLite (в режиме WAL) или другая
+# база отвечают на них одновременно. Если соединение запроса находится в
+# транзакции (ATOMIC_REQUESTS, тесты), агрегаты выполняются по очереди на
+# нём самом — иначе они не увидели бы незакоммиченные данные.
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.HOTEL_AGGREGATE_WORKERS or 1,
+            thread_name_prefix='hotel-aggregates',
+        )
+    return _executor
+
+
+def run_in_pool_thread(task):
+    try:
+        return task()
+    finally:
+        # Как в конце запроса: соединение потока живёт не дольше CONN_MAX_AGE
+        close_old_connections()
+
+
+def run_in_order(tasks):
+    return {name: task() for name, task in tasks.items()}
+
+
+async def gather_aggregates(tasks):
+    # tasks: имя -> функция без аргументов, выполняющая один запрос
+    if not settings.HOTEL_AGGREGATE_WORKERS or await sync_to_async(
+        lambda: connection.in_atomic_block
+    )():
+        return await sync_to_async(run_in_order)(tasks)
+    loop = asyncio.get_running_loop()
+    # Каждой задаче — своя копия контекста (выбор реплики и т. п.)
+    results = await asyncio.gather(*(
+        loop.run_in_executor(
+            get_executor(), functools.partial(contextvars.copy_context().run, run_in_pool_thread, task),
+        )
+        for task in tasks.values()
+    ))
+    return dict(zip(tasks, results))
@@ -0,0 +1,119 @@
+import hashlib
+
+from django.db.models import F
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .exports import ExportFilters
+from .fields import choice_value
+from .pagecache import model_versions
+from .pagination import KeysetPaginationMixin
+
+
+# === JSON API только для чтения ===
+# Для планшетов и табло, которые опрашивают состояние каждые несколько
+# секунд. Ответ несёт ETag; повторный запрос с If-None-Match получает
+# 304 без тела. Валидатор считается до основной выборки и дешевле её:
+# для номеров и платежей — версии моделей из кэша (их поднимают сигналы),
+# для броней — максимальный updated_at и число строк под фильтром.
+#
+# Параметры: fields=a,b — выбор полей; building, status, date_from,
+# date_to — фильтры; limit — размер страницы; after/before — курсор.
+# Статусы в ответе — числовые коды IntegerChoices моделей.
+
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+
+
+class ApiError(ValueError):
+    pass
+
+
+class ApiListView(KeysetPaginationMixin):
+    # Имя поля в ответе -> путь для values()
+    fields = {}
+    date_field = None
+    building_field = None
+    status_field = 'status'
+    # IntegerChoices статуса: фильтр принимает код или подпись
+    status_choices = None
+    # Модели, версии которых входят в ETag: все, чьи поля попадают в ответ
+    version_models = ()
+
+    def get_queryset(self):
+        return self.model.objects.all()
+
+    def get_validators(self, queryset):
+        # Части ETag и время последнего изменения (или None)
+        return model_versions(self.version_models), None
+
+    def get_selected_fields(self):
+        requested = self.request.GET.get('fields', '')
+        if not requested:
+            return list(self.fields)
+        selected = [name.strip() for name in requested.split(',') if name.strip()]
+        unknown = [name for name in selected if name not in self.fields]
+        if unknown:
+            raise ApiError(f"Неизвестные поля: {', '.join(unknown)}")
+        return selected
+
+    def get_limit(self):
+        limit = self.request.GET.get('limit', '')
+        if not limit:
+            return API_PAGE_SIZE
+        if not limit.isdigit() or not 1 <= int(limit) <= API_MAX_PAGE_SIZE:
+            raise ApiError(f'limit должен быть от 1 до {API_MAX_PAGE_SIZE}')
+        return int(limit)
+
+    def filter_queryset(self, queryset):
+        try:
+            filters = ExportFilters.from_request(self.request)
+        except ValueError:
+            raise ApiError('Даты указываются как ГГГГ-ММ-ДД, building — числом')
+        queryset = filters.apply(queryset, self.date_field, self.building_field)
+        status = self.request.GET.get('status', '')
+        if status:
+            try:
+                status = choice_value(self.status_choices, status)
+            except ValueError:
+                raise ApiError(f'Неизвестный статус: {status}')
+            queryset = queryset.filter(**{self.status_field: status})
+        return queryset
+
+    def get_values(self, queryset, selected):
+        # Поля ключа нужны для курсора, даже если клиент их не запросил
+        names = list(dict.fromkeys([*selected, *self.keyset_fields]))
+        plain = [name for name in names if self.fields.get(name, name) == name]
+        renamed = {name: F(self.fields[name]) for name in names if name not in plain}
+        return queryset.values(*plain, **renamed)
+
+    def get(self, request, *args, **kwargs):
+        try:
+            selected = self.get_selected_fields()
+            limit = self.get_limit()
+            queryset = self.filter_queryset(self.get_queryset())
+        except ApiError as error:
+            return JsonResponse({'status': 'error', 'message': str(error)}, status=400)
+
+        parts, last_modified = self.get_validators(queryset)
+        digest = hashlib.sha256(
+            '|'.join(map(str, [type(self).__name__, request.get_full_path(), *parts])).encode()
+        ).hexdigest()
+        etag = quote_etag(digest[:32])
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            _, page, rows, _ = self.paginate_queryset(self.get_values(queryset, selected), limit)
+            response = JsonResponse({
+                'results': [{name: row[name] for name in selected} for row in rows],
+                'next': page.next_cursor,
+                'previous': page.previous_cursor,
+            })
+        response.headers['ETag'] = etag
+        if timestamp is not None:
+            response.headers['Last-Modified'] = http_date(timestamp)
+        # Клиент может хранить ответ, но перед использованием обязан спросить сервер
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class HotelConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'hotel'
+
+    def ready(self):
+        # регистрация обработчиков сигналов
+        import hotel.signals
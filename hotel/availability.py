@@ -0,0 +1,46 @@
+from django.db.models import Exists, OuterRef
+
+from .models import Room, RoomNight
+
+
+# === Поиск свободных номеров ===
+def find_available_rooms(checkin_date, checkout_date, building=None, room_type=None):
+    # Один запрос на любое количество номеров: занятость проверяется
+    # коррелированным NOT EXISTS по индексу (номер, ночь).
+    busy = RoomNight.objects.filter(
+        room=OuterRef('pk'),
+        night__gte=checkin_date,
+        night__lt=checkout_date,
+    )
+    rooms = Room.objects.filter(status=Room.Status.FREE).filter(~Exists(busy))
+    if building:
+        rooms = rooms.filter(building=building)
+    if room_type:
+        rooms = rooms.filter(room_type=room_type)
+    return rooms.values(
+        'id', 'room_number',
+        'building_id', 'building__name',
+        'room_type_id', 'room_type__name', 'room_type__price_per_night',
+    ).order_by('building__name', 'building_id', 'room_type__name', 'room_type_id', 'room_number')
+
+
+def group_available_rooms(rows, nights):
+    buildings = []
+    building = room_type = None
+    for row in rows:
+        if building is None or building['id'] != row['building_id']:
+            building = {'id': row['building_id'], 'name': row['building__name'], 'room_types': []}
+            buildings.append(building)
+            room_type = None
+        if room_type is None or room_type['id'] != row['room_type_id']:
+            price = row['room_type__price_per_night']
+            room_type = {
+                'id': row['room_type_id'],
+                'name': row['room_type__name'],
+                'price_per_night': str(price),
+                'total_price': str(price * nights),
+                'rooms': [],
+            }
+            building['room_types'].append(room_type)
+        room_type['rooms'].append({'id': row['id'], 'room_number': row['room_number']})
+    return buildings
@@ -0,0 +1,146 @@
+import datetime
+import os
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.core.management import call_command
+from django.db import connection, connections, reset_queries
+from django.test.utils import CaptureQueriesContext
+
+
+# === Вспомогательные функции для бенчмарков ===
+@contextmanager
+def scratch_database():
+    # Бенчмарки работают на временной копии схемы, рабочая база не трогается
+    default = connections['default']
+    if default.vendor != 'sqlite':
+        raise RuntimeError('Бенчмарки рассчитаны на SQLite')
+    connections.close_all()
+    original_name = default.settings_dict['NAME']
+    fd, path = tempfile.mkstemp(prefix='hotel-bench-', suffix='.sqlite3')
+    os.close(fd)
+    default.settings_dict['NAME'] = path
+    try:
+        call_command('migrate', verbosity=0, interactive=False)
+        yield path
+    finally:
+        connections.close_all()
+        default.settings_dict['NAME'] = original_name
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(func, repeat=20, warmup=1):
+    for _ in range(warmup):
+        func()
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'mean_ms': statistics.fmean(timings),
+        'p50_ms': percentile(timings, 50),
+        'p95_ms': percentile(timings, 95),
+        'queries': len(queries),
+    }
+
+
+def seed_sample_data(count, tag='S'):
+    # Небольшой набор связанных данных: по гостинице с номером, клиентом,
+    # бронью, проживанием и заказами на каждый шаг. Разные tag дают
+    # непересекающиеся наборы (общий и для тестов, и для бенчмарков)
+    from decimal import Decimal
+
+    from django.utils import timezone
+
+    from .models import (
+        Accommodation, Address, Booking, Building, BuildingProducts, BuildingServices, Client,
+        Employee, Payment, Position, Product, ProductOrder, Room, RoomType, Service, ServiceOrder,
+    )
+
+    address = Address.objects.create(city='Москва', street=f'Тверская {tag}', house='1')
+    position = Position.objects.create(name=f'Администратор {tag}')
+    product = Product.objects.create(name=f'Вода {tag}', description='0,5 л', price=Decimal('150.00'))
+    service = Service.objects.create(name=f'Уборка {tag}', description='', price=Decimal('500.00'))
+    room_type = RoomType.objects.create(name=f'Стандарт {tag}', price_per_night=Decimal('3000.00'))
+    today = timezone.localdate()
+    for n in range(count):
+        building = Building.objects.create(name=f'Корпус {tag}-{n}', description='', capacity=50, address=address)
+        BuildingProducts.objects.create(product=product, building=building, is_available=True, quantity=100)
+        BuildingServices.objects.create(service=service, building=building)
+        employee = Employee.objects.create(
+            first_name='Анна', last_name=f'Петрова {tag}-{n}', middle_name='Сергеевна',
+            phone=f'+7 (901) {tag}-{n:04d}', building=building,
+        )
+        employee.positions.add(position)
+        room = Room.objects.create(room_type=room_type, building=building, room_number=str(n))
+        client = Client.objects.create(
+            first_name='Пётр', last_name=f'Сидоров {tag}-{n}', middle_name='Ильич',
+            phone=f'+7 (902) {tag}-{n:04d}', email=f'{tag}-{n}@example.com', passport_data=f'{tag} {n:06d}',
+        )
+        checkin = today + datetime.timedelta(days=n)
+        booking = Booking.objects.create(
+            client=client, room=room, status=Booking.Status.CONFIRMED,
+            checkin_date=checkin, checkout_date=checkin + datetime.timedelta(days=2),
+        )
+        # Возврат не меняет статус брони: она остаётся подтверждённой и в должниках
+        Payment.objects.create(
+            booking=booking, amount=Decimal('1000.00'), payment_method=Payment.Method.CARD,
+            status=Payment.Status.REFUND,
+        )
+        accommodation = Accommodation.objects.create(booking=booking, actual_checkin_date=checkin)
+        ProductOrder.objects.create(accommodation=accommodation, product=product, quantity=2)
+        ServiceOrder.objects.create(accommodation=accommodation, service=service)
+
+
+def seed_booking_history(count, seed=18):
+    # Год истории броней поверх seed_sample_data: случайные статусы, каждая
+    # третья бронь с проживанием, каждая вторая — с платежом; сводка по
+    # дням пересчитывается в конце
+    import random
+    from decimal import Decimal
+
+    from django.utils import timezone
+
+    from .models import Accommodation, Booking, Client, DailyStat, Payment, Room
+
+    seed_sample_data(20)
+    rng = random.Random(seed)
+    room_ids = list(Room.objects.values_list('pk', flat=True))
+    client_ids = list(Client.objects.values_list('pk', flat=True))
+    today = timezone.localdate()
+    for offset in range(0, count, 10_000):
+        bookings = []
+        for _ in range(min(10_000, count - offset)):
+            checkin = today + datetime.timedelta(days=rng.randint(-365, 60))
+            total_price = Decimal(rng.randint(2000_00, 20000_00)).scaleb(-2)
+            bookings.append(Booking(
+                client_id=rng.choice(client_ids), room_id=rng.choice(room_ids),
+                status=rng.choice(Booking.Status.values),
+                checkin_date=checkin, checkout_date=checkin + datetime.timedelta(days=rng.randint(1, 7)),
+                total_price=total_price, charges=total_price, outstanding=total_price,
+            ))
+        Booking.objects.bulk_create(bookings)
+        Accommodation.objects.bulk_create(
+            Accommodation(booking=booking, actual_checkin_date=booking.checkin_date)
+            for booking in bookings[::3]
+        )
+        Payment.objects.bulk_create(
+            Payment(booking=booking, amount=booking.total_price, payment_method=rng.choice(Payment.Method.values),
+                    payment_date=booking.checkin_date)
+            for booking in bookings[::2]
+        )
+    DailyStat.objects.rebuild()
@@ -0,0 +1,281 @@
+import datetime
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import threading
+import time
+
+from contextlib import contextmanager
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import Client as TestClient, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .bench import percentile
+from .forms import BookingForm
+from .models import Accommodation, Booking, Client, Room
+from .reservations import save_booking
+from .seeding import FUTURE_DAYS
+
+
+# === Набор бенчмарков горячих путей ===
+# Каждый случай — функция, которая готовит входные данные на засеянной
+# базе и возвращает (операция, входы). Первый вход — прогрев: на нём
+# считаются запросы, остальные замеряются. Операции, меняющие данные
+# (заселение, выезд, создание брони), получают каждый раз новую бронь.
+# Страницы запрашиваются через тестовый клиент со всеми middleware;
+# кэш очищается перед каждым запросом, чтобы замерялась сама страница,
+# а не попадание в кэш.
+#
+# Замер идёт с настройками SQLite из профиля production (WAL,
+# synchronous=NORMAL): коммит без fsync, иначе время записи определяет
+# диск, а не код, и разброс между прогонами доходит до двух раз.
+#
+# Результат сравнивается с базовым прогоном: регрессия — p50 медленнее
+# больше чем на порог или больше запросов на операцию. Время зависит от
+# машины, поэтому базовый файл обновляется на той же машине, где
+# проверяются изменения.
+
+BENCH_USERNAME = 'bench'
+DEFAULT_THRESHOLD = 0.3
+AVAILABILITY_BATCH = 20
+
+
+def room_is_available(context, count):
+    # Операция — проверка 20 свободных номеров на случайные даты: одна
+    # проверка короче миллисекунды, и её замер тонет в шуме таймера
+    rng = random.Random(1)
+    rooms = list(Room.objects.filter(status=Room.Status.FREE).order_by('pk'))
+    inputs = []
+    for _ in range(count):
+        checks = []
+        for _ in range(AVAILABILITY_BATCH):
+            checkin = context['today'] + datetime.timedelta(days=rng.randint(-30, FUTURE_DAYS))
+            checks.append((rng.choice(rooms), checkin, checkin + datetime.timedelta(days=rng.randint(1, 7))))
+        inputs.append(checks)
+
+    def check(checks):
+        for room, checkin, checkout in checks:
+            room.is_available(checkin, checkout)
+    return check, inputs
+
+
+def booking_form(context, count):
+    # Проверка формы и сохранение, как в BookingCreateView; брони —
+    # за горизонтом засеянных, каждая в своём интервале
+    rooms = list(Room.objects.filter(status=Room.Status.FREE).order_by('pk').values_list('pk', flat=True))
+    clients = list(Client.objects.order_by('pk').values_list('pk', flat=True)[:count])
+    first = context['today'] + datetime.timedelta(days=FUTURE_DAYS + 30)
+    inputs = []
+    for n in range(count):
+        checkin = first + datetime.timedelta(days=3 * (n // len(rooms)))
+        inputs.append({
+            'client': clients[n % len(clients)], 'room': rooms[n % len(rooms)],
+            'checkin_date': checkin, 'checkout_date': checkin + datetime.timedelta(days=2),
+        })
+
+    def submit(data):
+        form = BookingForm(data=data)
+        if not form.is_valid():
+            raise RuntimeError(form.errors.as_text())
+        save_booking(form.instance)
+    return submit, inputs
+
+
+def post_page(context, name, pks):
+    def post(pk):
+        response = context['client'].post(reverse(name, args=[pk]))
+        if response.status_code != 302:
+            raise RuntimeError(f'{name}: {response.status_code}')
+    return post, pks
+
+
+def checkin_view(context, count):
+    pks = Booking.objects.filter(status=Booking.Status.CONFIRMED).order_by('pk').values_list('pk', flat=True)
+    return post_page(context, 'booking_checkin', list(pks[:count]))
+
+
+def checkout_view(context, count):
+    pks = Accommodation.objects.filter(status=Accommodation.Status.STAYING).order_by('pk').values_list(
+        'booking_id', flat=True,
+    )
+    return post_page(context, 'booking_checkout', list(pks[:count]))
+
+
+def get_page(context, name, params_list):
+    url = reverse(name)
+
+    def get(params):
+        cache.clear()
+        response = context['client'].get(url, params)
+        if response.status_code != 200:
+            raise RuntimeError(f'{name}: {response.status_code}')
+    return get, params_list
+
+
+def dashboard_view(context, count):
+    return get_page(context, 'dashboard', [{}] * count)
+
+
+def analytics_view(context, count):
+    return get_page(context, 'analytics', [{}] * count)
+
+
+def inventory_orders_view(context, count):
+    return get_page(context, 'inventory_orders', [{}] * count)
+
+
+def client_search(context, count):
+    # Фамилия, хвост телефона и e-mail случайных клиентов
+    rng = random.Random(2)
+    clients = list(Client.objects.order_by('pk').values_list('last_name', 'phone', 'email')[:1000])
+    queries = []
+    for _ in range(count):
+        last_name, phone, email = rng.choice(clients)
+        queries.append({'q': rng.choice([last_name, phone[-5:].replace('-', ''), email])})
+    return get_page(context, 'client_list', queries)
+
+
+CASES = {
+    'room_is_available': room_is_available,
+    'booking_form': booking_form,
+    'checkin_view': checkin_view,
+    'checkout_view': checkout_view,
+    'dashboard_view': dashboard_view,
+    'analytics_view': analytics_view,
+    'inventory_orders_view': inventory_orders_view,
+    'client_search': client_search,
+}
+
+
+class QueryCounter:
+    # Запросы всех соединений, включая потоки параллельных агрегатов.
+    # CaptureQueriesContext не подходит: тестовый клиент в начале каждого
+    # запроса очищает connection.queries
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def attach(self, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+def time_case(operation, inputs, counter):
+    # Возвращает число запросов прогревочного вызова и время остальных, мс
+    if len(inputs) < 2:
+        raise RuntimeError('Недостаточно данных для замера: засейте базу побольше')
+    counter.count = 0
+    operation(inputs[0])
+    queries = counter.count
+    timings = []
+    for value in inputs[1:]:
+        started = time.perf_counter()
+        operation(value)
+        timings.append((time.perf_counter() - started) * 1000)
+    return queries, timings
+
+
+def summarize(timings, queries):
+    return {
+        'ops': len(timings),
+        'ops_per_s': round(len(timings) / (sum(timings) / 1000), 1),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'queries': queries,
+    }
+
+
+@contextmanager
+def production_pragmas():
+    connections.close_all()
+    options = connection.settings_dict['OPTIONS']
+    connection.settings_dict['OPTIONS'] = {**options, 'init_command': settings.SQLITE_PRODUCTION_PRAGMAS}
+    try:
+        yield
+    finally:
+        connections.close_all()
+        connection.settings_dict['OPTIONS'] = options
+
+
+def checkpoint():
+    # Каждый случай начинается с пустого WAL: записи предыдущих случаев
+    # не замедляют чтение. Внутри транзакции (в тестах) сбросить WAL нельзя
+    if not connection.in_atomic_block:
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+def run_suite(names, repeat, rounds=1):
+    # Запускается на уже засеянной базе; тестовый клиент ходит на testserver.
+    # Случаи чередуются по кругам, замеры кругов объединяются: короткий
+    # всплеск нагрузки на машине не ложится целиком на один случай
+    user = User.objects.filter(username=BENCH_USERNAME).first() or User.objects.create_user(BENCH_USERNAME)
+    client = TestClient()
+    client.force_login(user)
+    context = {'client': client, 'today': timezone.localdate()}
+    counter = QueryCounter()
+    counter.attach(connection)
+    connection_created.connect(counter.attach)
+    queries = {}
+    timings = {name: [] for name in names}
+    try:
+        for _ in range(rounds):
+            for name in names:
+                checkpoint()
+                operation, inputs = CASES[name](context, repeat + 1)
+                queries[name], samples = time_case(operation, list(inputs), counter)
+                timings[name].extend(samples)
+    finally:
+        connection_created.disconnect(counter.attach)
+        connection.execute_wrappers.remove(counter)
+    return {name: summarize(timings[name], queries[name]) for name in names}
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'machine': platform.machine(),
+    }
+
+
+def compare(results, baseline, threshold):
+    # Строки (случай, базовый p50, p50, изменение, базовые запросы, запросы, регрессия)
+    rows = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            rows.append((name, None, current['p50_ms'], None, None, current['queries'], False))
+            continue
+        change = current['p50_ms'] / base['p50_ms'] - 1
+        regressed = change > threshold or current['queries'] > base['queries']
+        rows.append((name, base['p50_ms'], current['p50_ms'], change, base['queries'], current['queries'], regressed))
+    return rows
+
+
+def load_report(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_report(path, report):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write('\n')
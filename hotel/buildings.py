@@ -0,0 +1,112 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.functional import SimpleLazyObject, cached_property
+
+from .models import Building, BuildingProducts, BuildingServices, Room
+
+
+# === Текущая гостиница ===
+# Гостиница выбирается один раз на запрос: из сессии (её записывает
+# BuildingSelectView), иначе первая по id. Список гостиниц и справочники
+# каждой гостиницы (товары, услуги, номера) лежат в кэше между запросами
+# и сбрасываются сигналами при изменении.
+
+BUILDING_SESSION_KEY = 'active_building_id'
+BUILDINGS_CACHE_KEY = 'buildings:list'
+BUILDING_REFERENCE_CACHE_KEY = 'buildings:{}:{}'
+REFERENCE_KINDS = ('products', 'services', 'rooms')
+BUILDING_CACHE_TIMEOUT = 60 * 60
+
+
+def get_buildings():
+    buildings = cache.get(BUILDINGS_CACHE_KEY)
+    if buildings is None:
+        buildings = list(Building.objects.order_by('pk').values_list('pk', 'name'))
+        cache.set(BUILDINGS_CACHE_KEY, buildings, BUILDING_CACHE_TIMEOUT)
+    return buildings
+
+
+def load_reference(building_id, kind):
+    if kind == 'products':
+        # product_id -> отмечен ли товар «в наличии»
+        return dict(BuildingProducts.objects.filter(building_id=building_id).values_list('product_id', 'is_available'))
+    if kind == 'services':
+        # service_id -> активна ли услуга
+        return dict(BuildingServices.objects.filter(building_id=building_id).values_list('service_id', 'is_active'))
+    return list(Room.objects.filter(building_id=building_id).order_by('room_number').values_list('pk', 'room_number'))
+
+
+class ActiveBuilding:
+    def __init__(self, pk, name=''):
+        self.pk = self.id = pk
+        self.name = name
+
+    def __str__(self):
+        return self.name
+
+    def __bool__(self):
+        return self.pk is not None
+
+    def reference(self, kind):
+        # Каждый справочник кэшируется отдельно: странице товаров
+        # не нужно читать номера и услуги
+        key = BUILDING_REFERENCE_CACHE_KEY.format(self.pk, kind)
+        data = cache.get(key)
+        if data is None:
+            data = load_reference(self.pk, kind)
+            cache.set(key, data, BUILDING_CACHE_TIMEOUT)
+        return data
+
+    @cached_property
+    def products(self):
+        return self.reference('products')
+
+    @cached_property
+    def services(self):
+        return self.reference('services')
+
+    @cached_property
+    def rooms(self):
+        return self.reference('rooms')
+
+
+def resolve_building(request):
+    names = dict(get_buildings())
+    pk = request.session.get(BUILDING_SESSION_KEY)
+    if pk not in names:
+        pk = min(names, default=None)
+    return ActiveBuilding(pk, names.get(pk, ''))
+
+
+def invalidate_building_list():
+    transaction.on_commit(lambda: cache.delete(BUILDINGS_CACHE_KEY))
+
+
+def invalidate_building_reference(building_id, kinds=REFERENCE_KINDS):
+    keys = [BUILDING_REFERENCE_CACHE_KEY.format(building_id, kind) for kind in kinds]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class ActiveBuildingMiddleware:
+    # Ставится после SessionMiddleware; гостиница определяется лениво,
+    # страницы без неё не делают лишних обращений к кэшу
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        # В асинхронной цепочке вернётся корутина get_response
+        request.building = SimpleLazyObject(lambda: resolve_building(request))
+        return self.get_response(request)
+
+
+def active_building(request):
+    return {
+        'active_building': getattr(request, 'building', None),
+        'buildings': get_buildings,
+    }
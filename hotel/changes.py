@@ -0,0 +1,205 @@
+import asyncio
+import contextvars
+import json
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max, Subquery
+
+from .models import Accommodation, Booking, ChangeEvent, Room
+
+
+# === Лента изменений ===
+# Смена статуса номера, брони или проживания пишется в ChangeEvent, а
+# после коммита номер последнего события кладётся в кэш. Ожидающие
+# клиенты не ходят в базу: в каждом процессе один опрашивающий цикл
+# читает этот ключ и будит всех подписчиков, только тогда они читают
+# новые события. При нескольких процессах кэш должен быть общим
+# (HOTEL_CACHE_DIR). Номера событий на SQLite идут в порядке коммита —
+# запись в базу в каждый момент одна.
+
+CHANGES_LAST_SEQ_KEY = 'changes:last_seq'
+CHANGES_POLL_INTERVAL = 0.5
+CHANGES_BATCH_SIZE = 500
+CHANGES_MAX_WAIT = 30
+CHANGES_STREAM_SECONDS = 300
+CHANGES_HEARTBEAT = 15
+EVENT_FIELDS = ('seq', 'created_at', 'model', 'object_id', 'building_id', 'old_status', 'new_status')
+
+MODEL_NAMES = {Room: 'room', Booking: 'booking', Accommodation: 'accommodation'}
+
+
+def building_of(instance):
+    # Гостиница события. Если номер не загружен, она подставляется
+    # подзапросом в сам INSERT — без отдельного чтения номера и брони
+    if isinstance(instance, Room):
+        return instance.building_id
+    booking = instance
+    if isinstance(instance, Accommodation):
+        if not Accommodation.booking.is_cached(instance):
+            return Subquery(Room.objects.filter(bookings=instance.booking_id).values('building_id')[:1])
+        booking = instance.booking
+    if Booking.room.is_cached(booking):
+        return booking.room.building_id
+    return Subquery(Room.objects.filter(pk=booking.room_id).values('building_id')[:1])
+
+
+def status_label(instance, status):
+    # В ленте статусы — подписями: её читают табло, а не запросы
+    return '' if status is None else type(instance).Status(status).label
+
+
+def change_event(instance, old_status, new_status, building_id):
+    return ChangeEvent(
+        model=MODEL_NAMES[type(instance)], object_id=instance.pk, building_id=building_id,
+        old_status=status_label(instance, old_status), new_status=status_label(instance, new_status),
+    )
+
+
+def publish(seq):
+    transaction.on_commit(lambda: cache.set(CHANGES_LAST_SEQ_KEY, seq, None))
+
+
+def record_change(instance, old_status, new_status, building_deleted=False):
+    # Гостиница, удаляемая в той же транзакции, в событие не пишется:
+    # её прежние события она обнуляет сама (SET_NULL), а на эту ссылку
+    # SQLite при коммите отказал бы по внешнему ключу
+    building_id = None if building_deleted else building_of(instance)
+    event = change_event(instance, old_status, new_status, building_id)
+    event.save()
+    publish(event.seq)
+
+
+def record_created(instances, building_ids):
+    # Строки, вставленные bulk_create: post_save для них не приходит,
+    # поэтому события создания пишутся одной пачкой
+    events = ChangeEvent.objects.bulk_create(
+        change_event(instance, None, instance.status, building_id)
+        for instance, building_id in zip(instances, building_ids)
+    )
+    if events:
+        publish(max(event.seq for event in events))
+
+
+def get_last_seq():
+    seq = cache.get(CHANGES_LAST_SEQ_KEY)
+    if seq is None:
+        seq = ChangeEvent.objects.aggregate(last=Max('seq'))['last'] or 0
+        cache.add(CHANGES_LAST_SEQ_KEY, seq, None)
+    return seq
+
+
+def get_events(since, building=None, limit=CHANGES_BATCH_SIZE):
+    # Возвращает события после since и номер, до которого лента просмотрена.
+    # Верхняя граница берётся до выборки: с фильтром по гостинице клиент
+    # продвигается и по чужим событиям, не пропуская свои
+    upto = ChangeEvent.objects.aggregate(last=Max('seq'))['last'] or 0
+    events = ChangeEvent.objects.filter(seq__gt=since, seq__lte=upto)
+    if building:
+        events = events.filter(building_id=building)
+    events = list(events.order_by('seq').values(*EVENT_FIELDS)[:limit])
+    if len(events) == limit:
+        upto = events[-1]['seq']
+    return events, max(upto, since)
+
+
+def parse_feed_params(params, max_timeout, since=None):
+    # since, building и timeout из GET; ValueError — на неверные значения
+    since = params.get('since', '') if since is None else since
+    building = params.get('building', '')
+    if since and not since.isdigit() or building and not building.isdigit():
+        raise ValueError('since')
+    timeout = float(params.get('timeout') or max_timeout)
+    if not 0 <= timeout <= max_timeout:
+        raise ValueError('timeout')
+    return int(since) if since else None, int(building) if building else None, timeout
+
+
+def format_event(event):
+    return (
+        f"id: {event['seq']}\nevent: {event['model']}\n"
+        f"data: {json.dumps(event, cls=DjangoJSONEncoder, ensure_ascii=False)}\n\n"
+    )
+
+
+async def stream_events(since, building, duration):
+    # Поток server-sent events: накопившиеся события, затем новые по мере
+    # появления и комментарий-пинг в паузах. По истечении duration поток
+    # закрывается, клиент переподключается с Last-Event-ID
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + duration
+    notifier = get_notifier()
+    if since is None:
+        since = await sync_to_async(get_last_seq)()
+    yield 'retry: 2000\n\n'
+    while True:
+        events, since = await sync_to_async(get_events)(since, building)
+        for event in events:
+            yield format_event(event)
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return
+        if not await notifier.wait(since, min(remaining, CHANGES_HEARTBEAT)):
+            yield ': ping\n\n'
+
+
+class ChangeNotifier:
+    # Один на цикл событий: asyncio.Event нельзя делить между циклами
+    def __init__(self):
+        self.last_seq = None
+        self.changed = asyncio.Event()
+        self.waiters = 0
+        self.task = None
+
+    async def poll(self):
+        try:
+            while self.waiters:
+                # Не cache.aget: тот идёт в поток запроса (thread_sensitive)
+                # и ждал бы, пока запрос закончит свою синхронную работу
+                seq = await sync_to_async(cache.get, thread_sensitive=False)(CHANGES_LAST_SEQ_KEY)
+                if seq is not None and seq != self.last_seq:
+                    self.last_seq = seq
+                    self.changed.set()
+                    self.changed = asyncio.Event()
+                await asyncio.sleep(CHANGES_POLL_INTERVAL)
+        finally:
+            self.task = None
+
+    async def wait(self, since, timeout):
+        # Ждёт, пока последний номер события станет больше since, не дольше timeout
+        if self.last_seq is None:
+            self.last_seq = await sync_to_async(get_last_seq)()
+        if self.last_seq > since:
+            return True
+        self.waiters += 1
+        loop = asyncio.get_running_loop()
+        if self.task is None:
+            # Опрос переживает запрос, который его запустил: контекст этого
+            # запроса (исполнитель asgiref, флаги middleware) ему не нужен
+            self.task = loop.create_task(self.poll(), context=contextvars.Context())
+        deadline = loop.time() + timeout
+        try:
+            while self.last_seq <= since:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return False
+                try:
+                    await asyncio.wait_for(self.changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    return False
+            return True
+        finally:
+            self.waiters -= 1
+
+
+_notifiers = weakref.WeakKeyDictionary()
+
+
+def get_notifier():
+    loop = asyncio.get_running_loop()
+    if loop not in _notifiers:
+        _notifiers[loop] = ChangeNotifier()
+    return _notifiers[loop]
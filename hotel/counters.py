@@ -0,0 +1,81 @@
+import datetime
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .aggregates import gather_aggregates, run_in_order
+from .models import Accommodation, Booking, Room
+
+
+# === Счётчики панели управления ===
+# Сброс после записи виден только через общий кэш (HOTEL_CACHE_DIR). Кэш в
+# памяти процесса очищается лишь в том воркере, который записал данные,
+# поэтому там счётчики живут недолго: остальные воркеры отстают не больше
+# чем на LOCAL_DASHBOARD_COUNTERS_TIMEOUT секунд, а не на сутки.
+DASHBOARD_COUNTERS_KEY = 'dashboard:counters:{}'
+DASHBOARD_COUNTERS_TIMEOUT = 60 * 60 * 24
+LOCAL_DASHBOARD_COUNTERS_TIMEOUT = 30
+
+
+def dashboard_counters_timeout():
+    if isinstance(caches['default'], LocMemCache):
+        return LOCAL_DASHBOARD_COUNTERS_TIMEOUT
+    return DASHBOARD_COUNTERS_TIMEOUT
+
+
+def dashboard_counter_queries(today):
+    # Запросы независимы друг от друга: асинхронная панель выполняет их параллельно
+    week_ago = today - datetime.timedelta(days=7)
+    # Граница недели — полночь по местному времени: то же, что
+    # created_at__date__gte, но без вызова функции SQLite на каждую строку
+    week_start = timezone.make_aware(datetime.datetime.combine(week_ago, datetime.time.min))
+    return {
+        'active_bookings_count': Booking.objects.filter(
+            status__in=Booking.ACTIVE_STATUSES
+        ).count,
+        'free_rooms_count': Room.objects.filter(status=Room.Status.FREE).count,
+        'checked_in_today_count': Accommodation.objects.filter(
+            actual_checkin_date=today
+        ).count,
+        'weekly_revenue': lambda: Booking.objects.filter(
+            status__in=[Booking.Status.PAID, Booking.Status.COMPLETED],
+            created_at__gte=week_start
+        ).aggregate(total=Sum('total_price'))['total'] or 0,
+        'upcoming_bookings': lambda: list(Booking.objects.filter(
+            status=Booking.Status.CONFIRMED,
+            checkin_date__gte=today
+        ).select_related('client', 'room__room_type').order_by('checkin_date')[:5]),
+    }
+
+
+def compute_dashboard_counters(today):
+    return run_in_order(dashboard_counter_queries(today))
+
+
+def get_dashboard_counters():
+    today = timezone.localdate()
+    key = DASHBOARD_COUNTERS_KEY.format(today.isoformat())
+    counters = cache.get(key)
+    if counters is None:
+        counters = compute_dashboard_counters(today)
+        cache.set(key, counters, dashboard_counters_timeout())
+    return counters
+
+
+async def aget_dashboard_counters():
+    today = timezone.localdate()
+    key = DASHBOARD_COUNTERS_KEY.format(today.isoformat())
+    counters = await cache.aget(key)
+    if counters is None:
+        counters = await gather_aggregates(dashboard_counter_queries(today))
+        await cache.aset(key, counters, dashboard_counters_timeout())
+    return counters
+
+
+def invalidate_dashboard_counters():
+    # Сбрасываем после коммита, чтобы следующий запрос увидел новые данные
+    key = DASHBOARD_COUNTERS_KEY.format(timezone.localdate().isoformat())
+    transaction.on_commit(lambda: cache.delete(key))
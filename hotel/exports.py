@@ -0,0 +1,87 @@
+import csv
+import datetime
+
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+
+
+# === Потоковая выгрузка CSV ===
+# Строки читаются из базы порциями через iterator(chunk_size) и сразу
+# уходят клиенту, поэтому память не растёт с размером выгрузки.
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    # csv.writer пишет строку в "файл", а мы просто возвращаем её наружу
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+class ExportFilters:
+    def __init__(self, date_from=None, date_to=None, building=None):
+        self.date_from = date_from
+        self.date_to = date_to
+        self.building = building
+
+    @classmethod
+    def from_request(cls, request):
+        params = request.GET
+        dates = {}
+        for name in ('date_from', 'date_to'):
+            value = params.get(name, '')
+            dates[name] = datetime.date.fromisoformat(value) if value else None
+        building = params.get('building', '')
+        if building and not building.isdigit():
+            raise ValueError('building')
+        return cls(building=int(building) if building else None, **dates)
+
+    def apply(self, queryset, date_field=None, building_field=None):
+        if date_field and self.date_from:
+            queryset = queryset.filter(**{f'{date_field}__gte': self.date_from})
+        if date_field and self.date_to:
+            queryset = queryset.filter(**{f'{date_field}__lte': self.date_to})
+        if building_field and self.building:
+            queryset = queryset.filter(**{building_field: self.building})
+        return queryset
+
+
+class CSVExportMixin:
+    filename = 'export.csv'
+    # Пары (заголовок столбца, поле для values_list)
+    columns = ()
+    date_field = None
+    building_field = None
+    chunk_size = EXPORT_CHUNK_SIZE
+
+    def get_queryset(self):
+        return self.model.objects.order_by('pk')
+
+    def get_header(self):
+        return [header for header, field in self.columns]
+
+    def iter_values(self, queryset, columns=None):
+        fields = [field for header, field in (columns or self.columns)]
+        return queryset.values_list(*fields).iterator(chunk_size=self.chunk_size)
+
+    def get_rows(self, filters):
+        queryset = filters.apply(self.get_queryset(), self.date_field, self.building_field)
+        return self.iter_values(queryset)
+
+    def get(self, request, *args, **kwargs):
+        try:
+            filters = ExportFilters.from_request(request)
+        except ValueError:
+            return HttpResponseBadRequest('Даты указываются в формате ГГГГ-ММ-ДД, гостиница — числом')
+        response = StreamingHttpResponse(
+            stream_csv(self.get_header(), self.get_rows(filters)),
+            content_type='text/csv; charset=utf-8',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{self.filename}"'
+        return response
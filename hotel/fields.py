@@ -0,0 +1,86 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models import Case, Value, When
+
+
+# === Деньги в копейках ===
+# В базе сумма хранится целым числом копеек (BIGINT): SQLite складывает и
+# сравнивает такие столбцы как целые, без текстовых REAL-преобразований
+# DecimalField. В Python значение остаётся Decimal с двумя знаками, так что
+# формы, шаблоны и арифметика моделей не меняются.
+#
+# Значение в F()-выражении нужно оборачивать в money_value(): без явного
+# output_field Django передаст Decimal в базу как рубли, а не копейки.
+
+KOPECKS = Decimal(100)
+CENTS = Decimal('0.01')
+
+
+class MoneyField(models.BigIntegerField):
+    def __init__(self, *args, max_digits=12, **kwargs):
+        # Разрядность нужна только форме: в базе число копеек без ограничения
+        self.max_digits = max_digits
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.max_digits != 12:
+            kwargs['max_digits'] = self.max_digits
+        return name, path, args, kwargs
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Decimal):
+            return value
+        try:
+            return Decimal(str(value)).quantize(CENTS)
+        except ArithmeticError:
+            raise ValidationError(self.error_messages['invalid'], code='invalid', params={'value': value})
+
+    def get_prep_value(self, value):
+        value = models.Field.get_prep_value(self, value)
+        if value is None:
+            return None
+        return int((self.to_python(value) * KOPECKS).to_integral_value(ROUND_HALF_UP))
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return None
+        return Decimal(int(value)).scaleb(-2)
+
+    def formfield(self, **kwargs):
+        return super().formfield(**{
+            'form_class': forms.DecimalField,
+            'max_digits': self.max_digits,
+            'decimal_places': 2,
+            **kwargs,
+        })
+
+
+def money_value(amount):
+    return Value(amount, output_field=MoneyField())
+
+
+# === Коды статусов ===
+def choice_label(field, choices):
+    # Подпись кода прямо в SQL — для выгрузок, где нет get_*_display
+    return Case(
+        *[When(**{field: value}, then=Value(label)) for value, label in choices.choices],
+        default=Value(''), output_field=models.CharField(),
+    )
+
+
+def choices_matching(choices, query):
+    # Коды, подпись которых содержит строку поиска
+    query = query.lower()
+    return [value for value, label in choices.choices if query in label.lower()]
+
+
+def choice_value(choices, text):
+    # Код по числу или по подписи; ValueError, если такого нет
+    for value, label in choices.choices:
+        if text in (str(value), label):
+            return value
+    raise ValueError(text)
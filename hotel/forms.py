@@ -3,7 +3,7 @@ from django.core.exceptions import ValidationError
 from .models import (
     Address, Client, Booking, Payment, ProductOrder, ServiceOrder,
     BuildingProducts, BuildingServices, Employee, Position, Room,
-    Building, Accommodation
+    Building, Accommodation, Product, Service
 )
 
 
@@ -15,6 +15,9 @@ DEFAULT_DATE_INPUT = {'type': 'date', 'class': 'border rounded p-2 w-full'}
 DEFAULT_CHECKBOX = {'class': 'form-checkbox'}
 DEFAULT_TEXTAREA = {'class': 'border rounded p-2 w-full', 'rows': 4}
 
+# Accommodation.__str__ обращается к клиенту и номеру брони
+ACCOMMODATION_CHOICES_QUERYSET = Accommodation.objects.select_related('booking__client', 'booking__room')
+
 
 # === Клиенты ===
 class ClientForm(forms.ModelForm):
@@ -67,6 +70,10 @@ class BookingForm(forms.ModelForm):
             ),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['room'].queryset = Room.objects.select_related('room_type')
+
     def clean(self):
         cleaned_data = super().clean()
         room = cleaned_data.get('room')
@@ -75,7 +82,9 @@ class BookingForm(forms.ModelForm):
         if room and checkin_date and checkout_date:
             if checkin_date >= checkout_date:
                 raise ValidationError('Дата заезда должна быть раньше даты выезда.')
-            if not room.is_available(checkin_date, checkout_date):
+            # Пересечение с другими бронями проверяет Booking.clean
+            # по индексу занятости, здесь достаточно статуса номера.
+            if room.status != Room.Status.FREE:
                 raise ValidationError('Номер недоступен в указанные даты.')
         return cleaned_data
 
@@ -96,6 +105,10 @@ class PaymentForm(forms.ModelForm):
             'status': forms.Select(attrs=DEFAULT_SELECT),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['booking'].queryset = Booking.objects.select_related('client')
+
     def clean(self):
         cleaned_data = super().clean()
         booking = cleaned_data.get('booking')
@@ -117,6 +130,10 @@ class AccommodationForm(forms.ModelForm):
             'status': forms.Select(attrs=DEFAULT_SELECT),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['booking'].queryset = Booking.objects.select_related('client')
+
 
 # === Номера ===
 class RoomForm(forms.ModelForm):
@@ -142,8 +159,21 @@ class ProductOrderForm(forms.ModelForm):
             'quantity': forms.NumberInput(attrs=DEFAULT_NUMBER_INPUT),
         }
 
+    def __init__(self, *args, building=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['accommodation'].queryset = ACCOMMODATION_CHOICES_QUERYSET
+        if building is not None:
+            # Только гости и товары текущей гостиницы
+            self.fields['accommodation'].queryset = ACCOMMODATION_CHOICES_QUERYSET.filter(booking__room__building=building.pk)
+            self.fields['product'].queryset = Product.objects.filter(pk__in=list(building.products))
+
 
 class BuildingProductsForm(forms.ModelForm):
+    receipt = forms.IntegerField(
+        label='Приход (+) или списание (−)', required=False,
+        widget=forms.NumberInput(attrs=DEFAULT_NUMBER_INPUT),
+    )
+
     class Meta:
         model = BuildingProducts
         fields = ['building', 'product', 'is_available']
@@ -164,6 +194,16 @@ class ServiceOrderForm(forms.ModelForm):
             'service': forms.Select(attrs=DEFAULT_SELECT),
         }
 
+    def __init__(self, *args, building=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['accommodation'].queryset = ACCOMMODATION_CHOICES_QUERYSET
+        if building is not None:
+            # Только гости и активные услуги текущей гостиницы
+            self.fields['accommodation'].queryset = ACCOMMODATION_CHOICES_QUERYSET.filter(booking__room__building=building.pk)
+            self.fields['service'].queryset = Service.objects.filter(
+                pk__in=[pk for pk, is_active in building.services.items() if is_active]
+            )
+
 
 class BuildingServicesForm(forms.ModelForm):
     class Meta:
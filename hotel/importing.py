@@ -0,0 +1,243 @@
+import csv
+import datetime
+import json
+from collections import namedtuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import Max, Min
+
+from .changes import record_created
+from .counters import invalidate_dashboard_counters
+from .fields import choice_value
+from .models import Booking, Building, Client, DailyStat, Room, RoomNight
+from .search import national_digits
+
+
+# === Массовый импорт бронирований ===
+# Файл читается построчно; клиенты и номера ищутся в словарях, собранных
+# заранее одним запросом на таблицу. Пересечения проверяются сортировкой
+# и одним проходом по каждому номеру, вставка — bulk_create порциями,
+# каждая порция в своей транзакции.
+
+IMPORT_BATCH_SIZE = 50000
+IMPORT_CHUNK_SIZE = 1000
+STATUSES = {label for value, label in Booking.Status.choices}
+
+# line — номер строки во входном файле, по нему строится отчёт об ошибках
+Candidate = namedtuple('Candidate', 'line client_id room checkin checkout status')
+RoomInfo = namedtuple('RoomInfo', 'id building_id room_type_id price')
+
+
+def read_records(path):
+    # CSV с заголовком или JSON: массив объектов либо по объекту на строку
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        if path.lower().endswith('.csv'):
+            for line, record in enumerate(csv.DictReader(f), start=2):
+                yield line, record
+            return
+        first = f.read(1)
+        while first.isspace():
+            first = f.read(1)
+        f.seek(0)
+        if first == '[':
+            # Для массива в стандартной библиотеке нет потокового разбора
+            for line, record in enumerate(json.load(f), start=1):
+                yield line, record
+            return
+        for line, text in enumerate(f, start=1):
+            if text.strip():
+                yield line, json.loads(text)
+
+
+class RowError(Exception):
+    pass
+
+
+class BookingImporter:
+    def __init__(self, chunk_size=IMPORT_CHUNK_SIZE, default_status=Booking.Status.CONFIRMED.label, dry_run=False):
+        self.chunk_size = chunk_size
+        self.default_status = default_status
+        self.dry_run = dry_run
+        self.created = 0
+        self.errors = []
+        self.clients = self.load_clients()
+        self.buildings, self.rooms = self.load_rooms()
+
+    # --- Справочники ---
+    def load_clients(self):
+        clients = {}
+        for pk, phone, email, passport in Client.objects.values_list(
+            'pk', 'phone', 'email', 'passport_data'
+        ).iterator(chunk_size=10000):
+            clients[national_digits(phone)] = pk
+            clients[email.casefold()] = pk
+            clients[passport.strip()] = pk
+        return clients
+
+    def load_rooms(self):
+        buildings = {}
+        for pk, name in Building.objects.values_list('pk', 'name'):
+            buildings[str(pk)] = pk
+            buildings.setdefault(name.strip().casefold(), pk)
+        rooms = {
+            (building_id, number.strip()): RoomInfo(pk, building_id, room_type_id, price)
+            for pk, building_id, number, room_type_id, price in Room.objects.values_list(
+                'pk', 'building_id', 'room_number', 'room_type_id', 'room_type__price_per_night'
+            )
+        }
+        return buildings, rooms
+
+    # --- Разбор строк ---
+    def resolve_client(self, value):
+        # Клиент указывается телефоном, e-mail или паспортом
+        if '@' in value:
+            return self.clients.get(value.casefold())
+        return self.clients.get(value) or self.clients.get(national_digits(value))
+
+    def parse(self, line, record):
+        def field(name):
+            value = record.get(name)
+            return '' if value is None else str(value).strip()
+
+        client_id = self.resolve_client(field('client'))
+        if client_id is None:
+            raise RowError('Клиент не найден')
+        building_id = self.buildings.get(field('building').casefold())
+        room = self.rooms.get((building_id, field('room')))
+        if room is None:
+            raise RowError('Номер не найден')
+        try:
+            checkin = datetime.date.fromisoformat(field('checkin_date'))
+            checkout = datetime.date.fromisoformat(field('checkout_date'))
+        except ValueError:
+            raise RowError('Даты указываются в формате ГГГГ-ММ-ДД')
+        if checkin >= checkout:
+            raise RowError('Дата заезда должна быть раньше даты выезда.')
+        status = field('status') or self.default_status
+        try:
+            # В файле статус записан подписью («Подтвержден») или кодом
+            status = choice_value(Booking.Status, str(status))
+        except ValueError:
+            raise RowError(f'Неизвестный статус: {status}')
+        return Candidate(line, client_id, room, checkin, checkout, status)
+
+    def reject(self, line, reason, record=None):
+        self.errors.append((line, reason, json.dumps(record, ensure_ascii=False) if record else ''))
+
+    # --- Проверка пересечений ---
+    def existing_intervals(self, candidates):
+        # Занятые ночи уже сохранённых броней, свёрнутые в интервалы [заезд, выезд)
+        room_ids = {c.room.id for c in candidates}
+        start = min(c.checkin for c in candidates)
+        end = max(c.checkout for c in candidates)
+        intervals = {}
+        rows = RoomNight.objects.filter(night__gte=start, night__lt=end).values_list(
+            'room_id', 'booking_id'
+        ).annotate(first=Min('night'), last=Max('night')).order_by()
+        for room_id, booking_id, first, last in rows.iterator(chunk_size=10000):
+            if room_id in room_ids:
+                intervals.setdefault(room_id, []).append((first, last + datetime.timedelta(days=1)))
+        return intervals
+
+    def sweep(self, candidates):
+        # Занимают номер только активные брони (как RoomNight в Booking.sync_nights).
+        # Каждая строка сверяется с уже занятыми ночами; активные строки
+        # пакета вдобавок сверяются между собой: при пересечении остаётся
+        # та, что заезжает раньше.
+        existing = self.existing_intervals(candidates)
+        by_room = {}
+        for candidate in candidates:
+            by_room.setdefault(candidate.room.id, []).append(candidate)
+
+        accepted = []
+        for room_id, rows in by_room.items():
+            rows.sort(key=lambda c: (c.checkin, c.checkout, c.line))
+            busy = sorted(existing.get(room_id, []))
+            i, busy_until = 0, None
+            last_active = None
+            for candidate in rows:
+                # Сохранённые интервалы, закончившиеся до заезда, больше не мешают
+                while i < len(busy) and busy[i][1] <= candidate.checkin:
+                    i += 1
+                if i < len(busy) and busy[i][0] < candidate.checkout:
+                    self.reject(candidate.line, 'Номер недоступен в выбранные даты')
+                    continue
+                if candidate.status not in Booking.ACTIVE_STATUSES:
+                    accepted.append(candidate)
+                    continue
+                if busy_until is not None and candidate.checkin < busy_until:
+                    self.reject(candidate.line, f'Пересекается со строкой {last_active.line}')
+                    continue
+                busy_until, last_active = candidate.checkout, candidate
+                accepted.append(candidate)
+        accepted.sort(key=lambda c: c.line)
+        return accepted
+
+    # --- Запись ---
+    def insert(self, candidates):
+        for start in range(0, len(candidates), self.chunk_size):
+            chunk = candidates[start:start + self.chunk_size]
+            try:
+                with transaction.atomic():
+                    self.insert_chunk(chunk)
+            except IntegrityError:
+                # Ночи успели занять параллельно — порция откатывается целиком
+                for candidate in chunk:
+                    self.reject(candidate.line, 'Номер недоступен в выбранные даты')
+                continue
+            self.created += len(chunk)
+
+    def insert_chunk(self, chunk):
+        bookings = []
+        for c in chunk:
+            total_price = c.room.price * (c.checkout - c.checkin).days
+            charges = Booking.room_charge(c.status, total_price)
+            bookings.append(Booking(
+                client_id=c.client_id, room_id=c.room.id, status=c.status,
+                checkin_date=c.checkin, checkout_date=c.checkout,
+                total_price=total_price, charges=charges, outstanding=charges,
+            ))
+        bookings = Booking.objects.bulk_create(bookings)
+        nights, occupancy = [], []
+        for booking, candidate in zip(bookings, chunk):
+            if candidate.status not in Booking.ACTIVE_STATUSES:
+                continue
+            room = candidate.room
+            for night in booking.get_nights():
+                nights.append(RoomNight(room_id=room.id, night=night, booking_id=booking.pk))
+                occupancy.append((room.building_id, room.room_type_id, night))
+        RoomNight.objects.bulk_create(nights, batch_size=self.chunk_size * 4)
+        DailyStat.objects.add_occupancy(occupancy, 1)
+        record_created(bookings, [candidate.room.building_id for candidate in chunk])
+
+    def run(self, records, batch_size=IMPORT_BATCH_SIZE):
+        batch = []
+        for line, record in records:
+            try:
+                batch.append(self.parse(line, record))
+            except RowError as e:
+                self.reject(line, str(e), record)
+            except (AttributeError, TypeError):
+                self.reject(line, 'Строка не является объектом', record)
+            if len(batch) >= batch_size:
+                self.process(batch)
+                batch = []
+        if batch:
+            self.process(batch)
+        return self.created
+
+    def process(self, batch):
+        accepted = self.sweep(batch)
+        if self.dry_run:
+            self.created += len(accepted)
+            return
+        self.insert(accepted)
+        if accepted:
+            invalidate_dashboard_counters()
+
+
+def write_error_report(path, errors):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Строка', 'Причина', 'Данные'])
+        writer.writerows(sorted(errors))
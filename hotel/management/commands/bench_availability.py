@@ -0,0 +1,96 @@
+import datetime
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from hotel.availability import find_available_rooms, group_available_rooms
+from hotel.bench import measure, scratch_database
+from hotel.models import Address, Booking, Building, Client, Room, RoomNight, RoomType
+
+
+class Command(BaseCommand):
+    help = 'Замер поиска свободных номеров в зависимости от количества номеров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000,5000,20000',
+                            help='Количество номеров через запятую')
+        parser.add_argument('--rooms-per-building', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--per-room-limit', type=int, default=1000,
+                            help='Не замерять поштучную проверку Room.is_available выше этого размера')
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        checkin = datetime.date(2026, 3, 1)
+        checkout = checkin + datetime.timedelta(days=3)
+
+        with scratch_database():
+            self.stdout.write(f"{'номеров':>8} {'свободно':>9} {'запросов':>9} {'p50, мс':>9} {'p95, мс':>9} {'поштучно p50, мс':>17}")
+            for size in sizes:
+                self.seed(size, options['rooms_per_building'], checkin)
+
+                def search():
+                    rows = list(find_available_rooms(checkin, checkout))
+                    return rows, group_available_rooms(rows, 3)
+
+                result = measure(search, repeat=options['repeat'])
+                free = len(search()[0])
+
+                per_room = '—'
+                if size <= options['per_room_limit']:
+                    rooms = list(Room.objects.all())
+
+                    def one_by_one():
+                        return [room for room in rooms if room.is_available(checkin, checkout)]
+
+                    per_room = f"{measure(one_by_one, repeat=3)['p50_ms']:.1f}"
+
+                self.stdout.write(
+                    f"{size:>8} {free:>9} {result['queries']:>9} "
+                    f"{result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {per_room:>17}"
+                )
+
+    def seed(self, size, rooms_per_building, checkin):
+        Address.objects.all().delete()
+        RoomType.objects.all().delete()
+        Client.objects.all().delete()
+
+        address = Address.objects.create(city='Москва', street='Тверская', house='1')
+        room_types = RoomType.objects.bulk_create([
+            RoomType(name=name, price_per_night=Decimal(price))
+            for name, price in [('Стандарт', '3500.00'), ('Комфорт', '5200.00'), ('Люкс', '9800.00')]
+        ])
+        buildings = Building.objects.bulk_create([
+            Building(name=f'Корпус {n + 1}', description='', capacity=rooms_per_building, address=address)
+            for n in range((size + rooms_per_building - 1) // rooms_per_building)
+        ])
+        Room.objects.bulk_create([
+            Room(
+                building=buildings[n // rooms_per_building],
+                room_type=room_types[n % len(room_types)],
+                room_number=str(n % rooms_per_building + 1),
+                status=Room.Status.OCCUPIED if n % 10 == 0 else Room.Status.FREE,
+            )
+            for n in range(size)
+        ], batch_size=1000)
+        client = Client.objects.create(
+            first_name='Иван', last_name='Иванов', middle_name='Иванович',
+            phone='+70000000000', email='bench@example.com', passport_data='0000 000000',
+        )
+
+        # Каждый третий номер занят бронью, пересекающей период поиска
+        rooms = list(Room.objects.values_list('pk', flat=True)[::3])
+        bookings = Booking.objects.bulk_create([
+            Booking(
+                client=client, room_id=room_id, status=Booking.Status.CONFIRMED,
+                checkin_date=checkin + datetime.timedelta(days=1),
+                checkout_date=checkin + datetime.timedelta(days=5),
+                total_price=Decimal('0.00'),
+            )
+            for room_id in rooms
+        ], batch_size=1000)
+        RoomNight.objects.bulk_create([
+            RoomNight(room_id=booking.room_id, booking=booking, night=night)
+            for booking in bookings
+            for night in booking.get_nights()
+        ], batch_size=1000)
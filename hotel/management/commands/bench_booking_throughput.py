@@ -0,0 +1,110 @@
+import datetime
+import multiprocessing
+import time
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections
+
+from hotel.bench import scratch_database
+from hotel.models import Address, Booking, Building, Client, Room, RoomNight, RoomType
+from hotel.reservations import save_booking
+
+START_DATE = datetime.date(2026, 6, 1)
+
+
+def book_rooms(mode, client_id, room_ids, slots, barrier, results):
+    # Отдельный процесс: соединение, унаследованное от родителя, не используется
+    connections.close_all()
+    created = rejected = errors = 0
+    barrier.wait()
+    for slot in range(slots):
+        checkin = START_DATE + datetime.timedelta(days=slot * 2)
+        for room_id in room_ids:
+            booking = Booking(
+                client_id=client_id, room_id=room_id, status=Booking.Status.CONFIRMED,
+                checkin_date=checkin, checkout_date=checkin + datetime.timedelta(days=2),
+            )
+            try:
+                if mode == 'без сервиса':
+                    # Как было раньше: проверка и запись в разных транзакциях
+                    booking.clean()
+                    booking.save()
+                else:
+                    save_booking(booking)
+                created += 1
+            except ValidationError:
+                rejected += 1
+            except DatabaseError:
+                errors += 1
+    connections.close_all()
+    results.put((created, rejected, errors))
+
+
+class Command(BaseCommand):
+    help = 'Замер пропускной способности создания броней несколькими процессами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--rooms', type=int, default=5, help='Номеров на процесс')
+        parser.add_argument('--slots', type=int, default=20, help='Броней на номер')
+
+    def handle(self, *args, **options):
+        processes, rooms, slots = options['processes'], options['rooms'], options['slots']
+        context = multiprocessing.get_context('fork')
+        with scratch_database():
+            client_ids, room_ids = self.seed(processes, rooms)
+            self.stdout.write(
+                f"{'режим':<12} {'номера':<8} {'попыток':>8} {'создано':>8} "
+                f"{'отказов':>8} {'ошибок':>7} {'броней/с':>9} {'попыток/с':>10}"
+            )
+            for mode in ('сервис', 'без сервиса'):
+                for shared in (False, True):
+                    Booking.objects.all().delete()
+                    connections.close_all()
+                    barrier = context.Barrier(processes + 1)
+                    results = context.Queue()
+                    workers = [
+                        context.Process(target=book_rooms, args=(
+                            mode, client_ids[n],
+                            room_ids[:rooms] if shared else room_ids[n * rooms:(n + 1) * rooms],
+                            slots, barrier, results,
+                        ))
+                        for n in range(processes)
+                    ]
+                    for worker in workers:
+                        worker.start()
+                    barrier.wait()
+                    started = time.perf_counter()
+                    totals = [results.get() for _ in workers]
+                    elapsed = time.perf_counter() - started
+                    for worker in workers:
+                        worker.join()
+
+                    created, rejected, errors = (sum(column) for column in zip(*totals))
+                    attempts = processes * rooms * slots
+                    assert RoomNight.objects.count() == Booking.objects.filter(
+                        status__in=Booking.ACTIVE_STATUSES
+                    ).count() * 2
+                    self.stdout.write(
+                        f"{mode:<12} {'общие' if shared else 'свои':<8} {attempts:>8} {created:>8} "
+                        f"{rejected:>8} {errors:>7} {created / elapsed:>9.1f} {attempts / elapsed:>10.1f}"
+                    )
+
+    def seed(self, processes, rooms):
+        address = Address.objects.create(city='Москва', street='Тверская', house='1')
+        building = Building.objects.create(name='Центр', description='', capacity=100, address=address)
+        room_type = RoomType.objects.create(name='Стандарт', price_per_night=Decimal('3000.00'))
+        room_ids = [
+            Room.objects.create(room_type=room_type, building=building, room_number=str(n)).pk
+            for n in range(processes * rooms)
+        ]
+        client_ids = [
+            Client.objects.create(
+                first_name='Гость', last_name=f'Процесс{n}', middle_name='',
+                phone=f'+7 (900) 000-{n:04d}', email=f'bench{n}@example.com', passport_data=f'BENCH {n}',
+            ).pk
+            for n in range(processes)
+        ]
+        return client_ids, room_ids
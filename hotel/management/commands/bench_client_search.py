@@ -0,0 +1,89 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from hotel.bench import percentile, scratch_database
+from hotel.models import Client, ClientSearchToken
+from hotel.search import client_tokens
+
+FIRST_NAMES = ['Александр', 'Мария', 'Дмитрий', 'Анна', 'Сергей', 'Елена', 'Иван', 'Ольга', 'Пётр', 'Наталья']
+LAST_NAMES = ['Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Соколов', 'Михайлов', 'Новиков',
+              'Фёдоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семёнов', 'Егоров', 'Павлов']
+MIDDLE_NAMES = ['Александрович', 'Сергеевна', 'Иванович', 'Петровна', 'Дмитриевич', 'Олеговна']
+
+
+class Command(BaseCommand):
+    help = 'Замер поиска клиентов: индекс токенов против icontains по пяти полям'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        total = options['clients']
+        with scratch_database():
+            started = time.perf_counter()
+            self.seed(total, rng)
+            self.stdout.write(f'{total} клиентов, {ClientSearchToken.objects.count()} токенов '
+                              f'за {time.perf_counter() - started:.1f} с')
+
+            queries = self.make_queries(total, options['queries'], rng)
+            self.stdout.write(f"{'способ':<10} {'p50, мс':>9} {'p95, мс':>9} {'max, мс':>9}")
+            for name, search in [('индекс', self.search_index), ('icontains', self.search_icontains)]:
+                timings = []
+                for query in queries:
+                    start = time.perf_counter()
+                    search(query)
+                    timings.append((time.perf_counter() - start) * 1000)
+                self.stdout.write(f'{name:<10} {percentile(timings, 50):>9.2f} '
+                                  f'{percentile(timings, 95):>9.2f} {max(timings):>9.2f}')
+
+    def search_index(self, query):
+        return list(Client.objects.search(query).order_by('-registration_date', '-id')[:10])
+
+    def search_icontains(self, query):
+        return list(Client.objects.filter(
+            Q(first_name__icontains=query) |
+            Q(last_name__icontains=query) |
+            Q(phone__icontains=query) |
+            Q(email__icontains=query) |
+            Q(passport_data__icontains=query)
+        ).order_by('-registration_date', '-id')[:10])
+
+    def make_queries(self, total, count, rng):
+        queries = []
+        for _ in range(count):
+            n = rng.randrange(total)
+            queries.append(rng.choice([
+                f'{n:07d}'[-4:],            # последние цифры телефона
+                f'+7 (9{n % 100:02d}) {n:07d}'[:12],
+                f'client{n}@',
+                f'{4500 + n % 100} {n:06d}',
+                f'{LAST_NAMES[n % len(LAST_NAMES)]} {n}',
+            ]))
+        return queries
+
+    def seed(self, total, rng):
+        batch_size = 5000
+        for start in range(0, total, batch_size):
+            clients = []
+            for n in range(start, min(total, start + batch_size)):
+                clients.append(Client(
+                    pk=n + 1,
+                    first_name=rng.choice(FIRST_NAMES),
+                    last_name=f'{LAST_NAMES[n % len(LAST_NAMES)]}{n}',
+                    middle_name=rng.choice(MIDDLE_NAMES),
+                    phone=f'+7 (9{n % 100:02d}) {n:07d}',
+                    email=f'client{n}@example.com',
+                    passport_data=f'{4500 + n % 100} {n:06d}',
+                ))
+            Client.objects.bulk_create(clients)
+            ClientSearchToken.objects.bulk_create([
+                ClientSearchToken(client_id=client.pk, token=token)
+                for client in clients
+                for token in client_tokens(client)
+            ])
@@ -0,0 +1,108 @@
+import datetime
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from hotel.bench import percentile, scratch_database, seed_booking_history
+from hotel.models import Booking, Payment, Room
+
+TABLES = ['hotel_booking', 'hotel_payment', 'hotel_room', 'hotel_accommodation', 'hotel_dailystat']
+
+# Запросы панели, аналитики и страницы платежей в виде SQL: после отката
+# миграции модели уже не совпадают со схемой, поэтому обе схемы
+# замеряются одними и теми же запросами, меняются только параметры.
+QUERIES = [
+    ('панель: активные брони', 'SELECT COUNT(*) FROM hotel_booking WHERE status IN (%s, %s)',
+     lambda s: [s['confirmed'], s['paid']]),
+    ('панель: свободные номера', 'SELECT COUNT(*) FROM hotel_room WHERE status = %s',
+     lambda s: [s['free']]),
+    ('панель: выручка недели',
+     'SELECT SUM(total_price) FROM hotel_booking WHERE status IN (%s, %s) AND created_at >= %s',
+     lambda s: [s['paid'], s['completed'], s['week_start']]),
+    ('панель: ближайшие заезды',
+     'SELECT id FROM hotel_booking WHERE status = %s AND checkin_date >= %s ORDER BY checkin_date LIMIT 5',
+     lambda s: [s['confirmed'], s['today']]),
+    ('аналитика: выручка месяца', 'SELECT SUM(revenue) FROM hotel_dailystat WHERE day >= %s',
+     lambda s: [s['month_start']]),
+    ('аналитика: по дням',
+     'SELECT day, SUM(revenue) FROM hotel_dailystat WHERE day >= %s AND NOT revenue = 0 GROUP BY day ORDER BY day',
+     lambda s: [s['month_start']]),
+    ('платежи: проведено', 'SELECT SUM(amount) FROM hotel_payment WHERE status = %s',
+     lambda s: [s['payment_paid']]),
+    ('платежи: по методам', 'SELECT payment_method, SUM(amount) FROM hotel_payment GROUP BY payment_method',
+     lambda s: []),
+    ('платежи: долги', 'SELECT SUM(outstanding) FROM hotel_booking WHERE outstanding > 0',
+     lambda s: []),
+]
+
+
+def layout_params(compact, today):
+    week_start = timezone.make_aware(datetime.datetime.combine(today - datetime.timedelta(days=7), datetime.time.min))
+    values = {
+        'confirmed': Booking.Status.CONFIRMED, 'paid': Booking.Status.PAID,
+        'completed': Booking.Status.COMPLETED, 'free': Room.Status.FREE, 'payment_paid': Payment.Status.PAID,
+    }
+    params = {name: int(value) if compact else value.label for name, value in values.items()}
+    params.update(
+        week_start=week_start.astimezone(datetime.timezone.utc).replace(tzinfo=None).isoformat(' '),
+        today=today.isoformat(), month_start=(today - datetime.timedelta(days=30)).isoformat(),
+    )
+    return params
+
+
+def table_sizes():
+    # Страницы таблицы вместе с её индексами, в килобайтах
+    with connection.cursor() as cursor:
+        cursor.execute('VACUUM')
+        cursor.execute(
+            'SELECT m.tbl_name, SUM(s.pgsize) FROM dbstat s JOIN sqlite_master m ON m.name = s.name '
+            'GROUP BY m.tbl_name'
+        )
+        sizes = {name: size // 1024 for name, size in cursor.fetchall()}
+    return {table: sizes.get(table, 0) for table in TABLES}
+
+
+def time_queries(params, repeat):
+    timings = {}
+    with connection.cursor() as cursor:
+        for label, sql, args in QUERIES:
+            runs = []
+            for _ in range(repeat + 1):
+                started = time.perf_counter()
+                cursor.execute(sql, args(params))
+                cursor.fetchall()
+                runs.append((time.perf_counter() - started) * 1000)
+            timings[label] = percentile(runs[1:], 50)
+    return timings
+
+
+class Command(BaseCommand):
+    help = ('Размер таблиц и время запросов панели и аналитики: коды статусов и копейки '
+            'против текстовых статусов и DecimalField (откат миграции 0010)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=200_000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        with scratch_database():
+            seed_booking_history(options['bookings'])
+            compact = (table_sizes(), time_queries(layout_params(True, today), options['repeat']))
+            # Откат переводит данные обратно в текст и DecimalField
+            call_command('migrate', 'hotel', '0009', verbosity=0)
+            legacy = (table_sizes(), time_queries(layout_params(False, today), options['repeat']))
+
+        self.stdout.write(f"{'таблица':<22} {'текст, КБ':>10} {'коды, КБ':>10} {'разница':>8}")
+        for table in TABLES:
+            before, after = legacy[0][table], compact[0][table]
+            change = f'{(after - before) / before * 100:+.0f}%' if before else ''
+            self.stdout.write(f'{table:<22} {before:>10} {after:>10} {change:>8}')
+        self.stdout.write('')
+        self.stdout.write(f"{'запрос (p50)':<28} {'текст, мс':>10} {'коды, мс':>10} {'ускорение':>10}")
+        for label, _, _ in QUERIES:
+            before, after = legacy[1][label], compact[1][label]
+            self.stdout.write(f'{label:<28} {before:>10.2f} {after:>10.2f} {before / after:>9.1f}x')
@@ -0,0 +1,63 @@
+import time
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+
+from hotel import views
+from hotel.bench import percentile, scratch_database, seed_booking_history
+
+PAGES = [
+    ('панель', '/', views.DashboardView, views.AsyncDashboardView),
+    ('аналитика', '/analytics/', views.AnalyticsDashboardView, views.AsyncAnalyticsDashboardView),
+]
+
+
+class Command(BaseCommand):
+    help = 'Сравнение задержки синхронных и асинхронных панели и аналитики на заполненной базе'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=200_000)
+        parser.add_argument('--repeat', type=int, default=30)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            seed_booking_history(options['bookings'])
+            user = User.objects.create_user('bench', password='bench')
+            factory = RequestFactory()
+            self.stdout.write(
+                f"{'страница':<10} {'вариант':<14} {'среднее, мс':>12} {'p50, мс':>8} {'p95, мс':>8}"
+            )
+            for label, url, sync_view, async_view in PAGES:
+                variants = [
+                    ('синхронная', sync_view.as_view(), {}),
+                    ('асинхронная', async_view.as_view(), {}),
+                    ('асинх. 0 пот.', async_view.as_view(), {'HOTEL_AGGREGATE_WORKERS': 0}),
+                ]
+                for variant, view, overrides in variants:
+                    timings = []
+                    for _ in range(options['repeat'] + 1):
+                        # Счётчики панели кэшируются: замеряем холодный расчёт
+                        cache.clear()
+                        request = factory.get(url)
+                        request.user = user
+
+                        async def auser():
+                            return user
+
+                        request.auser = auser
+                        started = time.perf_counter()
+                        with override_settings(**overrides):
+                            if variant == 'синхронная':
+                                response = view(request)
+                            else:
+                                response = async_to_sync(view)(request)
+                            response.render()
+                        timings.append((time.perf_counter() - started) * 1000)
+                    timings = timings[1:]
+                    self.stdout.write(
+                        f"{label:<10} {variant:<14} {sum(timings) / len(timings):>12.2f} "
+                        f"{percentile(timings, 50):>8.2f} {percentile(timings, 95):>8.2f}"
+                    )
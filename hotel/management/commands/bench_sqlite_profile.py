@@ -0,0 +1,149 @@
+import datetime
+import multiprocessing
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, connections
+from django.db.models import Sum
+
+from hotel.bench import percentile, scratch_database
+from hotel.models import Address, Booking, Building, Client, Payment, Room, RoomType
+from hotel.reservations import save_booking
+
+START_DATE = datetime.date(2026, 6, 1)
+PROFILES = ('обычный', 'production')
+
+
+def use_profile(profile):
+    connections.close_all()
+    if profile == 'production':
+        connection.settings_dict['OPTIONS'] = {
+            **connection.settings_dict['OPTIONS'], 'init_command': settings.SQLITE_PRODUCTION_PRAGMAS,
+        }
+
+
+def end_request(profile):
+    # Без CONN_MAX_AGE Django закрывает соединение в конце каждого запроса
+    if profile != 'production':
+        connections.close_all()
+
+
+def write_bookings(profile, client_id, room_ids, barrier, deadline, results):
+    use_profile(profile)
+    done = errors = 0
+    timings = []
+    barrier.wait()
+    slot = 0
+    while time.time() < deadline.value:
+        checkin = START_DATE + datetime.timedelta(days=slot * 2)
+        room_id = room_ids[slot % len(room_ids)]
+        slot += 1
+        started = time.perf_counter()
+        try:
+            booking = save_booking(Booking(
+                client_id=client_id, room_id=room_id, status=Booking.Status.CONFIRMED,
+                checkin_date=checkin, checkout_date=checkin + datetime.timedelta(days=2),
+            ))
+            end_request(profile)
+            Payment.objects.create(
+                booking_id=booking.pk, amount=Decimal('1000.00'), payment_method=Payment.Method.CARD,
+            )
+            done += 2
+        except (ValidationError, DatabaseError):
+            errors += 1
+        end_request(profile)
+        timings.append((time.perf_counter() - started) * 1000)
+    connections.close_all()
+    results.put(('запись', done, errors, timings))
+
+
+def read_lists(profile, barrier, deadline, results):
+    use_profile(profile)
+    done = errors = 0
+    timings = []
+    barrier.wait()
+    while time.time() < deadline.value:
+        started = time.perf_counter()
+        try:
+            list(Booking.objects.select_related('client', 'room').order_by('-id')[:50])
+            Payment.objects.filter(status=Payment.Status.PAID).aggregate(total=Sum('amount'))
+            done += 1
+        except DatabaseError:
+            errors += 1
+        end_request(profile)
+        timings.append((time.perf_counter() - started) * 1000)
+    connections.close_all()
+    results.put(('чтение', done, errors, timings))
+
+
+class Command(BaseCommand):
+    help = 'Замер конкурентной записи (брони, платежи) и чтения списков в обычном и production-профиле SQLite'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--readers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=10)
+
+    def handle(self, *args, **options):
+        writers, readers = options['writers'], options['readers']
+        context = multiprocessing.get_context('fork')
+        self.stdout.write(
+            f"{'профиль':<12} {'поток':<8} {'операций':>9} {'ошибок':>7} {'опер./с':>9} "
+            f"{'p50, мс':>8} {'p95, мс':>8}"
+        )
+        for profile in PROFILES:
+            # Режим журнала хранится в файле базы: каждому профилю своя база
+            with scratch_database():
+                client_ids, room_ids = self.seed(writers)
+                connections.close_all()
+                barrier = context.Barrier(writers + readers + 1)
+                deadline = context.Value('d', 0.0)
+                results = context.Queue()
+                workers = [
+                    context.Process(target=write_bookings, args=(
+                        profile, client_ids[n], room_ids[n::writers], barrier, deadline, results,
+                    ))
+                    for n in range(writers)
+                ] + [
+                    context.Process(target=read_lists, args=(profile, barrier, deadline, results))
+                    for _ in range(readers)
+                ]
+                for worker in workers:
+                    worker.start()
+                deadline.value = time.time() + options['seconds']
+                barrier.wait()
+                started = time.perf_counter()
+                totals = [results.get() for _ in workers]
+                elapsed = time.perf_counter() - started
+                for worker in workers:
+                    worker.join()
+
+                for kind in ('запись', 'чтение'):
+                    rows = [row for row in totals if row[0] == kind]
+                    done = sum(row[1] for row in rows)
+                    errors = sum(row[2] for row in rows)
+                    timings = [value for row in rows for value in row[3]] or [0]
+                    self.stdout.write(
+                        f"{profile:<12} {kind:<8} {done:>9} {errors:>7} {done / elapsed:>9.1f} "
+                        f"{percentile(timings, 50):>8.2f} {percentile(timings, 95):>8.2f}"
+                    )
+
+    def seed(self, writers):
+        address = Address.objects.create(city='Москва', street='Тверская', house='1')
+        building = Building.objects.create(name='Центр', description='', capacity=100, address=address)
+        room_type = RoomType.objects.create(name='Стандарт', price_per_night=Decimal('3000.00'))
+        room_ids = [
+            Room.objects.create(room_type=room_type, building=building, room_number=str(n)).pk
+            for n in range(writers * 5)
+        ]
+        client_ids = [
+            Client.objects.create(
+                first_name='Гость', last_name=f'Процесс{n}', middle_name='',
+                phone=f'+7 (900) 000-{n:04d}', email=f'bench{n}@example.com', passport_data=f'BENCH {n}',
+            ).pk
+            for n in range(writers)
+        ]
+        return client_ids, room_ids
@@ -0,0 +1,89 @@
+import datetime
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel.bench import scratch_database
+from hotel.benchsuite import (
+    CASES, DEFAULT_THRESHOLD, compare, environment, load_report, production_pragmas, run_suite, write_report,
+)
+from hotel.seeding import HotelSeeder
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'bench_baseline.json')
+
+
+class Command(BaseCommand):
+    help = ('Набор бенчмарков горячих путей на засеянной временной базе: пропускная способность, '
+            'p50/p95 и число запросов в JSON и сравнение с базовым прогоном')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cases', default=','.join(CASES), help='Случаи через запятую')
+        parser.add_argument('--repeat', type=int, default=30, help='Замеров на случай за круг')
+        parser.add_argument('--rounds', type=int, default=3, help='Кругов по всем случаям')
+        parser.add_argument('--output', help='Куда записать результаты в JSON (по умолчанию не записываются)')
+        parser.add_argument('--baseline', default=BASELINE_PATH, help='Базовый прогон для сравнения')
+        parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help='Допустимое замедление p50, доля (0.3 — на 30%%)')
+        parser.add_argument('--update-baseline', action='store_true', help='Записать результаты как базовые')
+        parser.add_argument('--buildings', type=int, default=10)
+        parser.add_argument('--rooms-per-building', type=int, default=20)
+        parser.add_argument('--clients', type=int, default=5000)
+        parser.add_argument('--years', type=int, default=1)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        names = [name.strip() for name in options['cases'].split(',') if name.strip()]
+        unknown = [name for name in names if name not in CASES]
+        if unknown:
+            raise CommandError(f"Неизвестные случаи: {', '.join(unknown)}")
+        dataset = {
+            name: options[name] for name in ('buildings', 'rooms_per_building', 'clients', 'years', 'seed')
+        }
+
+        with scratch_database():
+            HotelSeeder(**dataset).run()
+            with production_pragmas():
+                results = run_suite(names, options['repeat'], options['rounds'])
+
+        report = {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'environment': environment(),
+            'dataset': dataset,
+            'repeat': options['repeat'],
+            'rounds': options['rounds'],
+            'results': results,
+        }
+        if options['output']:
+            write_report(options['output'], report)
+            self.stdout.write(f"Результаты: {options['output']}")
+        if options['update_baseline']:
+            write_report(options['baseline'], report)
+            self.stdout.write(self.style.SUCCESS(f"Базовый прогон обновлён: {options['baseline']}"))
+            return
+
+        if not os.path.exists(options['baseline']):
+            self.stdout.write(self.style.WARNING('Базового прогона нет: запустите с --update-baseline'))
+            return
+        baseline = load_report(options['baseline'])
+        if baseline.get('dataset') != dataset or baseline.get('environment') != report['environment']:
+            self.stdout.write(self.style.WARNING('Базовый прогон снят на других данных или окружении'))
+
+        self.stdout.write(
+            f"{'случай':<24} {'опер./с':>9} {'p95, мс':>9} {'база p50':>9} {'p50, мс':>9} {'изменение':>10} {'запросы':>9}"
+        )
+        rows = compare(results, baseline['results'], options['threshold'])
+        for name, base_p50, p50, change, base_queries, queries, regressed in rows:
+            line = (
+                f"{name:<24} {results[name]['ops_per_s']:>9.1f} {results[name]['p95_ms']:>9.2f} "
+                f"{'—' if base_p50 is None else f'{base_p50:.2f}':>9} {p50:>9.2f} "
+                f"{'—' if change is None else f'{change:+.0%}':>10} "
+                f"{queries if base_queries is None else f'{base_queries}→{queries}':>9}"
+            )
+            self.stdout.write(self.style.ERROR(line) if regressed else line)
+
+        regressions = [row[0] for row in rows if row[-1]]
+        if regressions:
+            raise CommandError(
+                f"Регрессия (порог {options['threshold']:.0%} по p50 или рост запросов): {', '.join(regressions)}"
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,144 @@
+import time
+from copy import copy
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.template.context import RenderContext
+from django.test import Client
+from django.test.signals import template_rendered
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from hotel import urls as hotel_urls
+from hotel.bench import scratch_database, seed_sample_data
+
+TEMPLATE_DIR = Path(settings.BASE_DIR) / 'templates' / 'hotel'
+
+
+def page_url(pattern):
+    url = '/' + str(pattern.pattern)
+    if '<int:pk>' in url:
+        model = getattr(pattern.callback.view_class, 'model', None)
+        pk = model.objects.order_by('pk').values_list('pk', flat=True).first() if model else None
+        if pk is None:
+            return None
+        url = url.replace('<int:pk>', str(pk))
+    return url
+
+
+def capture_pages(client):
+    # Контекст берётся из настоящих GET-запросов к страницам: шаблон
+    # страницы рендерится первым, базовый и вложенные — внутри него
+    pages = {}
+
+    def remember(sender, template, context, **kwargs):
+        if template.name.startswith('hotel/') and not template.name.startswith('hotel/includes/'):
+            pages.setdefault(template.name, context)
+
+    template_rendered.connect(remember)
+    try:
+        for pattern in hotel_urls.urlpatterns:
+            url = page_url(pattern)
+            if url is None:
+                continue
+            response = client.get(url)
+            if response.streaming:
+                # Асинхронный поток (лента изменений) читается через итерацию ответа
+                b''.join(response)
+    finally:
+        template_rendered.disconnect(remember)
+    return pages
+
+
+def uncached_engine():
+    # Те же настройки, но шаблоны читаются и разбираются при каждом get_template
+    options = {**settings.TEMPLATES[0]['OPTIONS']}
+    options['loaders'] = [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]
+    return DjangoTemplates({
+        'NAME': 'bench', 'DIRS': settings.TEMPLATES[0]['DIRS'], 'APP_DIRS': False, 'OPTIONS': options,
+    }).engine
+
+
+def fresh(context):
+    # Контекст, снятый во время рендера, привязан к шаблону; для повторного
+    # рендера нужна отвязанная копия, иначе {% extends %} ищет родителя
+    # через движок исходного шаблона
+    context = copy(context)
+    context.template = None
+    context.render_context = RenderContext()
+    return context
+
+
+def time_render(get_template, name, context, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        get_template(name).render(fresh(context))
+        timings.append((time.perf_counter() - started) * 1000)
+    return sum(timings) / len(timings)
+
+
+class Command(BaseCommand):
+    help = 'Среднее время рендера каждого шаблона templates/hotel/*.html с контекстом настоящих страниц'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10, help='Строк данных в каждом справочнике')
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            seed_sample_data(options['rows'])
+            user = User.objects.create_user('bench', password='bench')
+            client = Client()
+            client.force_login(user)
+            # Тестовое окружение нужно только для сигнала template_rendered;
+            # замер идёт уже без его обёртки вокруг рендера
+            setup_test_environment()
+            try:
+                pages = capture_pages(client)
+            finally:
+                teardown_test_environment()
+            self.report(pages, options['repeat'])
+
+    def report(self, pages, repeat):
+        cached = engines['django'].engine
+        plain = uncached_engine()
+        self.stdout.write(
+            f"{'шаблон':<38} {'кэш, мс':>8} {'без кэша, мс':>13} {'без фрагм., мс':>15} {'запросов':>9}"
+        )
+        totals = [0, 0, 0]
+        for name in sorted(pages):
+            context = pages[name]
+            with CaptureQueriesContext(connection) as queries:
+                cached.get_template(name).render(fresh(context))
+            row = [
+                time_render(cached.get_template, name, context, repeat),
+                time_render(plain.get_template, name, context, repeat),
+            ]
+            # Без кэша фрагментов: меню рендерится каждый раз заново
+            timings = []
+            for _ in range(repeat):
+                cache.clear()
+                started = time.perf_counter()
+                cached.get_template(name).render(fresh(context))
+                timings.append((time.perf_counter() - started) * 1000)
+            row.append(sum(timings) / len(timings))
+            totals = [total + value for total, value in zip(totals, row)]
+            self.stdout.write(
+                f"{name:<38} {row[0]:>8.2f} {row[1]:>13.2f} {row[2]:>15.2f} {len(queries):>9}"
+            )
+        self.stdout.write(f"{'итого':<38} {totals[0]:>8.2f} {totals[1]:>13.2f} {totals[2]:>15.2f}")
+
+        missing = sorted(
+            f'hotel/{path.name}' for path in TEMPLATE_DIR.glob('*.html') if f'hotel/{path.name}' not in pages
+        )
+        if missing:
+            self.stdout.write('Не рендерятся ни одной страницей: ' + ', '.join(missing))
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel.importing import (
+    IMPORT_BATCH_SIZE, IMPORT_CHUNK_SIZE, STATUSES, BookingImporter, read_records, write_error_report
+)
+from hotel.models import Booking
+
+
+class Command(BaseCommand):
+    help = ('Импорт бронирований из CSV или JSON. Поля: client (телефон, e-mail или паспорт), '
+            'building (id или название), room, checkin_date, checkout_date, status')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .csv, .json или .jsonl')
+        parser.add_argument('--errors', help='Куда записать отклонённые строки (CSV)')
+        parser.add_argument('--status', default=Booking.Status.CONFIRMED.label, choices=sorted(STATUSES),
+                            help='Статус для строк без поля status')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+                            help='Сколько строк сверяется на пересечения за один проход')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE,
+                            help='Сколько броней вставляется в одной транзакции')
+        parser.add_argument('--dry-run', action='store_true', help='Только проверить, ничего не записывать')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        importer = BookingImporter(
+            chunk_size=options['chunk_size'], default_status=options['status'], dry_run=options['dry_run'],
+        )
+        try:
+            created = importer.run(read_records(options['path']), batch_size=options['batch_size'])
+        except OSError as e:
+            raise CommandError(f'Не удалось прочитать файл: {e}')
+        except ValueError as e:
+            raise CommandError(f'Файл повреждён: {e}')
+
+        verb = 'Прошли проверку' if options['dry_run'] else 'Импортировано'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb}: {created}, отклонено: {len(importer.errors)} за {time.perf_counter() - started:.1f} с'
+        ))
+        if importer.errors:
+            if options['errors']:
+                write_error_report(options['errors'], importer.errors)
+                self.stdout.write(f"Отчёт об ошибках: {options['errors']}")
+            else:
+                for line, reason, record in sorted(importer.errors)[:20]:
+                    self.stderr.write(f'строка {line}: {reason}')
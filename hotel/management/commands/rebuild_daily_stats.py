@@ -0,0 +1,17 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from hotel.models import DailyStat
+
+
+class Command(BaseCommand):
+    help = 'Пересчитать сводку выручки и загрузки по дням'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=datetime.date.fromisoformat, help='Первый день (ГГГГ-ММ-ДД)')
+        parser.add_argument('--end', type=datetime.date.fromisoformat, help='Последний день (ГГГГ-ММ-ДД)')
+
+    def handle(self, *args, **options):
+        count = DailyStat.objects.rebuild(options['start'], options['end'])
+        self.stdout.write(self.style.SUCCESS(f'Сводка пересчитана: {count} строк'))
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel.seeding import SEED_BATCH_SIZE, HotelSeeder
+
+
+class Command(BaseCommand):
+    help = ('Заполнить базу синтетической сетью гостиниц: номера, клиенты, брони за несколько лет '
+            'с платежами, проживаниями и заказами. Результат определяется --seed')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--addresses', type=int, default=50)
+        parser.add_argument('--buildings', type=int, default=100)
+        parser.add_argument('--rooms-per-building', type=int, default=50)
+        parser.add_argument('--room-types', type=int, default=6)
+        parser.add_argument('--clients', type=int, default=100_000)
+        parser.add_argument('--years', type=int, default=3, help='Глубина истории броней')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=SEED_BATCH_SIZE,
+                            help='Сколько строк вставляется одним bulk_create')
+
+    def handle(self, *args, **options):
+        sizes = ['addresses', 'buildings', 'rooms_per_building', 'room_types', 'clients', 'years', 'batch_size']
+        for name in sizes:
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} должно быть больше нуля")
+
+        started = time.perf_counter()
+        step = max(1, options['buildings'] // 10)
+
+        def progress(done, total):
+            if done % step == 0 or done == total:
+                self.stdout.write(f'Гостиниц: {done} из {total}, {time.perf_counter() - started:.0f} с')
+
+        seeder = HotelSeeder(
+            addresses=options['addresses'], buildings=options['buildings'],
+            rooms_per_building=options['rooms_per_building'], room_types=options['room_types'],
+            clients=options['clients'], years=options['years'], seed=options['seed'],
+            batch_size=options['batch_size'],
+        )
+        counts = seeder.run(progress)
+        elapsed = time.perf_counter() - started
+        for model, count in counts.items():
+            self.stdout.write(f'{model._meta.verbose_name_plural:<28} {count:>10}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано строк: {sum(counts.values())} за {elapsed:.1f} с '
+            f'({sum(counts.values()) / elapsed:.0f} строк/с)'
+        ))
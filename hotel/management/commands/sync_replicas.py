@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel.routing import copy_to_replica, get_replicas
+
+
+class Command(BaseCommand):
+    help = 'Скопировать основную базу SQLite в файлы реплик (замена репликации для локальной проверки)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Повторять каждые N секунд')
+
+    def handle(self, *args, **options):
+        replicas = get_replicas()
+        if not replicas:
+            raise CommandError('Реплики не настроены: задайте HOTEL_DB_REPLICAS')
+        paths = [settings.DATABASES[alias]['NAME'] for alias in replicas]
+        while True:
+            started = time.perf_counter()
+            for path in paths:
+                copy_to_replica(path)
+            self.stdout.write(
+                f'Реплики обновлены ({len(paths)}) за {(time.perf_counter() - started) * 1000:.0f} мс'
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
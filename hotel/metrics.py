@@ -0,0 +1,294 @@
+import atexit
+import bisect
+import hmac
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+# === Метрики запросов ===
+# MetricsMiddleware замеряет каждый запрос: полное время, число и время
+# SQL-запросов (execute_wrapper на всех соединениях, включая потоки
+# параллельных агрегатов) и время отрисовки TemplateResponse. Итог
+# уходит в заголовок Server-Timing и в гистограммы по имени маршрута,
+# которые /metrics отдаёт в текстовом формате Prometheus.
+#
+# Гистограммы живут в памяти процесса. При нескольких воркерах укажите
+# HOTEL_METRICS_DIR: каждый процесс не чаще раза в FLUSH_SECONDS
+# сбрасывает свой снимок в файл <pid>.json, а /metrics складывает файлы
+# всех процессов. Файлы завершившихся воркеров остаются, чтобы счётчики
+# не убывали; каталог очищается при перезапуске сервиса.
+#
+# У потоковых ответов (экспорт CSV, поток изменений) замеряется время
+# до первого байта: тело читается уже после выхода из middleware.
+#
+# Свои middleware (метрики, реплики, текущая гостиница) работают и в
+# синхронной, и в асинхронной цепочке. Под ASGI асинхронные представления
+# (панели, лента изменений) тогда не занимают поток на время запроса.
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+HISTOGRAMS = {
+    'hotel_request_duration_seconds': ('Время обработки запроса, с', TIME_BUCKETS),
+    'hotel_request_db_seconds': ('Время SQL-запросов за запрос, с', TIME_BUCKETS),
+    'hotel_request_db_queries': ('SQL-запросов за запрос', QUERY_BUCKETS),
+    'hotel_request_template_seconds': ('Время отрисовки шаблона, с', TIME_BUCKETS),
+}
+REQUESTS_TOTAL = 'hotel_requests_total'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+FLUSH_SECONDS = 5
+UNMATCHED_VIEW = 'unmatched'
+# Метод приходит от клиента: остальные значения сводятся в одно, чтобы
+# не плодить рядов
+KNOWN_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+_current = ContextVar('hotel_request_timings', default=None)
+
+
+def get_metrics_dir():
+    return getattr(settings, 'HOTEL_METRICS_DIR', None)
+
+
+class RequestTimings:
+    __slots__ = ('queries', 'db', 'template', 'lock')
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.template = 0.0
+        # Запросы параллельных агрегатов приходят из потоков пула
+        self.lock = threading.Lock()
+
+    def add_query(self, duration):
+        with self.lock:
+            self.queries += 1
+            self.db += duration
+
+
+def record_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(time.perf_counter() - started)
+
+
+def attach(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+# Соединения потоков пула создаются без middleware
+connection_created.connect(attach)
+
+
+class Registry:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        # (метрика, метки) -> [число в каждой корзине..., в +Inf, сумма]
+        self.histograms = {}
+        self.counters = {}
+        self.flushed = time.monotonic()
+
+    def observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][1]
+        series = self.histograms.get((name, labels))
+        if series is None:
+            series = self.histograms[(name, labels)] = [0] * (len(buckets) + 1) + [0]
+        series[bisect.bisect_left(buckets, value)] += 1
+        series[-1] += value
+
+    def record(self, view, method, status, elapsed, timings):
+        labels = (('view', view), ('method', method if method in KNOWN_METHODS else 'other'))
+        with self.lock:
+            if self.pid != os.getpid():
+                # Снимок родителя, унаследованный при fork, принадлежит ему
+                self.reset()
+            self.observe('hotel_request_duration_seconds', labels, elapsed)
+            self.observe('hotel_request_db_seconds', labels, timings.db)
+            self.observe('hotel_request_db_queries', labels, timings.queries)
+            self.observe('hotel_request_template_seconds', labels, timings.template)
+            key = (REQUESTS_TOTAL, labels + (('status', str(status)),))
+            self.counters[key] = self.counters.get(key, 0) + 1
+            due = time.monotonic() - self.flushed >= FLUSH_SECONDS
+            if due:
+                self.flushed = time.monotonic()
+        if due:
+            self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            if self.pid != os.getpid():
+                self.reset()
+            return {
+                'histograms': [[name, labels, list(series)] for (name, labels), series in self.histograms.items()],
+                'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+            }
+
+    def flush(self):
+        directory = get_metrics_dir()
+        if not directory:
+            return
+        snapshot = self.snapshot()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        # Запись во временный файл и замена: читатель не увидит половину снимка
+        temporary = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f)
+        os.replace(temporary, path)
+
+    def collect(self):
+        # Свой снимок — из памяти, снимки других процессов — из их файлов
+        snapshots = [self.snapshot()]
+        directory = get_metrics_dir()
+        if directory and os.path.isdir(directory):
+            own = f'{os.getpid()}.json'
+            for filename in os.listdir(directory):
+                if not filename.endswith('.json') or filename == own:
+                    continue
+                try:
+                    with open(os.path.join(directory, filename), encoding='utf-8') as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return merge(snapshots)
+
+
+def merge(snapshots):
+    histograms, counters = {}, {}
+    for snapshot in snapshots:
+        for name, labels, series in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            total = histograms.setdefault(key, [0] * len(series))
+            for i, value in enumerate(series):
+                total[i] += value
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+    return histograms, counters
+
+
+registry = Registry()
+atexit.register(registry.flush)
+
+
+# === Доступ к /metrics ===
+# Метрики раскрывают маршруты и профиль нагрузки. Сборщик передаёт
+# Authorization: Bearer <HOTEL_METRICS_TOKEN>; без токена в настройках
+# их видят только вошедшие сотрудники с is_staff.
+def is_authorized(request):
+    token = getattr(settings, 'HOTEL_METRICS_TOKEN', '')
+    scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+    if token and scheme.lower() == 'bearer' and hmac.compare_digest(credentials.encode(), token.encode()):
+        return True
+    return request.user.is_active and request.user.is_staff
+
+
+# === Текстовый формат Prometheus ===
+def format_labels(labels):
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics(collected):
+    histograms, counters = collected
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for (series_name, labels), series in sorted(histograms.items()):
+            if series_name != name:
+                continue
+            cumulative = 0
+            for le, count in zip([*buckets, '+Inf'], series[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{format_labels(labels + (("le", le),))} {cumulative}')
+            lines.append(f'{name}_sum{format_labels(labels)} {format_number(series[-1])}')
+            lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+    lines += [f'# HELP {REQUESTS_TOTAL} Запросов по маршруту и коду ответа', f'# TYPE {REQUESTS_TOTAL} counter']
+    for (_, labels), value in sorted(counters.items()):
+        lines.append(f'{REQUESTS_TOTAL}{format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def server_timing(elapsed, timings):
+    return (
+        f'app;dur={elapsed * 1000:.1f}, '
+        f'db;dur={timings.db * 1000:.1f};desc="{timings.queries} queries", '
+        f'tpl;dur={timings.template * 1000:.1f}'
+    )
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings, started)
+
+    async def __acall__(self, request):
+        timings, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings, started)
+
+    def start(self):
+        for connection in connections.all():
+            attach(connection)
+        timings = RequestTimings()
+        return timings, _current.set(timings), time.perf_counter()
+
+    def finish(self, request, response, timings, started):
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        registry.record(
+            match.view_name if match else UNMATCHED_VIEW, request.method, response.status_code, elapsed, timings,
+        )
+        response['Server-Timing'] = server_timing(elapsed, timings)
+        return response
+
+    def process_template_response(self, request, response):
+        # Вызывается последним перед отрисовкой: middleware стоит первым
+        timings = _current.get()
+        if timings is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                timings.template += time.perf_counter() - started
+            response.add_post_render_callback(rendered)
+        return response
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:02
+
+import datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_room_nights(apps, schema_editor):
+    Booking = apps.get_model('hotel', 'Booking')
+    RoomNight = apps.get_model('hotel', 'RoomNight')
+    bookings = Booking.objects.filter(
+        status__in=['Подтвержден', 'Оплачен'],
+    ).order_by('pk').values_list('pk', 'room_id', 'checkin_date', 'checkout_date')
+    nights = []
+    for booking_id, room_id, checkin_date, checkout_date in bookings.iterator():
+        night = checkin_date
+        while night < checkout_date:
+            nights.append(RoomNight(room_id=room_id, night=night, booking_id=booking_id))
+            night += datetime.timedelta(days=1)
+    # Уже существующие пересечения не переносим: ночь остаётся за более ранней бронью
+    RoomNight.objects.bulk_create(nights, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0002_remove_buildingproducts_available_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomNight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('night', models.DateField(verbose_name='Ночь')),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nights', to='hotel.booking', verbose_name='Бронирование')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nights', to='hotel.room', verbose_name='Номер')),
+            ],
+            options={
+                'verbose_name': 'Занятая ночь',
+                'verbose_name_plural': 'Занятые ночи',
+                'constraints': [models.UniqueConstraint(fields=('room', 'night'), name='unique_room_night')],
+            },
+        ),
+        migrations.RunPython(fill_room_nights, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_daily_stats(apps, schema_editor):
+    DailyStat = apps.get_model('hotel', 'DailyStat')
+    Payment = apps.get_model('hotel', 'Payment')
+    Room = apps.get_model('hotel', 'Room')
+    RoomNight = apps.get_model('hotel', 'RoomNight')
+
+    rows = {}
+    revenue = Payment.objects.values_list(
+        'booking__room__building_id', 'booking__room__room_type_id', 'payment_date'
+    ).annotate(total=Sum('amount')).order_by()
+    for building_id, room_type_id, day, total in revenue:
+        rows.setdefault((building_id, room_type_id, day), {})['revenue'] = total
+    occupancy = RoomNight.objects.values_list(
+        'room__building_id', 'room__room_type_id', 'night'
+    ).annotate(total=Count('pk')).order_by()
+    for building_id, room_type_id, day, total in occupancy:
+        rows.setdefault((building_id, room_type_id, day), {})['occupied_nights'] = total
+    rooms = {
+        (building_id, room_type_id): total for building_id, room_type_id, total in
+        Room.objects.values_list('building_id', 'room_type_id').annotate(total=Count('pk')).order_by()
+    }
+    DailyStat.objects.bulk_create([
+        DailyStat(
+            building_id=building_id, room_type_id=room_type_id, day=day,
+            available_nights=rooms.get((building_id, room_type_id), 0), **values
+        )
+        for (building_id, room_type_id, day), values in rows.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0003_roomnight'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка')),
+                ('occupied_nights', models.IntegerField(default=0, verbose_name='Занято номеро-ночей')),
+                ('available_nights', models.IntegerField(default=0, verbose_name='Доступно номеро-ночей')),
+                ('building', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='hotel.building', verbose_name='Гостиница')),
+                ('room_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='hotel.roomtype', verbose_name='Тип номера')),
+            ],
+            options={
+                'verbose_name': 'Сводка за день',
+                'verbose_name_plural': 'Сводки по дням',
+                'indexes': [models.Index(fields=['day'], name='daily_stat_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('building', 'room_type', 'day'), name='unique_daily_stat')],
+            },
+        ),
+        migrations.RunPython(fill_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from hotel.search import client_tokens
+
+
+def fill_search_tokens(apps, schema_editor):
+    Client = apps.get_model('hotel', 'Client')
+    ClientSearchToken = apps.get_model('hotel', 'ClientSearchToken')
+    batch = []
+    for client in Client.objects.order_by('pk').iterator(chunk_size=2000):
+        batch.extend(ClientSearchToken(client_id=client.pk, token=token) for token in client_tokens(client))
+        if len(batch) >= 5000:
+            ClientSearchToken.objects.bulk_create(batch)
+            batch = []
+    ClientSearchToken.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0005_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=100, verbose_name='Токен')),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='hotel.client', verbose_name='Клиент')),
+            ],
+            options={
+                'verbose_name': 'Поисковый токен клиента',
+                'verbose_name_plural': 'Поисковые токены клиентов',
+                'indexes': [models.Index(fields=['token', 'client'], name='client_token_idx')],
+            },
+        ),
+        migrations.RunPython(fill_search_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0006_client_search_tokens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='buildingproducts',
+            name='quantity',
+            field=models.PositiveIntegerField(default=0, verbose_name='Остаток'),
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField(verbose_name='Изменение')),
+                ('reason', models.CharField(choices=[('Поступление', 'Поступление'), ('Заказ', 'Заказ'), ('Возврат', 'Возврат'), ('Списание', 'Списание')], max_length=50, verbose_name='Причина')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата')),
+                ('building', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='hotel.building', verbose_name='Гостиница')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='hotel.productorder', verbose_name='Заказ')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='hotel.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Движение товара',
+                'verbose_name_plural': 'Движения товаров',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['product', 'building', 'created_at'], name='stock_movement_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:26
+
+from django.db import migrations, models
+from django.db.models import Case, DecimalField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+
+def fill_folio(apps, schema_editor):
+    Booking = apps.get_model('hotel', 'Booking')
+    Payment = apps.get_model('hotel', 'Payment')
+    ProductOrder = apps.get_model('hotel', 'ProductOrder')
+    ServiceOrder = apps.get_model('hotel', 'ServiceOrder')
+    money = DecimalField(max_digits=12, decimal_places=2)
+
+    def total(model, booking_path, amount, **filters):
+        rows = model.objects.filter(**{booking_path: OuterRef('pk')}, **filters).order_by().values(booking_path)
+        return Coalesce(Subquery(rows.annotate(total=Sum(amount)).values('total')), Value(0), output_field=money)
+
+    Booking.objects.update(
+        charges=Case(
+            When(status='Отменен', then=Value(0)),
+            default=Coalesce(F('total_price'), Value(0)),
+            output_field=money,
+        ) + total(ProductOrder, 'accommodation__booking', 'total_price')
+          + total(ServiceOrder, 'accommodation__booking', 'total_price'),
+        paid=total(Payment, 'booking', 'amount', status='Оплачен'),
+    )
+    Booking.objects.update(outstanding=F('charges') - F('paid'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0007_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='charges',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Начислено'),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='outstanding',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='К оплате'),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='paid',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Оплачено'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('outstanding__gt', 0)), fields=['outstanding', 'id'], name='booking_outstanding_idx'),
+        ),
+        migrations.RunPython(fill_folio, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0008_booking_folio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeEvent',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False, verbose_name='Номер события')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Время')),
+                ('model', models.CharField(choices=[('room', 'Номер'), ('booking', 'Бронирование'), ('accommodation', 'Проживание')], max_length=20, verbose_name='Объект')),
+                ('object_id', models.BigIntegerField(verbose_name='Идентификатор объекта')),
+                ('old_status', models.CharField(blank=True, max_length=50, verbose_name='Прежний статус')),
+                ('new_status', models.CharField(blank=True, max_length=50, verbose_name='Новый статус')),
+                ('building', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='change_events', to='hotel.building', verbose_name='Гостиница')),
+            ],
+            options={
+                'verbose_name': 'Событие изменения',
+                'verbose_name_plural': 'Лента изменений',
+                'ordering': ['seq'],
+                'indexes': [models.Index(fields=['building', 'seq'], name='change_event_building_idx')],
+            },
+        ),
+    ]
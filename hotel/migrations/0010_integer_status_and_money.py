@@ -0,0 +1,142 @@
+import hotel.fields
+from django.db import migrations, models
+from django.db.models import BigIntegerField, DecimalField, ExpressionWrapper, F, Value
+from django.db.models.functions import Cast, Round
+
+
+# Статусы из текста в коды IntegerChoices, деньги из DecimalField в целые
+# копейки. Для каждого поля: временный столбец, перенос данных, удаление
+# старого столбца и переименование нового — одинаково для SQLite и
+# PostgreSQL, без преобразования типа столбца на месте.
+
+STATUS_FIELDS = {
+    ('room', 'status'): ['Свободен', 'Занят', 'На обслуживании', 'Требует уборки'],
+    ('booking', 'status'): ['Новый', 'Подтвержден', 'Оплачен', 'Отменен', 'Завершен'],
+    ('payment', 'status'): ['Оплачен', 'Отменен', 'Возврат'],
+    ('payment', 'payment_method'): ['Наличные', 'Карта', 'Онлайн'],
+    ('accommodation', 'status'): ['Проживает', 'Выехал'],
+}
+
+# Поле -> max_digits прежнего DecimalField
+MONEY_FIELDS = {
+    ('roomtype', 'price_per_night'): 10,
+    ('product', 'price'): 10,
+    ('service', 'price'): 10,
+    ('booking', 'total_price'): 10,
+    ('booking', 'charges'): 12,
+    ('booking', 'paid'): 12,
+    ('booking', 'outstanding'): 12,
+    ('payment', 'amount'): 10,
+    ('productorder', 'total_price'): 10,
+    ('serviceorder', 'total_price'): 10,
+    ('dailystat', 'revenue'): 14,
+}
+
+
+def temporary(name):
+    return f'{name}_code'
+
+
+def convert_forward(apps, schema_editor):
+    for (model_name, name), labels in STATUS_FIELDS.items():
+        model = apps.get_model('hotel', model_name)
+        for code, label in enumerate(labels, start=1):
+            model.objects.filter(**{name: label}).update(**{temporary(name): code})
+    for model_name, name in MONEY_FIELDS:
+        model = apps.get_model('hotel', model_name)
+        model.objects.update(**{temporary(name): Cast(Round(F(name) * 100), BigIntegerField())})
+
+
+def convert_backward(apps, schema_editor):
+    for (model_name, name), labels in STATUS_FIELDS.items():
+        model = apps.get_model('hotel', model_name)
+        for code, label in enumerate(labels, start=1):
+            model.objects.filter(**{temporary(name): code}).update(**{name: label})
+    for model_name, name in MONEY_FIELDS:
+        model = apps.get_model('hotel', model_name)
+        model.objects.update(**{name: ExpressionWrapper(
+            F(temporary(name)) / Value(100.0), output_field=DecimalField(max_digits=14, decimal_places=2),
+        )})
+
+
+def relaxed_field(model_name, name):
+    # Прежний столбец, но допускающий NULL: при откате он добавляется
+    # заново пустым и заполняется из кодов до возврата NOT NULL
+    if (model_name, name) in STATUS_FIELDS:
+        return models.CharField(max_length=50, null=True)
+    return models.DecimalField(max_digits=MONEY_FIELDS[model_name, name], decimal_places=2, null=True)
+
+
+def status_field(verbose_name, labels, default=None, db_index=False):
+    options = {'default': default} if default else {}
+    return models.SmallIntegerField(
+        verbose_name, choices=list(enumerate(labels, start=1)), db_index=db_index, **options,
+    )
+
+
+FINAL_FIELDS = {
+    ('room', 'status'): status_field('Статус номера', STATUS_FIELDS['room', 'status'], 1, db_index=True),
+    ('booking', 'status'): status_field('Статус бронирования', STATUS_FIELDS['booking', 'status'], 1),
+    ('payment', 'status'): status_field('Статус платежа', STATUS_FIELDS['payment', 'status'], 1),
+    ('payment', 'payment_method'): status_field('Метод оплаты', STATUS_FIELDS['payment', 'payment_method']),
+    ('accommodation', 'status'): status_field('Статус проживания', STATUS_FIELDS['accommodation', 'status'], 1),
+    ('roomtype', 'price_per_night'): hotel.fields.MoneyField('Стоимость за ночь', max_digits=10),
+    ('product', 'price'): hotel.fields.MoneyField('Стоимость', max_digits=10),
+    ('service', 'price'): hotel.fields.MoneyField('Стоимость', max_digits=10),
+    ('booking', 'total_price'): hotel.fields.MoneyField('Общая стоимость', max_digits=10, blank=True, null=True),
+    ('booking', 'charges'): hotel.fields.MoneyField('Начислено', default=0),
+    ('booking', 'paid'): hotel.fields.MoneyField('Оплачено', default=0),
+    ('booking', 'outstanding'): hotel.fields.MoneyField('К оплате', default=0),
+    ('payment', 'amount'): hotel.fields.MoneyField('Сумма платежа', max_digits=10),
+    ('productorder', 'total_price'): hotel.fields.MoneyField('Общая стоимость', max_digits=10, blank=True, null=True),
+    ('serviceorder', 'total_price'): hotel.fields.MoneyField('Общая стоимость', max_digits=10, blank=True, null=True),
+    ('dailystat', 'revenue'): hotel.fields.MoneyField('Выручка', max_digits=14, default=0),
+}
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0009_change_event'),
+    ]
+
+    operations = [
+        # Частичный индекс ссылается на outstanding — пересоздаётся после замены столбца
+        migrations.RemoveIndex(model_name='booking', name='booking_outstanding_idx'),
+        *[
+            migrations.AddField(
+                model_name=model_name, name=temporary(name), field=models.SmallIntegerField(null=True),
+            )
+            for model_name, name in STATUS_FIELDS
+        ],
+        *[
+            migrations.AddField(
+                model_name=model_name, name=temporary(name), field=models.BigIntegerField(null=True),
+            )
+            for model_name, name in MONEY_FIELDS
+        ],
+        *[
+            migrations.AlterField(model_name=model_name, name=name, field=relaxed_field(model_name, name))
+            for model_name, name in FINAL_FIELDS
+        ],
+        migrations.RunPython(convert_forward, convert_backward),
+        *[
+            operation
+            for (model_name, name), field in FINAL_FIELDS.items()
+            for operation in (
+                migrations.RemoveField(model_name=model_name, name=name),
+                migrations.RenameField(model_name=model_name, old_name=temporary(name), new_name=name),
+                migrations.AlterField(model_name=model_name, name=name, field=field),
+            )
+        ],
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(
+                condition=models.Q(outstanding__gt=0), fields=['outstanding', 'id'], name='booking_outstanding_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'checkin_date'], name='booking_status_checkin_idx'),
+        ),
+    ]
@@ -1,8 +1,29 @@
-from django.db import models
+import datetime
+from contextlib import nullcontext
+
+from django.db import models, transaction, IntegrityError
+from django.db.models import Count, F, Q, Sum, Value
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
 
+from .fields import MoneyField, money_value
+from .search import client_tokens, prefix_range, query_terms
+
+
+
+class ClientQuerySet(models.QuerySet):
+    def search(self, query):
+        terms = query_terms(query)
+        if not terms:
+            return self.none()
+        queryset = self
+        for term in terms:
+            low, high = prefix_range(term)
+            queryset = queryset.filter(pk__in=ClientSearchToken.objects.filter(
+                token__gte=low, token__lt=high,
+            ).values('client_id'))
+        return queryset
 
 
 class Client(models.Model):
@@ -14,10 +35,15 @@ class Client(models.Model):
     passport_data = models.CharField('Паспортные данные', max_length=50, unique=True)
     registration_date = models.DateField('Дата регистрации', default=timezone.now)
 
+    objects = ClientQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Клиент'
         verbose_name_plural = 'Клиенты'
         ordering = ['-registration_date', 'last_name']
+        indexes = [
+            models.Index(fields=['registration_date', 'id'], name='client_registration_idx'),
+        ]
 
     def __str__(self):
         return f"{self.last_name} {self.first_name} {self.middle_name}"
@@ -25,10 +51,36 @@ class Client(models.Model):
     def get_full_name(self):
         return f"{self.last_name} {self.first_name} {self.middle_name}"
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.update_search_tokens()
+
+    def update_search_tokens(self):
+        ClientSearchToken.objects.filter(client=self).delete()
+        ClientSearchToken.objects.bulk_create([
+            ClientSearchToken(client=self, token=token) for token in client_tokens(self)
+        ])
+
+
+class ClientSearchToken(models.Model):
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, verbose_name='Клиент', related_name='search_tokens')
+    token = models.CharField('Токен', max_length=100)
+
+    class Meta:
+        verbose_name = 'Поисковый токен клиента'
+        verbose_name_plural = 'Поисковые токены клиентов'
+        indexes = [
+            models.Index(fields=['token', 'client'], name='client_token_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.token} → {self.client_id}"
+
 
 class RoomType(models.Model):
     name = models.CharField('Название типа', max_length=100)
-    price_per_night = models.DecimalField('Стоимость за ночь', max_digits=10, decimal_places=2)
+    price_per_night = MoneyField('Стоимость за ночь', max_digits=10)
 
     class Meta:
         verbose_name = 'Тип номера'
@@ -65,7 +117,7 @@ class Position(models.Model):
 class Product(models.Model):
     name = models.CharField('Название товара', max_length=100)
     description = models.TextField('Описание')
-    price = models.DecimalField('Стоимость', max_digits=10, decimal_places=2)
+    price = MoneyField('Стоимость', max_digits=10)
 
     class Meta:
         verbose_name = 'Товар'
@@ -78,7 +130,7 @@ class Product(models.Model):
 class Service(models.Model):
     name = models.CharField('Название услуги', max_length=100)
     description = models.TextField('Описание')
-    price = models.DecimalField('Стоимость', max_digits=10, decimal_places=2)
+    price = MoneyField('Стоимость', max_digits=10)
 
     class Meta:
         verbose_name = 'Услуга'
@@ -104,18 +156,18 @@ class Building(models.Model):
         return self.name
 
     def get_available_rooms(self):
-        return self.rooms.filter(status='Свободен')
+        return self.rooms.filter(status=Room.Status.FREE)
 
 
 class Room(models.Model):
-    ROOM_STATUS_CHOICES = [
-        ('Свободен', 'Свободен'),
-        ('Занят', 'Занят'),
-        ('На обслуживании', 'На обслуживании'),
-        ('Требует уборки', 'Требует уборки'),
-    ]
+    class Status(models.IntegerChoices):
+        FREE = 1, 'Свободен'
+        OCCUPIED = 2, 'Занят'
+        MAINTENANCE = 3, 'На обслуживании'
+        CLEANING = 4, 'Требует уборки'
+
     room_type = models.ForeignKey(RoomType, on_delete=models.CASCADE, verbose_name='Тип номера', related_name='rooms')
-    status = models.CharField('Статус номера', max_length=50, choices=ROOM_STATUS_CHOICES, default='Свободен')
+    status = models.SmallIntegerField('Статус номера', choices=Status.choices, default=Status.FREE, db_index=True)
     building = models.ForeignKey(Building, on_delete=models.CASCADE, verbose_name='Здание', related_name='rooms')
     room_number = models.CharField('Номер комнаты', max_length=20)
 
@@ -125,44 +177,107 @@ class Room(models.Model):
         unique_together = ['building', 'room_number']
 
     def __str__(self):
-        return f"{self.room_number} - {self.room_type.name} ({self.status})"
+        return f"{self.room_number} - {self.room_type.name} ({self.get_status_display()})"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
-    def is_available(self, checkin_date, checkout_date):
-        conflicts = self.bookings.filter(
-            status__in=['Подтвержден', 'Оплачен'],
-            checkin_date__lt=checkout_date,
-            checkout_date__gt=checkin_date
+    def save(self, *args, **kwargs):
+        old = getattr(self, '_loaded_values', None)
+        old_key = old and (old.get('building_id', self.building_id), old.get('room_type_id', self.room_type_id))
+        # Сводка ведётся по гостинице и типу номера: при переносе номера
+        # его ночи, выручка и доступность переходят под новый ключ.
+        # Смена статуса транзакцию не открывает
+        moved = bool(old_key) and old_key != (self.building_id, self.room_type_id)
+        with transaction.atomic() if moved else nullcontext():
+            super().save(*args, **kwargs)
+            if moved:
+                DailyStat.objects.move_room(self, *old_key, since=timezone.localdate())
+        self._loaded_values = {
+            'status': self.status, 'building_id': self.building_id, 'room_type_id': self.room_type_id,
+        }
+
+    def set_status(self, status):
+        # Переход статуса: один UPDATE только этого поля, без повтора
+        if self.status != status:
+            self.status = status
+            self.save(update_fields=['status'])
+
+    def is_available(self, checkin_date, checkout_date, exclude_booking=None):
+        if self.status != self.Status.FREE:
+            return False
+        return not RoomNight.objects.overlapping(
+            self, checkin_date, checkout_date, exclude_booking=exclude_booking
+        ).exists()
+
+
+class BookingQuerySet(models.QuerySet):
+    def adjust_folio(self, booking_id, charges=0, paid=0):
+        # Счёт гостя меняется приращениями через F(): параллельные платежи
+        # и заказы по одной брони не затирают друг друга
+        if booking_id is None or not (charges or paid):
+            return
+        self.filter(pk=booking_id).update(
+            charges=F('charges') + money_value(charges),
+            paid=F('paid') + money_value(paid),
+            outstanding=F('outstanding') + money_value(charges - paid),
+            # update() не трогает auto_now, а по updated_at клиенты API
+            # узнают об изменении брони
+            updated_at=timezone.now(),
         )
-        return not conflicts.exists() and self.status == 'Свободен'
 
 
 class Booking(models.Model):
-    BOOKING_STATUS_CHOICES = [
-        ('Новый', 'Новый'),
-        ('Подтвержден', 'Подтвержден'),
-        ('Оплачен', 'Оплачен'),
-        ('Отменен', 'Отменен'),
-        ('Завершен', 'Завершен'),
-    ]
+    class Status(models.IntegerChoices):
+        NEW = 1, 'Новый'
+        CONFIRMED = 2, 'Подтвержден'
+        PAID = 3, 'Оплачен'
+        CANCELLED = 4, 'Отменен'
+        COMPLETED = 5, 'Завершен'
+
+    # Статусы, при которых бронь занимает номер
+    ACTIVE_STATUSES = [Status.CONFIRMED, Status.PAID]
+
     client = models.ForeignKey(Client, on_delete=models.CASCADE, verbose_name='Клиент', related_name='bookings')
     room = models.ForeignKey(Room, on_delete=models.CASCADE, verbose_name='Номер', related_name='bookings')
     checkin_date = models.DateField('Дата заезда')
     checkout_date = models.DateField('Дата выезда')
-    total_price = models.DecimalField('Общая стоимость', max_digits=10, decimal_places=2, blank=True, null=True)
-    status = models.CharField('Статус бронирования', max_length=50, choices=BOOKING_STATUS_CHOICES, default='Новый')
+    total_price = MoneyField('Общая стоимость', max_digits=10, blank=True, null=True)
+    status = models.SmallIntegerField('Статус бронирования', choices=Status.choices, default=Status.NEW)
     created_at = models.DateTimeField('Дата создания', auto_now_add=True)
     updated_at = models.DateTimeField('Дата обновления', auto_now=True)
+    # Счёт гостя: проживание, товары и услуги против оплаченных платежей.
+    # Поддерживается сохранениями Booking, ProductOrder, ServiceOrder и Payment.
+    charges = MoneyField('Начислено', max_digits=12, default=0)
+    paid = MoneyField('Оплачено', max_digits=12, default=0)
+    outstanding = MoneyField('К оплате', max_digits=12, default=0)
+
+    FOLIO_FIELDS = ('charges', 'paid', 'outstanding')
+    # Поля, от которых зависят цена и занятые ночи
+    STAY_FIELDS = ('room_id', 'checkin_date', 'checkout_date')
+
+    objects = BookingQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Бронирование'
         verbose_name_plural = 'Бронирования'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='booking_created_idx'),
+            # Частичный индекс: в нём только брони с долгом
+            models.Index(fields=['outstanding', 'id'], name='booking_outstanding_idx', condition=Q(outstanding__gt=0)),
+            # Активные брони и ближайшие заезды на панели. У статусов платежей
+            # и проживаний по 2–3 значения: отдельный индекс там только
+            # уводит SQLite со сканирования таблицы на более медленный поиск
+            models.Index(fields=['status', 'checkin_date'], name='booking_status_checkin_idx'),
+        ]
 
     def __str__(self):
         return f"Бронь #{self.pk} - {self.client} ({self.checkin_date} - {self.checkout_date})"
 
-
-
     def clean(self):
         if not self.checkin_date or not self.checkout_date:
             raise ValidationError('Обе даты (заезда и выезда) должны быть заполнены.')
@@ -170,66 +285,219 @@ class Booking(models.Model):
         if self.checkin_date >= self.checkout_date:
             raise ValidationError('Дата заезда должна быть раньше даты выезда.')
 
-        qs = Booking.objects.filter(
-            room=self.room,
-            status__in=['Подтвержден', 'Оплачен'],
-            checkin_date__lt=self.checkout_date,
-            checkout_date__gt=self.checkin_date
-        )
-        if self.pk:
-            qs = qs.exclude(pk=self.pk)
-        if qs.exists():
+        if RoomNight.objects.overlapping(
+            self.room_id, self.checkin_date, self.checkout_date, exclude_booking=self.pk
+        ).exists():
             raise ValidationError('Номер недоступен в выбранные даты')
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    @staticmethod
+    def room_charge(status, total_price):
+        if status == Booking.Status.CANCELLED or total_price is None:
+            return 0
+        return total_price
+
+    def stay_changed(self, old):
+        return old is None or any(
+            field not in old or old[field] != getattr(self, field) for field in self.STAY_FIELDS
+        )
+
     def save(self, *args, **kwargs):
-        if self.checkin_date and self.checkout_date:
+        old = getattr(self, '_loaded_values', None)
+        adding = self._state.adding
+        stay_changed = adding or self.stay_changed(old)
+        # Цена пересчитывается, только когда сменились номер или даты:
+        # смена статуса не читает тип номера заново
+        if stay_changed and self.checkin_date and self.checkout_date:
             delta = self.checkout_date - self.checkin_date
             days = delta.days
             self.total_price = self.room.room_type.price_per_night * days
-        super().save(*args, **kwargs)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'total_price'}
+        was_active = old is not None and old.get('status') in self.ACTIVE_STATUSES
+        if adding:
+            self.charges = self.room_charge(self.status, self.total_price)
+            self.outstanding = self.charges - self.paid
+        elif kwargs.get('update_fields') is None:
+            # Поля счёта меняются только приращениями: полное сохранение
+            # устаревшего экземпляра затёрло бы параллельный платёж
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.FOLIO_FIELDS
+            ]
+        is_active = self.status in self.ACTIVE_STATUSES
+        # Точка сохранения нужна, только если бронь занимает новые ночи:
+        # отказ из-за пересечения не должен ломать транзакцию вызывающего
+        # кода. Остальные переходы пишутся прямо в его транзакцию
+        claims_nights = is_active and (stay_changed or not was_active)
+        with transaction.atomic(savepoint=claims_nights):
+            super().save(*args, **kwargs)
+            if stay_changed or was_active != is_active:
+                self.sync_nights(release=not adding)
+            if old is not None and old.get('room_id', self.room_id) != self.room_id:
+                DailyStat.objects.move_revenue(self, old['room_id'])
+            if old is not None:
+                self.sync_folio(old)
+        self._loaded_values = {
+            'status': self.status, 'total_price': self.total_price,
+            **{field: getattr(self, field) for field in self.STAY_FIELDS},
+        }
+
+    def set_status(self, status):
+        # Переход статуса: UPDATE только статуса и времени изменения;
+        # ночи и счёт меняются, лишь если переход их затрагивает
+        self.status = status
+        self.save(update_fields=['status', 'updated_at'])
+
+    def sync_folio(self, old):
+        delta = self.room_charge(self.status, self.total_price) - self.room_charge(old['status'], old['total_price'])
+        if delta:
+            Booking.objects.adjust_folio(self.pk, charges=delta)
+            self.charges += delta
+            self.outstanding += delta
+
+    def get_nights(self):
+        night = self.checkin_date
+        while night < self.checkout_date:
+            yield night
+            night += datetime.timedelta(days=1)
+
+    def sync_nights(self, release=True):
+        # Индекс занятости: одна строка на каждую ночь активной брони.
+        # Уникальность (номер, ночь) не даёт двум броням занять одну ночь,
+        # даже если проверки в двух запросах прошли одновременно.
+        if release:
+            old_nights = RoomNight.objects.filter(booking=self)
+            DailyStat.objects.add_occupancy(
+                old_nights.values_list('room__building_id', 'room__room_type_id', 'night'), -1
+            )
+            old_nights.delete()
+        if self.status not in self.ACTIVE_STATUSES:
+            return
+        try:
+            with transaction.atomic():
+                nights = RoomNight.objects.bulk_create([
+                    RoomNight(room_id=self.room_id, night=night, booking=self)
+                    for night in self.get_nights()
+                ])
+        except IntegrityError:
+            raise ValidationError('Номер недоступен в выбранные даты')
+        DailyStat.objects.add_occupancy(
+            [(self.room.building_id, self.room.room_type_id, n.night) for n in nights], 1
+        )
+
+
+class RoomNightQuerySet(models.QuerySet):
+    def overlapping(self, room, checkin_date, checkout_date, exclude_booking=None):
+        qs = self.filter(room=room, night__gte=checkin_date, night__lt=checkout_date)
+        if exclude_booking is not None:
+            qs = qs.exclude(booking=exclude_booking)
+        return qs
+
+
+class RoomNight(models.Model):
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, verbose_name='Номер', related_name='nights')
+    night = models.DateField('Ночь')
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, verbose_name='Бронирование', related_name='nights')
+
+    objects = RoomNightQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Занятая ночь'
+        verbose_name_plural = 'Занятые ночи'
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'night'], name='unique_room_night'),
+        ]
+
+    def __str__(self):
+        return f"{self.room.room_number} — {self.night} (бронь #{self.booking_id})"
 
 
 class Payment(models.Model):
-    PAYMENT_METHOD_CHOICES = [
-        ('Наличные', 'Наличные'),
-        ('Карта', 'Карта'),
-        ('Онлайн', 'Онлайн'),
-    ]
-    PAYMENT_STATUS_CHOICES = [
-        ('Оплачен', 'Оплачен'),
-        ('Отменен', 'Отменен'),
-        ('Возврат', 'Возврат'),
-    ]
+    class Method(models.IntegerChoices):
+        CASH = 1, 'Наличные'
+        CARD = 2, 'Карта'
+        ONLINE = 3, 'Онлайн'
+
+    class Status(models.IntegerChoices):
+        PAID = 1, 'Оплачен'
+        CANCELLED = 2, 'Отменен'
+        REFUND = 3, 'Возврат'
+
     booking = models.ForeignKey(Booking, on_delete=models.CASCADE, verbose_name='Бронирование', related_name='payments')
-    amount = models.DecimalField('Сумма платежа', max_digits=10, decimal_places=2)
+    amount = MoneyField('Сумма платежа', max_digits=10)
     payment_date = models.DateField('Дата платежа', default=timezone.now)
-    payment_method = models.CharField('Метод оплаты', max_length=50, choices=PAYMENT_METHOD_CHOICES)
-    status = models.CharField('Статус платежа', max_length=50, choices=PAYMENT_STATUS_CHOICES, default='Оплачен')
+    payment_method = models.SmallIntegerField('Метод оплаты', choices=Method.choices)
+    status = models.SmallIntegerField('Статус платежа', choices=Status.choices, default=Status.PAID)
 
     class Meta:
         verbose_name = 'Платеж'
         verbose_name_plural = 'Платежи'
         ordering = ['-payment_date']
+        indexes = [
+            models.Index(fields=['payment_date', 'id'], name='payment_date_idx'),
+        ]
 
     def __str__(self):
         return f"Платеж {self.amount} руб. - {self.booking}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        if self.status == 'Оплачен':
-            self.booking.status = 'Оплачен'
-            self.booking.save()
+        old = getattr(self, '_loaded_values', None)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.update_daily_stats(old)
+            self.update_folio(old)
+            # Проведённый платёж переводит ожидающую бронь в «Оплачен»;
+            # завершённую или отменённую бронь он не трогает
+            if self.status == self.Status.PAID and self.booking.status in (Booking.Status.NEW, Booking.Status.CONFIRMED):
+                self.booking.set_status(Booking.Status.PAID)
+        self._loaded_values = {
+            'booking_id': self.booking_id, 'payment_date': self.payment_date,
+            'amount': self.amount, 'status': self.status,
+        }
+
+    def update_daily_stats(self, old):
+        new = {'booking_id': self.booking_id, 'payment_date': self.payment_date, 'amount': self.amount}
+        if old is not None:
+            old = {field: old[field] for field in new}
+            if old == new:
+                return
+            DailyStat.objects.add_revenue(old['booking_id'], old['payment_date'], -old['amount'])
+        DailyStat.objects.add_revenue(self.booking_id, self.payment_date, self.amount)
+
+    def folio_amount(self):
+        # В счёт идут только проведённые платежи
+        return self.amount if self.status == self.Status.PAID else 0
+
+    def update_folio(self, old):
+        if old is not None:
+            old_amount = old['amount'] if old['status'] == self.Status.PAID else 0
+            if (old['booking_id'], old_amount) == (self.booking_id, self.folio_amount()):
+                return
+            Booking.objects.adjust_folio(old['booking_id'], paid=-old_amount)
+        Booking.objects.adjust_folio(self.booking_id, paid=self.folio_amount())
 
 
 class Accommodation(models.Model):
-    ACCOMMODATION_STATUS_CHOICES = [
-        ('Проживает', 'Проживает'),
-        ('Выехал', 'Выехал'),
-    ]
+    class Status(models.IntegerChoices):
+        STAYING = 1, 'Проживает'
+        CHECKED_OUT = 2, 'Выехал'
+
     booking = models.OneToOneField(Booking, on_delete=models.CASCADE, verbose_name='Бронирование', related_name='accommodation')
     actual_checkin_date = models.DateField('Фактическая дата заезда')
     actual_checkout_date = models.DateField('Фактическая дата выезда', null=True, blank=True)
-    status = models.CharField('Статус проживания', max_length=50, choices=ACCOMMODATION_STATUS_CHOICES, default='Проживает')
+    status = models.SmallIntegerField('Статус проживания', choices=Status.choices, default=Status.STAYING)
 
     class Meta:
         verbose_name = 'Проживание'
@@ -238,19 +506,31 @@ class Accommodation(models.Model):
     def __str__(self):
         return f"Проживание для {self.booking.client} в номере {self.booking.room.room_number}"
 
-    def save(self, *args, **kwargs):
-        is_new = self.pk is None
-        super().save(*args, **kwargs)
-        if is_new:
-            self.booking.room.status = 'Занят'
-            self.booking.room.save()
-            self.booking.status = 'Завершен'
-            self.booking.save()
-        if self.status == 'Выехал' and self.actual_checkout_date:
-            self.booking.room.status = 'Требует уборки'
-            self.booking.room.save()
-
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
+    def save(self, *args, **kwargs):
+        old = getattr(self, '_loaded_values', None)
+        is_new = self._state.adding
+        # Заселение и выезд — переходы статусов номера и брони в одной
+        # транзакции; номер и бронь обновляются только изменившимися полями
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if is_new:
+                self.booking.room.set_status(Room.Status.OCCUPIED)
+                self.booking.set_status(Booking.Status.COMPLETED)
+            checked_out = old is not None and old.get('status') == self.Status.CHECKED_OUT
+            if self.status == self.Status.CHECKED_OUT and self.actual_checkout_date and not checked_out:
+                self.booking.room.set_status(Room.Status.CLEANING)
+        self._loaded_values = {'status': self.status}
+
+    def check_out(self, date):
+        self.actual_checkout_date = date
+        self.status = self.Status.CHECKED_OUT
+        self.save(update_fields=['actual_checkout_date', 'status'])
 
 
 class Employee(models.Model):
@@ -285,12 +565,27 @@ class EmployeePositions(models.Model):
         return f"{self.employee} - {self.position}"
 
 
+def charge_order_to_folio(order, old, sign=1):
+    # Заказ товара или услуги добавляет свою стоимость в счёт брони,
+    # к которой относится проживание; sign=-1 — снять при удалении
+    def booking_id(accommodation_id):
+        return Accommodation.objects.filter(pk=accommodation_id).values_list('booking_id', flat=True).first()
+
+    amount = sign * (order.total_price or 0)
+    if old is not None:
+        old_amount = old['total_price'] or 0
+        if (old['accommodation_id'], old_amount) == (order.accommodation_id, amount):
+            return
+        Booking.objects.adjust_folio(booking_id(old['accommodation_id']), charges=-old_amount)
+    Booking.objects.adjust_folio(booking_id(order.accommodation_id), charges=amount)
+
+
 class ProductOrder(models.Model):
     accommodation = models.ForeignKey(Accommodation, on_delete=models.CASCADE, verbose_name='Проживание', related_name='product_orders')
     product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name='Товар')
     order_date = models.DateField('Дата заказа', default=timezone.now)
     quantity = models.IntegerField('Количество', validators=[MinValueValidator(1)])
-    total_price = models.DecimalField('Общая стоимость', max_digits=10, decimal_places=2, blank=True, null=True)
+    total_price = MoneyField('Общая стоимость', max_digits=10, blank=True, null=True)
 
     class Meta:
         verbose_name = 'Заказ товара'
@@ -300,24 +595,55 @@ class ProductOrder(models.Model):
     def __str__(self):
         return f"Заказ {self.product.name} для {self.accommodation.booking.client.get_full_name()}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def get_building_id(self, accommodation_id=None):
+        return Room.objects.filter(
+            bookings__accommodation=accommodation_id or self.accommodation_id
+        ).values_list('building_id', flat=True).first()
+
     def save(self, *args, **kwargs):
         if self.total_price is None:
             self.total_price = self.product.price * self.quantity
-        super().save(*args, **kwargs)
-        try:
-            hp = BuildingProducts.objects.get(product=self.product, building=self.accommodation.booking.room.building)
-            if hp.available >= self.quantity:
-                hp.available -= self.quantity
-                hp.save()
-        except BuildingProducts.DoesNotExist:
-            pass
+        old = getattr(self, '_loaded_values', None)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.sync_stock(old)
+            charge_order_to_folio(self, old)
+        self._loaded_values = {
+            'accommodation_id': self.accommodation_id, 'product_id': self.product_id,
+            'quantity': self.quantity, 'total_price': self.total_price,
+        }
+
+    def sync_stock(self, old):
+        # Списание со склада гостиницы. При изменении заказа прежнее
+        # количество возвращается и списывается новое — в одной транзакции,
+        # поэтому при нехватке товара заказ не сохранится.
+        new = {
+            'accommodation_id': self.accommodation_id,
+            'product_id': self.product_id,
+            'quantity': self.quantity,
+        }
+        if old is not None:
+            old = {field: old[field] for field in new}
+            if old == new:
+                return
+            BuildingProducts.objects.put(
+                old['product_id'], self.get_building_id(old['accommodation_id']), old['quantity'],
+                reason='Возврат', order=self,
+            )
+        BuildingProducts.objects.take(self.product_id, self.get_building_id(), self.quantity, order=self)
 
 
 class ServiceOrder(models.Model):
     accommodation = models.ForeignKey(Accommodation, on_delete=models.CASCADE, verbose_name='Проживание', related_name='service_orders')
     service = models.ForeignKey(Service, on_delete=models.CASCADE, verbose_name='Услуга')
     order_date = models.DateField('Дата заказа', default=timezone.now)
-    total_price = models.DecimalField('Общая стоимость', max_digits=10, decimal_places=2, blank=True, null=True)
+    total_price = MoneyField('Общая стоимость', max_digits=10, blank=True, null=True)
 
     class Meta:
         verbose_name = 'Заказ услуги'
@@ -327,16 +653,72 @@ class ServiceOrder(models.Model):
     def __str__(self):
         return f"Заказ услуги {self.service.name} для {self.accommodation.booking.client.get_full_name()}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def save(self, *args, **kwargs):
         if self.total_price is None:
             self.total_price = self.service.price
-        super().save(*args, **kwargs)
+        old = getattr(self, '_loaded_values', None)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            charge_order_to_folio(self, old)
+        self._loaded_values = {'accommodation_id': self.accommodation_id, 'total_price': self.total_price}
+
+
+class BuildingProductsManager(models.Manager):
+    # Остаток меняется только через take/put: условный UPDATE с F()
+    # выполняется базой атомарно, а каждая операция пишется в журнал
+    # StockMovement в той же транзакции.
+    def take(self, product_id, building_id, quantity, reason='Заказ', order=None):
+        conditions = {'quantity__gte': quantity}
+        if reason == 'Заказ':
+            # Заказать можно только товар, отмеченный «в наличии»
+            conditions['is_available'] = True
+        with transaction.atomic():
+            updated = self.filter(
+                product_id=product_id, building_id=building_id, **conditions
+            ).update(quantity=F('quantity') - quantity)
+            if not updated:
+                stock = self.filter(product_id=product_id, building_id=building_id).first()
+                if stock is None or reason == 'Заказ' and not stock.is_available:
+                    raise ValidationError('Этот товар недоступен для заказа.')
+                raise ValidationError(f'Недостаточно товара на складе: осталось {stock.quantity}.')
+            StockMovement.objects.create(
+                product_id=product_id, building_id=building_id, delta=-quantity,
+                reason=reason, order=order,
+            )
+
+    def put(self, product_id, building_id, quantity, reason='Поступление', order=None):
+        with transaction.atomic():
+            updated = self.filter(product_id=product_id, building_id=building_id).update(
+                quantity=F('quantity') + quantity
+            )
+            if not updated:
+                try:
+                    with transaction.atomic():
+                        self.create(product_id=product_id, building_id=building_id, quantity=quantity)
+                except IntegrityError:
+                    # Строку успели создать параллельно
+                    self.filter(product_id=product_id, building_id=building_id).update(
+                        quantity=F('quantity') + quantity
+                    )
+            StockMovement.objects.create(
+                product_id=product_id, building_id=building_id, delta=quantity,
+                reason=reason, order=order,
+            )
 
 
 class BuildingProducts(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name='Товар')
     building = models.ForeignKey(Building, on_delete=models.CASCADE, verbose_name='Гостиница')
     is_available = models.BooleanField('В наличии', default=False)
+    quantity = models.PositiveIntegerField('Остаток', default=0)
+
+    objects = BuildingProductsManager()
 
     class Meta:
         verbose_name = 'Товар в гостинице'
@@ -344,10 +726,36 @@ class BuildingProducts(models.Model):
         unique_together = ['product', 'building']
 
     def __str__(self):
-        status = 'в наличии' if self.is_available else 'нет в наличии'
+        status = f'остаток {self.quantity}' if self.is_available else 'нет в наличии'
         return f"{self.product.name} в {self.building.name} — {status}"
 
 
+class StockMovement(models.Model):
+    REASON_CHOICES = [
+        ('Поступление', 'Поступление'),
+        ('Заказ', 'Заказ'),
+        ('Возврат', 'Возврат'),
+        ('Списание', 'Списание'),
+    ]
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name='Товар', related_name='stock_movements')
+    building = models.ForeignKey(Building, on_delete=models.CASCADE, verbose_name='Гостиница', related_name='stock_movements')
+    delta = models.IntegerField('Изменение')
+    reason = models.CharField('Причина', max_length=50, choices=REASON_CHOICES)
+    order = models.ForeignKey(ProductOrder, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='Заказ', related_name='stock_movements')
+    created_at = models.DateTimeField('Дата', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Движение товара'
+        verbose_name_plural = 'Движения товаров'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['product', 'building', 'created_at'], name='stock_movement_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} в {self.building.name}: {self.delta:+d} ({self.reason})"
+
+
 class BuildingServices(models.Model):
     service = models.ForeignKey(Service, on_delete=models.CASCADE, verbose_name='Услуга')
     building = models.ForeignKey(Building, on_delete=models.CASCADE, verbose_name='Гостиница')
@@ -361,3 +769,172 @@ class BuildingServices(models.Model):
     def __str__(self):
         status = 'активна' if self.is_active else 'неактивна'
         return f"{self.service.name} в {self.building.name} — {status}"
+
+
+class DailyStatManager(models.Manager):
+    # Сводка обновляется приращениями из сохранений платежей и броней;
+    # rebuild() пересчитывает её с нуля (команда rebuild_daily_stats).
+    def _bump(self, building_id, room_type_id, days, **deltas):
+        days = set(days)
+        lookup = {'building_id': building_id, 'room_type_id': room_type_id}
+        # Приращение приводится к типу столбца: выручка — в копейках
+        updates = {
+            field: F(field) + Value(delta, output_field=self.model._meta.get_field(field))
+            for field, delta in deltas.items()
+        }
+        updated = self.filter(day__in=days, **lookup).update(**updates)
+        if updated == len(days):
+            return
+        missing = days - set(self.filter(day__in=days, **lookup).values_list('day', flat=True))
+        available = Room.objects.filter(**lookup).count()
+        for day in missing:
+            try:
+                with transaction.atomic():
+                    self.create(day=day, available_nights=available, **lookup, **deltas)
+            except IntegrityError:
+                # Строку успели создать параллельно
+                self.filter(day=day, **lookup).update(**updates)
+
+    def add_revenue(self, booking_id, day, amount):
+        room = Room.objects.filter(bookings=booking_id).values('building_id', 'room_type_id').first()
+        if room and amount:
+            self._bump(room['building_id'], room['room_type_id'], [day], revenue=amount)
+
+    def add_occupancy(self, nights, delta):
+        grouped = {}
+        for building_id, room_type_id, night in nights:
+            grouped.setdefault((building_id, room_type_id), []).append(night)
+        for (building_id, room_type_id), days in grouped.items():
+            self._bump(building_id, room_type_id, days, occupied_nights=delta)
+
+    def _move(self, old_key, new_key, nights, revenue):
+        if old_key == new_key:
+            return
+        for (building_id, room_type_id), sign in ((old_key, -1), (new_key, 1)):
+            if nights:
+                self._bump(building_id, room_type_id, nights, occupied_nights=sign)
+            for day, total in revenue:
+                if total:
+                    self._bump(building_id, room_type_id, [day], revenue=sign * total)
+
+    def move_revenue(self, booking, old_room_id):
+        # Бронь переехала в другой номер; её ночи переносит sync_nights
+        keys = {
+            pk: (building_id, room_type_id) for pk, building_id, room_type_id in
+            Room.objects.filter(pk__in=[old_room_id, booking.room_id]).values_list('pk', 'building_id', 'room_type_id')
+        }
+        if old_room_id in keys and booking.room_id in keys:
+            revenue = Payment.objects.filter(booking=booking).values_list('payment_date').annotate(total=Sum('amount'))
+            self._move(keys[old_room_id], keys[booking.room_id], (), revenue.order_by())
+
+    def move_room(self, room, old_building_id, old_room_type_id, since):
+        old_key, new_key = (old_building_id, old_room_type_id), (room.building_id, room.room_type_id)
+        # Сначала доступность: недостающие строки нового ключа _bump
+        # создаёт уже с учётом перенесённого номера
+        for (building_id, room_type_id), sign in ((old_key, -1), (new_key, 1)):
+            self.filter(
+                building_id=building_id, room_type_id=room_type_id, day__gte=since
+            ).update(available_nights=F('available_nights') + sign)
+        nights = list(RoomNight.objects.filter(room=room).values_list('night', flat=True))
+        revenue = Payment.objects.filter(booking__room=room).values_list('payment_date').annotate(total=Sum('amount'))
+        self._move(old_key, new_key, nights, revenue.order_by())
+
+    def add_room(self, room, delta, since):
+        self.filter(
+            building_id=room.building_id, room_type_id=room.room_type_id, day__gte=since
+        ).update(available_nights=F('available_nights') + delta)
+
+    def rebuild(self, start=None, end=None):
+        def in_range(qs, field):
+            if start:
+                qs = qs.filter(**{f'{field}__gte': start})
+            if end:
+                qs = qs.filter(**{f'{field}__lte': end})
+            return qs
+
+        rows = {}
+
+        def row(building_id, room_type_id, day):
+            key = (building_id, room_type_id, day)
+            if key not in rows:
+                rows[key] = DailyStat(building_id=building_id, room_type_id=room_type_id, day=day)
+            return rows[key]
+
+        revenue = in_range(Payment.objects.all(), 'payment_date').values_list(
+            'booking__room__building_id', 'booking__room__room_type_id', 'payment_date'
+        ).annotate(total=Sum('amount')).order_by()
+        for building_id, room_type_id, day, total in revenue:
+            row(building_id, room_type_id, day).revenue = total
+
+        occupancy = in_range(RoomNight.objects.all(), 'night').values_list(
+            'room__building_id', 'room__room_type_id', 'night'
+        ).annotate(total=Count('pk')).order_by()
+        for building_id, room_type_id, day, total in occupancy:
+            row(building_id, room_type_id, day).occupied_nights = total
+
+        rooms = dict(
+            ((building_id, room_type_id), total) for building_id, room_type_id, total in
+            Room.objects.values_list('building_id', 'room_type_id').annotate(total=Count('pk')).order_by()
+        )
+        for (building_id, room_type_id, day), stat in rows.items():
+            stat.available_nights = rooms.get((building_id, room_type_id), 0)
+
+        with transaction.atomic():
+            in_range(self.all(), 'day').delete()
+            self.bulk_create(rows.values(), batch_size=1000)
+        return len(rows)
+
+
+class DailyStat(models.Model):
+    building = models.ForeignKey(Building, on_delete=models.CASCADE, verbose_name='Гостиница', related_name='daily_stats')
+    room_type = models.ForeignKey(RoomType, on_delete=models.CASCADE, verbose_name='Тип номера', related_name='daily_stats')
+    day = models.DateField('День')
+    revenue = MoneyField('Выручка', max_digits=14, default=0)
+    occupied_nights = models.IntegerField('Занято номеро-ночей', default=0)
+    available_nights = models.IntegerField('Доступно номеро-ночей', default=0)
+
+    objects = DailyStatManager()
+
+    class Meta:
+        verbose_name = 'Сводка за день'
+        verbose_name_plural = 'Сводки по дням'
+        constraints = [
+            models.UniqueConstraint(fields=['building', 'room_type', 'day'], name='unique_daily_stat'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='daily_stat_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.building} / {self.room_type.name} — {self.day}"
+
+
+class ChangeEvent(models.Model):
+    # Журнал смен статусов номеров, броней и проживаний; только добавление.
+    # seq растёт монотонно: клиент запрашивает «всё после seq N»
+    MODEL_CHOICES = [
+        ('room', 'Номер'),
+        ('booking', 'Бронирование'),
+        ('accommodation', 'Проживание'),
+    ]
+    seq = models.BigAutoField('Номер события', primary_key=True)
+    created_at = models.DateTimeField('Время', auto_now_add=True)
+    model = models.CharField('Объект', max_length=20, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField('Идентификатор объекта')
+    building = models.ForeignKey(
+        Building, on_delete=models.SET_NULL, null=True, blank=True,
+        verbose_name='Гостиница', related_name='change_events',
+    )
+    old_status = models.CharField('Прежний статус', max_length=50, blank=True)
+    new_status = models.CharField('Новый статус', max_length=50, blank=True)
+
+    class Meta:
+        verbose_name = 'Событие изменения'
+        verbose_name_plural = 'Лента изменений'
+        ordering = ['seq']
+        indexes = [
+            models.Index(fields=['building', 'seq'], name='change_event_building_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.seq} {self.get_model_display()} {self.object_id}: {self.old_status} → {self.new_status}"
@@ -0,0 +1,92 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+# === Кэш страниц справочников ===
+# Готовый HTML страницы хранится под ключом, в который входят версии
+# моделей, из которых она собрана. Сигналы post_save/post_delete поднимают
+# версию модели, и следующий запрос рендерит страницу заново — срок
+# жизни записи нужен только для вытеснения, а не для свежести.
+# Ключ учитывает пользователя (шапка страницы и права), его секрет CSRF
+# (токен в формах шапки), страницу и строку запроса, а для страниц,
+# зависящих от гостиницы, — текущую гостиницу.
+
+PAGE_CACHE_KEY = 'pages:{}'
+PAGE_VERSION_KEY = 'pages:version:{}'
+USER_VERSION_KEY = 'pages:user:{}'
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def version_label(model):
+    return model._meta.label_lower
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Версии нет в кэше: начинаем с отметки времени, чтобы не совпасть
+        # с версией, под которой страница была сохранена до вытеснения
+        cache.set(key, time.time_ns(), None)
+
+
+def invalidate_pages(model):
+    key = PAGE_VERSION_KEY.format(version_label(model))
+    transaction.on_commit(lambda: bump_version(key))
+
+
+def invalidate_user_pages(user_id):
+    key = USER_VERSION_KEY.format(user_id)
+    transaction.on_commit(lambda: bump_version(key))
+
+
+def get_versions(keys):
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Отсутствующая (вытесненная) версия получает новое значение, а не
+            # ноль: иначе она совпала бы с версией, сохранённой до изменений
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def model_versions(models):
+    return get_versions([PAGE_VERSION_KEY.format(version_label(model)) for model in models])
+
+
+def page_cache_key(request, view_name, models, per_building=False):
+    csrf_secret = request.META.get('CSRF_COOKIE')
+    if not csrf_secret:
+        return None
+    version_keys = [PAGE_VERSION_KEY.format(version_label(model)) for model in models]
+    version_keys.append(USER_VERSION_KEY.format(request.user.pk))
+    parts = [
+        view_name, request.user.pk, csrf_secret,
+        request.building.pk if per_building else '', request.get_full_path(),
+        *get_versions(version_keys),
+    ]
+    digest = hashlib.sha256('|'.join(map(str, parts)).encode()).hexdigest()
+    return PAGE_CACHE_KEY.format(digest)
+
+
+class CachedPageMixin:
+    # Модели, из которых собрана страница; их изменение сбрасывает кэш
+    cache_models = ()
+    # Страница зависит от выбранной гостиницы
+    cache_per_building = False
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or not request.user.is_authenticated:
+            return super().dispatch(request, *args, **kwargs)
+        key = page_cache_key(request, type(self).__name__, self.cache_models, self.cache_per_building)
+        response = cache.get(key) if key else None
+        if response is not None:
+            return response
+        response = super().dispatch(request, *args, **kwargs)
+        if key and response.status_code == 200 and not response.cookies:
+            response.add_post_render_callback(lambda rendered: cache.set(key, rendered, PAGE_CACHE_TIMEOUT))
+        return response
@@ -0,0 +1,120 @@
+import base64
+import json
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+
+# === Постраничный вывод по ключу (keyset) ===
+def encode_value(value):
+    # Даты и суммы (Decimal) — строкой; обратно их приводит to_python поля
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, previous_cursor, params, cursor_param):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self._params = params
+        self._cursor_param = cursor_param
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def _query(self, cursor):
+        params = self._params.copy()
+        params.pop(self._cursor_param, None)
+        params.pop('before', None)
+        params.pop('page', None)
+        params[cursor[0]] = cursor[1]
+        return params.urlencode()
+
+    def next_query(self):
+        return self._query((self._cursor_param, self.next_cursor))
+
+    def previous_query(self):
+        return self._query(('before', self.previous_cursor))
+
+
+class KeysetPaginationMixin:
+    # Поля ключа по убыванию; последнее поле должно быть уникальным.
+    # Для каждого набора полей нужен составной индекс в Meta.indexes.
+    keyset_fields = ('created_at', 'id')
+    cursor_param = 'after'
+
+    def encode_cursor(self, obj):
+        # obj — экземпляр модели или строка из values()
+        values = [obj[field] if isinstance(obj, dict) else getattr(obj, field) for field in self.keyset_fields]
+        raw = json.dumps([encode_value(value) for value in values])
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if len(values) != len(self.keyset_fields):
+                return None
+            return [
+                self.model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.keyset_fields, values)
+            ]
+        except (ValueError, TypeError, FieldDoesNotExist, ValidationError):
+            return None
+
+    def keyset_filter(self, values, op):
+        # (a, b) < (x, y) в виде a <= x AND (a < x OR (a = x AND b < y)):
+        # первое условие позволяет SQLite начать с нужного места индекса.
+        condition = Q()
+        for i, field in enumerate(self.keyset_fields):
+            step = Q(**{f'{field}__{op}': values[i]})
+            for prev_field, prev_value in zip(self.keyset_fields[:i], values[:i]):
+                step &= Q(**{prev_field: prev_value})
+            condition |= step
+        return Q(**{f'{self.keyset_fields[0]}__{op}e': values[0]}) & condition
+
+    def paginate_queryset(self, queryset, page_size):
+        params = self.request.GET
+        descending = [f'-{field}' for field in self.keyset_fields]
+        ascending = list(self.keyset_fields)
+
+        after = self.decode_cursor(params.get(self.cursor_param, ''))
+        before = self.decode_cursor(params.get('before', ''))
+        if before is not None:
+            rows = list(queryset.filter(self.keyset_filter(before, 'gt')).order_by(*ascending)[:page_size + 1])
+            has_more_before = len(rows) > page_size
+            rows = rows[:page_size][::-1]
+            has_more_after = True
+        else:
+            if after is not None:
+                queryset = queryset.filter(self.keyset_filter(after, 'lt'))
+            rows = list(queryset.order_by(*descending)[:page_size + 1])
+            has_more_after = len(rows) > page_size
+            rows = rows[:page_size]
+            has_more_before = after is not None
+
+        page = KeysetPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1]) if rows and has_more_after else None,
+            previous_cursor=self.encode_cursor(rows[0]) if rows and has_more_before else None,
+            params=params,
+            cursor_param=self.cursor_param,
+        )
+        return None, page, rows, page.has_other_pages()
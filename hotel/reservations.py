@@ -0,0 +1,43 @@
+from contextlib import contextmanager
+
+from django.db import connections, router, transaction
+
+from .models import Booking, Room
+
+
+# === Создание и изменение броней ===
+# Проверка пересечений и запись идут в одной транзакции. На PostgreSQL и
+# MySQL select_for_update блокирует строку номера: брони одного номера
+# оформляются по очереди, разных номеров — параллельно. SQLite
+# select_for_update не поддерживает, и там брони выстраиваются в очередь
+# на блокировку записи всей базы: транзакция сервиса начинается с BEGIN
+# IMMEDIATE и ждёт блокировку в busy timeout, а не падает с "database is
+# locked" при повышении блокировки посреди транзакции. Остальные
+# транзакции приложения остаются отложенными (DEFERRED).
+@contextmanager
+def booking_transaction(using):
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        # Во внешней транзакции режим уже выбран тем, кто её открыл
+        with transaction.atomic(using=using):
+            yield
+        return
+    connection.ensure_connection()
+    mode = connection.transaction_mode
+    connection.transaction_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic(using=using):
+            # BEGIN уже выполнен: вложенные atomic() режим не используют
+            connection.transaction_mode = mode
+            yield
+    finally:
+        connection.transaction_mode = mode
+
+
+def save_booking(booking):
+    using = router.db_for_write(Booking, instance=booking)
+    with booking_transaction(using):
+        list(Room.objects.using(using).select_for_update().filter(pk=booking.room_id).values_list('pk', flat=True))
+        booking.clean()
+        booking.save(using=using)
+    return booking
@@ -0,0 +1,126 @@
+import random
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# === Чтение с реплик ===
+# Запись всегда идёт в основную базу. Чтение моделей hotel уходит на
+# реплику только внутри безопасного запроса (GET/HEAD), который пометил
+# ReplicaMiddleware, и только если не открыта транзакция на основной базе.
+# После POST браузер получает cookie и несколько секунд читает с основной
+# базы, чтобы сразу увидеть свои изменения, пока реплика отстаёт.
+
+REPLICA_PIN_COOKIE = 'hotel_primary_until'
+REPLICA_PIN_SECONDS = 10
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_read_from_replica = ContextVar('hotel_read_from_replica', default=False)
+
+
+def get_replicas():
+    return getattr(settings, 'HOTEL_READ_REPLICAS', [])
+
+
+@contextmanager
+def read_from_replica(enabled=True):
+    token = _read_from_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != 'hotel' or not _read_from_replica.get():
+            return None
+        replicas = get_replicas()
+        if not replicas or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы, связи между ними допустимы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплик приходит вместе с данными из основной базы
+        return db not in get_replicas()
+
+
+def is_pinned(request):
+    try:
+        return float(request.COOKIES.get(REPLICA_PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self.start(request)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            _read_from_replica.reset(token)
+            raise
+        return self.finish(request, response, token)
+
+    async def __acall__(self, request):
+        token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            _read_from_replica.reset(token)
+            raise
+        return self.finish(request, response, token)
+
+    def start(self, request):
+        return _read_from_replica.set(request.method in SAFE_METHODS and not is_pinned(request))
+
+    def finish(self, request, response, token):
+        if request.method not in SAFE_METHODS:
+            pin_until = time.time() + REPLICA_PIN_SECONDS
+            response.set_cookie(
+                REPLICA_PIN_COOKIE, f'{pin_until:.0f}', max_age=REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        if response.streaming:
+            # Потоковый ответ (экспорт CSV) читает базу уже после выхода
+            # из middleware: флаг снимается, когда сервер закроет ответ
+            response._resource_closers.append(lambda: _read_from_replica.set(False))
+        else:
+            _read_from_replica.reset(token)
+        return response
+
+
+# === Копирование основной базы на реплику (SQLite) ===
+# Заменитель репликации для локальной проверки: реплика — отдельный файл,
+# который периодически перезаписывается копией основной базы через
+# sqlite3 backup API. Копия согласована даже при идущей записи.
+def copy_to_replica(path):
+    source = connections[DEFAULT_DB_ALIAS]
+    source.ensure_connection()
+    target = sqlite3.connect(path)
+    try:
+        source.connection.backup(target)
+    finally:
+        target.close()
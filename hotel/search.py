@@ -0,0 +1,61 @@
+import re
+
+
+# === Нормализация для поиска клиентов ===
+# Строки индекса: слова в нижнем регистре (включая кириллицу, ё → е)
+# и цифры телефона и паспорта без пробелов, скобок и дефисов.
+WORD_RE = re.compile(r'\w+')
+PHONE_QUERY_RE = re.compile(r'^[\d\s()+\-]+$')
+MIN_DIGITS_SUFFIX = 4
+MAX_TOKEN_LENGTH = 100
+
+
+def normalize_text(value):
+    return value.casefold().replace('ё', 'е')
+
+
+def digits_only(value):
+    return re.sub(r'\D', '', value)
+
+
+def national_digits(phone):
+    # Без кода страны: +7 916 ... и 8 916 ... дают одинаковые цифры
+    digits = digits_only(phone)
+    if phone.lstrip().startswith('+7') or (len(digits) == 11 and digits[0] in '78'):
+        digits = digits[1:]
+    return digits
+
+
+def phone_tokens(phone):
+    digits = national_digits(phone)
+    # Хвосты номера: поиск по последним цифрам тоже попадает в индекс
+    return {digits[i:] for i in range(max(1, len(digits) - MIN_DIGITS_SUFFIX + 1))}
+
+
+def client_tokens(client):
+    tokens = set()
+    for value in (client.first_name, client.last_name, client.middle_name):
+        tokens.update(WORD_RE.findall(normalize_text(value)))
+    email = normalize_text(client.email)
+    tokens.add(email)
+    tokens.update(WORD_RE.findall(email))
+    tokens.update(phone_tokens(client.phone))
+    passport = normalize_text(client.passport_data)
+    tokens.add(digits_only(passport))
+    tokens.update(WORD_RE.findall(passport))
+    return {token[:MAX_TOKEN_LENGTH] for token in tokens if token}
+
+
+def query_terms(query):
+    if PHONE_QUERY_RE.match(query) and digits_only(query):
+        return [national_digits(query)]
+    query = normalize_text(query)
+    if '@' in query:
+        return [query.strip()]
+    return WORD_RE.findall(query)
+
+
+def prefix_range(term):
+    # Диапазон вместо LIKE 'term%': в SQLite LIKE без учёта регистра
+    # не использует обычный индекс, а сравнение >= / < использует.
+    return term, term + chr(0x10FFFF)
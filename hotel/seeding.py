@@ -0,0 +1,434 @@
+import datetime
+import itertools
+import random
+from collections import Counter
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .buildings import invalidate_building_list
+from .counters import invalidate_dashboard_counters
+from .models import (
+    Accommodation, Address, Booking, Building, BuildingProducts, BuildingServices, Client, ClientSearchToken,
+    DailyStat, Payment, Product, ProductOrder, Room, RoomNight, RoomType, Service, ServiceOrder, StockMovement,
+)
+from .pagecache import invalidate_pages
+from .search import client_tokens
+
+
+# === Синтетические данные ===
+# Сеть гостиниц с историей броней за несколько лет — чтобы воспроизводить
+# нагрузку на объёмах, близких к рабочим. Всё определяется seed: одни и те
+# же параметры на пустой базе дают одни и те же строки.
+#
+# Ключи выдаются заранее, подряд после текущего максимума: дочерние строки
+# ссылаются на родителей без чтения вставленных id. Вставка — bulk_create
+# порциями, по транзакции на гостиницу. save() и сигналы не вызываются,
+# поэтому производные данные — занятые ночи, счёт брони, поисковые токены,
+# остатки со складским журналом и сводка по дням — считаются здесь так
+# же, как их посчитали бы сохранения моделей.
+
+SEED_BATCH_SIZE = 5000
+# На сколько дней вперёд уже есть брони
+FUTURE_DAYS = 90
+
+
+def weighted(pairs):
+    values = [value for value, weight in pairs]
+    return values, list(itertools.accumulate(weight for value, weight in pairs))
+
+
+def pick(rng, table):
+    values, cum_weights = table
+    return rng.choices(values, cum_weights=cum_weights)[0]
+
+
+CITIES = [
+    'Москва', 'Санкт-Петербург', 'Казань', 'Сочи', 'Калининград',
+    'Екатеринбург', 'Новосибирск', 'Нижний Новгород', 'Владивосток', 'Ярославль',
+]
+STREETS = ['Ленина', 'Советская', 'Мира', 'Набережная', 'Садовая', 'Гагарина', 'Пушкина', 'Центральная']
+HOTEL_NAMES = ['Волна', 'Северная', 'Космос', 'Заря', 'Берёзка', 'Маяк', 'Уют', 'Панорама', 'Причал', 'Старый город']
+
+MALE_NAMES = ['Александр', 'Алексей', 'Андрей', 'Дмитрий', 'Иван', 'Михаил', 'Николай', 'Павел', 'Сергей', 'Юрий']
+FEMALE_NAMES = ['Анна', 'Елена', 'Ирина', 'Мария', 'Наталья', 'Ольга', 'Светлана', 'Татьяна', 'Юлия', 'Екатерина']
+# Женская форма — с окончанием «а»
+LAST_NAMES = [
+    'Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров', 'Соколов', 'Михайлов', 'Новиков', 'Фёдоров',
+    'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семёнов', 'Егоров', 'Павлов', 'Козлов', 'Степанов', 'Николаев',
+]
+PATRONYMICS = [
+    ('Александрович', 'Александровна'), ('Алексеевич', 'Алексеевна'), ('Андреевич', 'Андреевна'),
+    ('Дмитриевич', 'Дмитриевна'), ('Иванович', 'Ивановна'), ('Михайлович', 'Михайловна'),
+    ('Николаевич', 'Николаевна'), ('Павлович', 'Павловна'), ('Сергеевич', 'Сергеевна'), ('Юрьевич', 'Юрьевна'),
+]
+
+# Название и цена за ночь; сверх списка типы повторяются с номером
+ROOM_TYPES = [
+    ('Эконом', 2500), ('Стандарт', 3500), ('Улучшенный', 4800), ('Семейный', 6200),
+    ('Полулюкс', 8500), ('Люкс', 12000), ('Апартаменты', 15000), ('Президентский', 30000),
+]
+PRODUCTS = [
+    ('Вода', '0,5 л', 150), ('Сок', '0,3 л', 220), ('Шоколад', '100 г', 250), ('Орешки', '50 г', 300),
+    ('Вино', '0,75 л', 1800), ('Пиво', '0,5 л', 350), ('Зубной набор', '', 200), ('Тапочки', '', 400),
+]
+SERVICES = [
+    ('Уборка', '', 500), ('Завтрак в номер', '', 900), ('Прачечная', '', 700),
+    ('Трансфер', 'Аэропорт — гостиница', 2500), ('Парковка', 'Сутки', 600), ('Поздний выезд', '', 1500),
+]
+
+STAY_NIGHTS = weighted([(1, 20), (2, 22), (3, 18), (4, 12), (5, 8), (6, 5), (7, 8), (10, 4), (14, 3)])
+GAP_DAYS = weighted([(0, 30), (1, 25), (2, 15), (3, 10), (5, 10), (8, 6), (14, 4)])
+LEAD_DAYS = weighted([(0, 10), (1, 15), (3, 20), (7, 20), (14, 15), (30, 12), (60, 8)])
+PRODUCT_ORDERS = weighted([(0, 45), (1, 30), (2, 15), (3, 10)])
+SERVICE_ORDERS = weighted([(0, 60), (1, 30), (2, 10)])
+PAYMENT_METHODS = weighted([(Payment.Method.CARD, 60), (Payment.Method.CASH, 20), (Payment.Method.ONLINE, 20)])
+# Статусы по положению брони относительно сегодняшнего дня
+PAST_STATUSES = weighted([
+    (Booking.Status.COMPLETED, 85), (Booking.Status.CANCELLED, 12), (Booking.Status.PAID, 3),
+])
+CURRENT_STATUSES = weighted([(Booking.Status.COMPLETED, 92), (Booking.Status.CANCELLED, 8)])
+FUTURE_STATUSES = weighted([
+    (Booking.Status.CONFIRMED, 45), (Booking.Status.PAID, 30), (Booking.Status.NEW, 15), (Booking.Status.CANCELLED, 10),
+])
+
+# Порядок вставки строк гостиницы: родители раньше детей
+BUILDING_MODELS = [
+    Building, BuildingProducts, BuildingServices, Room, Booking, RoomNight, Accommodation,
+    ProductOrder, ServiceOrder, Payment, StockMovement, DailyStat,
+]
+
+
+@contextmanager
+def explicit_timestamps():
+    # bulk_create заполняет auto_now и auto_now_add текущим временем,
+    # а истории нужны даты создания из прошлого
+    fields = [
+        Booking._meta.get_field('created_at'), Booking._meta.get_field('updated_at'),
+        StockMovement._meta.get_field('created_at'),
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def reset_sequences(models):
+    # После вставки с явными ключами последовательности PostgreSQL
+    # отстают от данных; на SQLite запросов нет
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+
+
+class HotelSeeder:
+    def __init__(self, addresses=50, buildings=100, rooms_per_building=50, room_types=6, clients=100_000,
+                 years=3, seed=1, batch_size=SEED_BATCH_SIZE, today=None):
+        self.address_count = addresses
+        self.building_count = buildings
+        self.rooms_per_building = rooms_per_building
+        self.room_type_count = room_types
+        self.client_count = clients
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.today = today or timezone.localdate()
+        self.timezone = timezone.get_current_timezone()
+        self.start = self.today - datetime.timedelta(days=365 * years)
+        # Клиенты регистрируются равномерно, начиная за год до истории броней
+        self.registration_start = self.start - datetime.timedelta(days=365)
+        self.registration_days = (self.today - self.registration_start).days
+        self.keys = {}
+        self.counts = Counter()
+
+    # --- Ключи и вставка ---
+    def allocate(self, model, count=1):
+        if model not in self.keys:
+            self.keys[model] = (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        first = self.keys[model]
+        self.keys[model] += count
+        return first
+
+    def insert(self, model, rows):
+        # Родители получают ключи при создании, остальные строки — здесь
+        unnumbered = [row for row in rows if row.pk is None]
+        first = self.allocate(model, len(unnumbered))
+        for n, row in enumerate(unnumbered):
+            row.pk = first + n
+        model.objects.bulk_create(rows, batch_size=self.batch_size)
+        self.counts[model] += len(rows)
+
+    def add(self, row):
+        self.rows[type(row)].append(row)
+        return row
+
+    def moment(self, day, hour):
+        return datetime.datetime.combine(day, datetime.time(hour, self.rng.randrange(60)), tzinfo=self.timezone)
+
+    def day_between(self, first, last):
+        return first + datetime.timedelta(days=self.rng.randint(0, (last - first).days))
+
+    # --- Справочники и клиенты ---
+    def create_catalog(self):
+        rng = self.rng
+        first = self.allocate(Address, self.address_count)
+        self.addresses = [
+            Address(pk=first + n, city=CITIES[n % len(CITIES)], street=f'ул. {rng.choice(STREETS)}',
+                    house=str(rng.randint(1, 150)))
+            for n in range(self.address_count)
+        ]
+        first = self.allocate(RoomType, self.room_type_count)
+        self.room_types = []
+        for n in range(self.room_type_count):
+            name, price = ROOM_TYPES[n % len(ROOM_TYPES)]
+            if n >= len(ROOM_TYPES):
+                name = f'{name} {n // len(ROOM_TYPES) + 1}'
+            self.room_types.append(RoomType(pk=first + n, name=name, price_per_night=Decimal(price)))
+        # Дешёвых номеров больше, чем дорогих
+        self.room_type_table = weighted(
+            [(room_type, len(self.room_types) - n) for n, room_type in enumerate(self.room_types)]
+        )
+        first = self.allocate(Product, len(PRODUCTS))
+        self.products = [
+            Product(pk=first + n, name=name, description=description, price=Decimal(price))
+            for n, (name, description, price) in enumerate(PRODUCTS)
+        ]
+        first = self.allocate(Service, len(SERVICES))
+        self.services = [
+            Service(pk=first + n, name=name, description=description, price=Decimal(price))
+            for n, (name, description, price) in enumerate(SERVICES)
+        ]
+        with transaction.atomic():
+            self.insert(Address, self.addresses)
+            self.insert(RoomType, self.room_types)
+            self.insert(Product, self.products)
+            self.insert(Service, self.services)
+
+    def make_client(self, pk, registered):
+        rng = self.rng
+        female = rng.random() < 0.5
+        last_name = rng.choice(LAST_NAMES)
+        digits = f'{9_500_000_000 + pk:010d}'
+        return Client(
+            pk=pk,
+            first_name=rng.choice(FEMALE_NAMES if female else MALE_NAMES),
+            last_name=last_name + 'а' if female else last_name,
+            middle_name=rng.choice(PATRONYMICS)[female],
+            phone=f'+7 ({digits[:3]}) {digits[3:6]}-{digits[6:8]}-{digits[8:]}',
+            email=f'guest{pk}@example.com',
+            passport_data=f'{70 + pk // 10**6:02d}{rng.randrange(100):02d} {pk % 10**6:06d}',
+            registration_date=registered,
+        )
+
+    def create_clients(self):
+        self.first_client = self.allocate(Client, self.client_count)
+        for offset in range(0, self.client_count, self.batch_size):
+            clients, tokens = [], []
+            for n in range(offset, min(offset + self.batch_size, self.client_count)):
+                registered = self.registration_start + datetime.timedelta(
+                    days=n * self.registration_days // self.client_count
+                )
+                client = self.make_client(self.first_client + n, registered)
+                clients.append(client)
+                # Множество токенов сортируется: порядок строк не зависит от hash seed
+                tokens.extend(ClientSearchToken(client_id=client.pk, token=token) for token in sorted(client_tokens(client)))
+            with transaction.atomic():
+                self.insert(Client, clients)
+                self.insert(ClientSearchToken, tokens)
+
+    def pick_client(self, day):
+        # Бронирует только уже зарегистрированный клиент: у давних
+        # клиентов броней больше, как и бывает с постоянными гостями
+        elapsed = (day - self.registration_start).days + 1
+        registered = min(self.client_count, max(1, -(-elapsed * self.client_count // self.registration_days)))
+        return self.first_client + self.rng.randrange(registered)
+
+    # --- Гостиницы ---
+    def create_building(self, n):
+        rng = self.rng
+        self.rows = {model: [] for model in BUILDING_MODELS}
+        self.revenue, self.occupancy = Counter(), Counter()
+        address = self.addresses[n % len(self.addresses)]
+        building = self.building = self.add(Building(
+            pk=self.allocate(Building), name=f'Гостиница «{rng.choice(HOTEL_NAMES)}» №{n + 1}',
+            description=f'{self.rooms_per_building} номеров, {address.city}',
+            capacity=self.rooms_per_building * 2, address_id=address.pk,
+        ))
+        self.available_products = [product for product in self.products if rng.random() < 0.85]
+        self.active_services = []
+        for service in self.services:
+            link = self.add(BuildingServices(service_id=service.pk, building_id=building.pk, is_active=rng.random() < 0.9))
+            if link.is_active:
+                self.active_services.append(service)
+        self.taken = Counter()
+
+        rooms_per_type = Counter()
+        first = self.allocate(Room, self.rooms_per_building)
+        for i in range(self.rooms_per_building):
+            room_type = pick(rng, self.room_type_table)
+            room = self.add(Room(
+                pk=first + i, room_type_id=room_type.pk, building_id=building.pk,
+                room_number=f'{i // 20 + 1}{i % 20 + 1:02d}',
+            ))
+            rooms_per_type[room_type.pk] += 1
+            room.status = self.create_stays(room, room_type)
+
+        self.create_stock(building)
+        for room_type_id, day in sorted(self.revenue.keys() | self.occupancy.keys()):
+            self.add(DailyStat(
+                building_id=building.pk, room_type_id=room_type_id, day=day,
+                revenue=self.revenue[room_type_id, day], occupied_nights=self.occupancy[room_type_id, day],
+                available_nights=rooms_per_type[room_type_id],
+            ))
+        with transaction.atomic():
+            for model in BUILDING_MODELS:
+                self.insert(model, self.rows[model])
+
+    def create_stays(self, room, room_type):
+        # Брони номера идут друг за другом без пересечений; возвращает
+        # текущий статус номера
+        rng = self.rng
+        status = Room.Status.MAINTENANCE if rng.random() < 0.02 else Room.Status.FREE
+        day = self.start + datetime.timedelta(days=rng.randint(0, 14))
+        end = self.today + datetime.timedelta(days=FUTURE_DAYS)
+        while True:
+            checkin = day + datetime.timedelta(days=pick(rng, GAP_DAYS))
+            if checkin > end:
+                return status
+            checkout = checkin + datetime.timedelta(days=pick(rng, STAY_NIGHTS))
+            day = checkout
+            # Чем дальше заезд, тем меньше на него уже забронировано
+            if checkin > self.today and rng.random() < (checkin - self.today).days / FUTURE_DAYS:
+                continue
+            booking = self.create_booking(room, room_type, checkin, checkout)
+            if booking.status == Booking.Status.COMPLETED:
+                if checkin <= self.today < checkout:
+                    status = Room.Status.OCCUPIED
+                elif checkout == self.today:
+                    status = Room.Status.CLEANING
+
+    def create_booking(self, room, room_type, checkin, checkout):
+        rng = self.rng
+        if checkout <= self.today:
+            status = pick(rng, PAST_STATUSES)
+        elif checkin <= self.today:
+            status = pick(rng, CURRENT_STATUSES)
+        else:
+            status = pick(rng, FUTURE_STATUSES)
+        # Бронь создана до заезда и не позже вчерашнего дня
+        created_on = min(checkin - datetime.timedelta(days=pick(rng, LEAD_DAYS)), self.today - datetime.timedelta(days=1))
+        created_at = self.moment(created_on, rng.randint(8, 22))
+        total_price = room_type.price_per_night * (checkout - checkin).days
+        booking = self.add(Booking(
+            pk=self.allocate(Booking), client_id=self.pick_client(created_on), room_id=room.pk,
+            checkin_date=checkin, checkout_date=checkout, total_price=total_price, status=status,
+            created_at=created_at, updated_at=created_at,
+        ))
+        booking.charges = Booking.room_charge(status, total_price)
+
+        if status in Booking.ACTIVE_STATUSES:
+            for night in booking.get_nights():
+                self.add(RoomNight(room_id=room.pk, night=night, booking_id=booking.pk))
+                self.occupancy[room_type.pk, night] += 1
+
+        payments = []
+        if status == Booking.Status.PAID:
+            payments.append((created_on, total_price, Payment.Status.PAID))
+        elif status == Booking.Status.CANCELLED and rng.random() < 0.25:
+            payments.append((created_on, total_price, Payment.Status.REFUND))
+        elif status == Booking.Status.COMPLETED:
+            deposit = (total_price * 3 / 10).quantize(Decimal(1)) if rng.random() < 0.25 else 0
+            if deposit:
+                payments.append((created_on, deposit, Payment.Status.PAID))
+            payments.append((checkin, total_price - deposit, Payment.Status.PAID))
+            booking.updated_at = max(created_at, self.moment(min(checkin, created_on + datetime.timedelta(days=1)), 14))
+            extras = self.create_accommodation(booking)
+            booking.charges += extras
+            # Заказы оплачиваются при выезде; часть гостей уезжает с долгом
+            if extras and checkout <= self.today and rng.random() < 0.9:
+                payments.append((checkout, extras, Payment.Status.PAID))
+
+        booking.paid = 0
+        for payment_date, amount, payment_status in payments:
+            self.add(Payment(
+                booking_id=booking.pk, amount=amount, payment_date=payment_date,
+                payment_method=pick(rng, PAYMENT_METHODS), status=payment_status,
+            ))
+            # В сводку по дням идут все платежи, как в DailyStat.rebuild()
+            self.revenue[room_type.pk, payment_date] += amount
+            if payment_status == Payment.Status.PAID:
+                booking.paid += amount
+        booking.outstanding = booking.charges - booking.paid
+        return booking
+
+    def create_accommodation(self, booking):
+        # Проживание с заказами; возвращает их сумму для счёта брони
+        rng = self.rng
+        staying = booking.checkout_date > self.today
+        accommodation = self.add(Accommodation(
+            pk=self.allocate(Accommodation), booking_id=booking.pk, actual_checkin_date=booking.checkin_date,
+            actual_checkout_date=None if staying else booking.checkout_date,
+            status=Accommodation.Status.STAYING if staying else Accommodation.Status.CHECKED_OUT,
+        ))
+        last_day = min(booking.checkout_date, self.today) - datetime.timedelta(days=1)
+        if last_day < booking.checkin_date:
+            return 0
+        total = 0
+        for _ in range(pick(rng, PRODUCT_ORDERS) if self.available_products else 0):
+            product = rng.choice(self.available_products)
+            order = self.add(ProductOrder(
+                pk=self.allocate(ProductOrder), accommodation_id=accommodation.pk, product_id=product.pk,
+                order_date=self.day_between(booking.checkin_date, last_day), quantity=rng.randint(1, 3),
+            ))
+            order.total_price = product.price * order.quantity
+            self.add(StockMovement(
+                product_id=product.pk, building_id=self.building.pk, delta=-order.quantity,
+                reason='Заказ', order_id=order.pk, created_at=self.moment(order.order_date, rng.randint(9, 23)),
+            ))
+            self.taken[product.pk] += order.quantity
+            total += order.total_price
+        for _ in range(pick(rng, SERVICE_ORDERS) if self.active_services else 0):
+            service = rng.choice(self.active_services)
+            self.add(ServiceOrder(
+                accommodation_id=accommodation.pk, service_id=service.pk, total_price=service.price,
+                order_date=self.day_between(booking.checkin_date, last_day),
+            ))
+            total += service.price
+        return total
+
+    def create_stock(self, building):
+        # Остаток — поступление в начале истории минус заказы; журнал
+        # сходится с остатком, как при BuildingProducts.objects.take/put
+        receipts = []
+        for product in self.products:
+            available = product in self.available_products
+            left = self.rng.randint(0, 200) if available else 0
+            self.add(BuildingProducts(product_id=product.pk, building_id=building.pk, is_available=available, quantity=left))
+            if self.taken[product.pk] + left:
+                receipts.append(StockMovement(
+                    product_id=product.pk, building_id=building.pk, delta=self.taken[product.pk] + left,
+                    reason='Поступление', created_at=self.moment(self.start - datetime.timedelta(days=1), 9),
+                ))
+        self.rows[StockMovement][:0] = receipts
+
+    def run(self, progress=None):
+        with explicit_timestamps():
+            self.create_catalog()
+            self.create_clients()
+            for n in range(self.building_count):
+                self.create_building(n)
+                if progress:
+                    progress(n + 1, self.building_count)
+        reset_sequences(list(self.counts))
+        invalidate_dashboard_counters()
+        invalidate_building_list()
+        for model in (Address, Building, BuildingProducts, Product, Service, Room, RoomType, Payment):
+            invalidate_pages(model)
+        return self.counts
@@ -0,0 +1,177 @@
+from django.conf import settings
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .changes import record_change
+from .buildings import invalidate_building_list, invalidate_building_reference
+from .pagecache import invalidate_pages, invalidate_user_pages
+from .counters import invalidate_dashboard_counters
+from .models import (
+    Accommodation, Address, Booking, Building, BuildingProducts, BuildingServices, DailyStat, Payment,
+    Position, Product, ProductOrder, Room, RoomType, Service, ServiceOrder,
+    charge_order_to_folio,
+)
+
+
+def deleted_along_with(origin, *models):
+    # origin — удаляемый объект или QuerySet, с которого начался каскад
+    return (origin.model if isinstance(origin, QuerySet) else type(origin)) in models
+
+
+# === Сводка по дням ===
+# Строки сводки удаляются каскадом вместе с гостиницей и типом номера.
+# Если удаляют их, приращения не нужны: они создали бы недостающие строки
+# уже после каскада, со ссылкой на удаляемую гостиницу
+STATS_OWNERS = (Address, Building, RoomType)
+
+
+@receiver(post_save, sender=Room)
+def add_room_to_daily_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        DailyStat.objects.add_room(instance, 1, since=timezone.localdate())
+
+
+@receiver(post_delete, sender=Room)
+def remove_room_from_daily_stats(sender, instance, origin=None, **kwargs):
+    if not deleted_along_with(origin, *STATS_OWNERS):
+        DailyStat.objects.add_room(instance, -1, since=timezone.localdate())
+
+
+@receiver(pre_delete, sender=Booking)
+def release_booking_nights(sender, instance, origin=None, **kwargs):
+    if not deleted_along_with(origin, *STATS_OWNERS):
+        DailyStat.objects.add_occupancy(
+            instance.nights.values_list('room__building_id', 'room__room_type_id', 'night'), -1
+        )
+
+
+@receiver(post_delete, sender=Payment)
+def remove_payment_revenue(sender, instance, origin=None, **kwargs):
+    if not deleted_along_with(origin, *STATS_OWNERS):
+        DailyStat.objects.add_revenue(instance.booking_id, instance.payment_date, -instance.amount)
+
+
+# === Склад ===
+@receiver(pre_delete, sender=ProductOrder)
+def return_order_stock(sender, instance, origin=None, **kwargs):
+    # Товар возвращается на склад, только когда удаляют сам заказ;
+    # при удалении проживания или гостиницы заказы уходят вместе с ними
+    if deleted_along_with(origin, ProductOrder):
+        BuildingProducts.objects.put(
+            instance.product_id, instance.get_building_id(), instance.quantity, reason='Возврат',
+        )
+
+
+# === Счёт гостя ===
+@receiver(post_delete, sender=Payment)
+def remove_payment_from_folio(sender, instance, **kwargs):
+    Booking.objects.adjust_folio(instance.booking_id, paid=-instance.folio_amount())
+
+
+@receiver(pre_delete, sender=ProductOrder)
+@receiver(pre_delete, sender=ServiceOrder)
+def remove_order_from_folio(sender, instance, **kwargs):
+    # pre_delete: при каскадном удалении проживание ещё на месте
+    charge_order_to_folio(instance, None, sign=-1)
+
+
+# === Счётчики панели управления ===
+@receiver(post_save, sender=Booking)
+@receiver(post_save, sender=Room)
+@receiver(post_save, sender=Accommodation)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Booking)
+@receiver(post_delete, sender=Room)
+@receiver(post_delete, sender=Accommodation)
+@receiver(post_delete, sender=Payment)
+def reset_dashboard_counters(sender, **kwargs):
+    invalidate_dashboard_counters()
+
+
+# === Справочники гостиниц ===
+@receiver(post_save, sender=Building)
+@receiver(post_delete, sender=Building)
+def reset_building_list(sender, instance, **kwargs):
+    invalidate_building_list()
+    invalidate_building_reference(instance.pk)
+
+
+@receiver(post_save, sender=BuildingProducts)
+@receiver(post_delete, sender=BuildingProducts)
+def reset_building_products(sender, instance, **kwargs):
+    invalidate_building_reference(instance.building_id, ['products'])
+
+
+@receiver(post_save, sender=BuildingServices)
+@receiver(post_delete, sender=BuildingServices)
+def reset_building_services(sender, instance, **kwargs):
+    invalidate_building_reference(instance.building_id, ['services'])
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def reset_building_rooms(sender, instance, **kwargs):
+    invalidate_building_reference(instance.building_id, ['rooms'])
+
+
+# === Кэш страниц справочников ===
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Service)
+@receiver(post_save, sender=BuildingProducts)
+@receiver(post_save, sender=Building)
+@receiver(post_save, sender=Address)
+@receiver(post_save, sender=Position)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Service)
+@receiver(post_delete, sender=BuildingProducts)
+@receiver(post_delete, sender=Building)
+@receiver(post_delete, sender=Address)
+@receiver(post_delete, sender=Position)
+def reset_catalog_pages(sender, **kwargs):
+    invalidate_pages(sender)
+
+
+# Версии номеров и платежей служат валидаторами ETag в JSON API
+@receiver(post_save, sender=Room)
+@receiver(post_save, sender=RoomType)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Room)
+@receiver(post_delete, sender=RoomType)
+@receiver(post_delete, sender=Payment)
+def reset_api_versions(sender, **kwargs):
+    invalidate_pages(sender)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def reset_user_pages(sender, instance, **kwargs):
+    # Имя в шапке страницы
+    invalidate_user_pages(instance.pk)
+
+
+@receiver(post_save, sender='accounts.Profile')
+@receiver(post_delete, sender='accounts.Profile')
+def reset_profile_pages(sender, instance, **kwargs):
+    # Аватар в шапке страницы
+    invalidate_user_pages(instance.user_id)
+
+
+# === Лента изменений ===
+@receiver(post_save, sender=Room)
+@receiver(post_save, sender=Booking)
+@receiver(post_save, sender=Accommodation)
+def record_status_change(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old_status = None if created else getattr(instance, '_loaded_values', {}).get('status')
+    if created or old_status != instance.status:
+        record_change(instance, old_status, instance.status)
+
+
+@receiver(post_delete, sender=Room)
+@receiver(post_delete, sender=Booking)
+@receiver(post_delete, sender=Accommodation)
+def record_removal(sender, instance, origin=None, **kwargs):
+    record_change(instance, instance.status, None, building_deleted=deleted_along_with(origin, Address, Building))
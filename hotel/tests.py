@@ -1,3 +1,1476 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import io
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.db import OperationalError, connection, router, transaction
+from django.db.models import Sum
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import urls as hotel_urls
+from . import views
+from .api import ApiListView
+from .bench import seed_sample_data
+from .changes import get_events, get_last_seq, get_notifier
+from .forms import BuildingProductsForm
+from .counters import (
+    DASHBOARD_COUNTERS_TIMEOUT, LOCAL_DASHBOARD_COUNTERS_TIMEOUT, dashboard_counters_timeout, get_dashboard_counters,
+)
+from .metrics import registry as metrics_registry
+from .reservations import save_booking
+from .routing import REPLICA_PIN_COOKIE, ReplicaMiddleware, copy_to_replica, read_from_replica
+from .benchsuite import CASES, compare, run_suite
+from .seeding import HotelSeeder
+from .models import (
+    Accommodation, Address, Building, BuildingProducts, Booking,
+    ChangeEvent, Client, ClientSearchToken, DailyStat, Employee, Payment, Position, Product, ProductOrder, Room,
+    RoomNight, RoomType, Service, ServiceOrder, StockMovement
+)
+
+
+def make_client(n=1):
+    return Client.objects.create(
+        first_name='Иван', last_name=f'Иванов{n}', middle_name='Иванович',
+        phone=f'+7 (900) 000-00-{n:02d}', email=f'client{n}@example.com',
+        passport_data=f'4500 {n:06d}',
+    )
+
+
+class OccupancyIndexTests(TestCase):
+    def setUp(self):
+        address = Address.objects.create(city='Москва', street='Тверская', house='1')
+        building = Building.objects.create(name='Центр', description='', capacity=10, address=address)
+        room_type = RoomType.objects.create(name='Стандарт', price_per_night=Decimal('1000.00'))
+        self.room = Room.objects.create(room_type=room_type, building=building, room_number='101')
+        self.client_obj = make_client()
+        self.checkin = datetime.date(2026, 1, 10)
+        self.checkout = datetime.date(2026, 1, 13)
+
+    def book(self, checkin, checkout, status=Booking.Status.CONFIRMED):
+        return Booking.objects.create(
+            client=self.client_obj, room=self.room,
+            checkin_date=checkin, checkout_date=checkout, status=status,
+        )
+
+    def test_active_booking_fills_nights(self):
+        booking = self.book(self.checkin, self.checkout)
+        nights = list(booking.nights.order_by('night').values_list('night', flat=True))
+        self.assertEqual(nights, [
+            datetime.date(2026, 1, 10), datetime.date(2026, 1, 11), datetime.date(2026, 1, 12),
+        ])
+        self.assertFalse(self.room.is_available(datetime.date(2026, 1, 12), datetime.date(2026, 1, 14)))
+        self.assertTrue(self.room.is_available(self.checkout, datetime.date(2026, 1, 15)))
+
+    def test_new_booking_does_not_hold_room(self):
+        self.book(self.checkin, self.checkout, status=Booking.Status.NEW)
+        self.assertFalse(RoomNight.objects.exists())
+        self.assertTrue(self.room.is_available(self.checkin, self.checkout))
+
+    def test_overlapping_save_is_rejected(self):
+        self.book(self.checkin, self.checkout)
+        with self.assertRaises(ValidationError):
+            self.book(datetime.date(2026, 1, 12), datetime.date(2026, 1, 15))
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_cancel_releases_nights(self):
+        booking = self.book(self.checkin, self.checkout)
+        booking.status = Booking.Status.CANCELLED
+        booking.save()
+        self.assertFalse(RoomNight.objects.exists())
+        self.book(self.checkin, self.checkout)
+
+    def test_clean_ignores_own_nights(self):
+        booking = self.book(self.checkin, self.checkout)
+        booking.checkout_date = datetime.date(2026, 1, 14)
+        booking.full_clean()
+        booking.save()
+        self.assertEqual(booking.nights.count(), 4)
+
+    def test_service_rechecks_overlap_before_write(self):
+        self.book(self.checkin, self.checkout)
+        # Новая бронь не занимает номер, но пересекаться с занятыми ночами не может
+        booking = Booking(
+            client=self.client_obj, room=self.room, status=Booking.Status.NEW,
+            checkin_date=datetime.date(2026, 1, 12), checkout_date=datetime.date(2026, 1, 15),
+        )
+        with self.assertRaisesMessage(ValidationError, 'Номер недоступен'):
+            save_booking(booking)
+        self.assertIsNone(booking.pk)
+        booking.checkin_date = self.checkout
+        save_booking(booking)
+        self.assertEqual(Booking.objects.count(), 2)
+
+    def test_payment_for_conflicting_booking_is_form_error(self):
+        self.book(self.checkin, self.checkout)
+        pending = self.book(datetime.date(2026, 1, 12), datetime.date(2026, 1, 15), status=Booking.Status.NEW)
+        self.client.force_login(User.objects.create_user('staff', password='password'))
+        response = self.client.post('/payments/add/', {
+            'booking': pending.pk, 'amount': '1000.00', 'payment_date': '2026-01-05',
+            'payment_method': Payment.Method.CARD, 'status': Payment.Status.PAID,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response.context['form'], 'booking', 'Номер недоступен в выбранные даты')
+        self.assertFalse(Payment.objects.exists())
+        self.assertEqual(
+            Booking.objects.values_list('status', 'paid').get(pk=pending.pk), (Booking.Status.NEW, 0),
+        )
+
+
+class BookingTransactionModeTests(TransactionTestCase):
+    def test_only_booking_service_begins_immediate(self):
+        address = Address.objects.create(city='Москва', street='Тверская', house='1')
+        building = Building.objects.create(name='Центр', description='', capacity=10, address=address)
+        room_type = RoomType.objects.create(name='Стандарт', price_per_night=Decimal('1000.00'))
+        room = Room.objects.create(room_type=room_type, building=building, room_number='101')
+        booking = Booking(
+            client=make_client(), room=room,
+            checkin_date=datetime.date(2026, 1, 10), checkout_date=datetime.date(2026, 1, 13),
+        )
+        with CaptureQueriesContext(connection) as queries:
+            save_booking(booking)
+            with transaction.atomic():
+                Room.objects.filter(pk=room.pk).update(room_number='102')
+        begins = [query['sql'] for query in queries if query['sql'].startswith('BEGIN')]
+        self.assertEqual(begins, ['BEGIN IMMEDIATE', 'BEGIN'])
+
+
+class AvailabilitySearchTests(TestCase):
+    def setUp(self):
+        address = Address.objects.create(city='Москва', street='Тверская', house='1')
+        self.building = Building.objects.create(name='Центр', description='', capacity=10, address=address)
+        self.standard = RoomType.objects.create(name='Стандарт', price_per_night=Decimal('1000.00'))
+        self.suite = RoomType.objects.create(name='Люкс', price_per_night=Decimal('5000.00'))
+        self.free = Room.objects.create(room_type=self.standard, building=self.building, room_number='101')
+        self.booked = Room.objects.create(room_type=self.standard, building=self.building, room_number='102')
+        self.suite_room = Room.objects.create(room_type=self.suite, building=self.building, room_number='201')
+        Room.objects.create(room_type=self.suite, building=self.building, room_number='202', status=Room.Status.MAINTENANCE)
+        Booking.objects.create(
+            client=make_client(), room=self.booked, status=Booking.Status.PAID,
+            checkin_date=datetime.date(2026, 2, 2), checkout_date=datetime.date(2026, 2, 4),
+        )
+        user = User.objects.create_user('staff', password='password')
+        self.client.force_login(user)
+
+    def test_search_groups_free_rooms(self):
+        with self.assertNumQueries(3):  # сессия, пользователь, поиск
+            response = self.client.get('/rooms/availability/', {'checkin': '2026-02-01', 'checkout': '2026-02-03'})
+        data = response.json()
+        self.assertEqual(data['nights'], 2)
+        [building] = data['buildings']
+        self.assertEqual(
+            [(t['name'], t['total_price'], [r['room_number'] for r in t['rooms']]) for t in building['room_types']],
+            [('Люкс', '10000.00', ['201']), ('Стандарт', '2000.00', ['101'])],
+        )
+
+    def test_invalid_dates(self):
+        response = self.client.get('/rooms/availability/', {'checkin': '2026-02-03', 'checkout': '2026-02-01'})
+        self.assertEqual(response.status_code, 400)
+
+
+class DailyStatTests(TestCase):
+    def setUp(self):
+        address = Address.objects.create(city='Москва', street='Тверская', house='1')
+        building = Building.objects.create(name='Центр', description='', capacity=10, address=address)
+        room_type = RoomType.objects.create(name='Стандарт', price_per_night=Decimal('1000.00'))
+        self.room = Room.objects.create(room_type=room_type, building=building, room_number='101')
+        Room.objects.create(room_type=room_type, building=building, room_number='102')
+        self.booking = Booking.objects.create(
+            client=make_client(), room=self.room, status=Booking.Status.CONFIRMED,
+            checkin_date=datetime.date(2026, 3, 1), checkout_date=datetime.date(2026, 3, 3),
+        )
+
+    def snapshot(self):
+        return sorted(DailyStat.objects.values_list('day', 'revenue', 'occupied_nights', 'available_nights'))
+
+    def test_incremental_matches_rebuild(self):
+        payment = Payment.objects.create(
+            booking=self.booking, amount=Decimal('500.00'),
+            payment_date=datetime.date(2026, 2, 20), payment_method=Payment.Method.CARD,
+        )
+        payment = Payment.objects.get(pk=payment.pk)
+        payment.amount = Decimal('2000.00')
+        payment.save()
+        Payment.objects.create(
+            booking=self.booking, amount=Decimal('100.00'),
+            payment_date=datetime.date(2026, 3, 1), payment_method=Payment.Method.CASH, status=Payment.Status.REFUND,
+        )
+        incremental = self.snapshot()
+        self.assertEqual(incremental, [
+            (datetime.date(2026, 2, 20), Decimal('2000.00'), 0, 2),
+            (datetime.date(2026, 3, 1), Decimal('100.00'), 1, 2),
+            (datetime.date(2026, 3, 2), Decimal('0.00'), 1, 2),
+        ])
+        DailyStat.objects.rebuild()
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_cancel_and_delete_roll_back(self):
+        self.booking.status = Booking.Status.CANCELLED
+        self.booking.save()
+        self.assertEqual(sum(s[2] for s in self.snapshot()), 0)
+        self.booking.status = Booking.Status.PAID
+        self.booking.save()
+        self.booking.delete()
+        self.assertEqual(sum(s[2] for s in self.snapshot()), 0)
+
+    def test_room_and_booking_moves_match_rebuild(self):
+        def activity():
+            return sorted(
+                DailyStat.objects.exclude(revenue=0, occupied_nights=0).values_list(
+                    'building__name', 'room_type__name', 'day', 'revenue', 'occupied_nights', 'available_nights',
+                )
+            )
+
+        north = Building.objects.create(name='Север', description='', capacity=10, address=self.room.building.address)
+        suite = RoomType.objects.create(name='Люкс', price_per_night=Decimal('3000.00'))
+        suite_room = Room.objects.create(room_type=suite, building=self.room.building, room_number='201')
+        day = timezone.localdate() + datetime.timedelta(days=10)
+        booking = Booking.objects.create(
+            client=self.booking.client, room=Room.objects.get(room_number='102'), status=Booking.Status.CONFIRMED,
+            checkin_date=day, checkout_date=day + datetime.timedelta(days=2),
+        )
+        Payment.objects.create(booking=booking, amount=Decimal('500.00'), payment_date=day, payment_method=Payment.Method.CARD)
+        # Бронь переезжает в номер другого типа, затем номер — в другую гостиницу
+        booking.room = suite_room
+        booking.save()
+        suite_room = Room.objects.get(pk=suite_room.pk)
+        suite_room.building = north
+        suite_room.save()
+
+        incremental = activity()
+        self.assertEqual([row for row in incremental if row[0] == 'Север'], [
+            ('Север', 'Люкс', day, Decimal('500.00'), 1, 1),
+            ('Север', 'Люкс', day + datetime.timedelta(days=1), Decimal('0.00'), 1, 1),
+        ])
+        DailyStat.objects.rebuild()
+        self.assertEqual(activity(), incremental)
+
+    def test_room_type_delete_takes_its_stats(self):
+        Payment.objects.create(
+            booking=self.booking, amount=Decimal('500.00'),
+            payment_date=datetime.date(2026, 2, 20), payment_method=Payment.Method.CARD,
+        )
+        DailyStat.objects.all().delete()
+        self.room.room_type.delete()
+        # Внешние ключи SQLite проверяет при коммите, которого в TestCase нет
+        connection.check_constraints()
+        self.assertFalse(DailyStat.objects.exists())
+
+
+class DashboardCountersTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        address = Address.objects.create(city='Москва', street='Тверская', house='1')
+        building = Building.objects.create(name='Центр', description='', capacity=10, address=address)
+        room_type = RoomType.objects.create(name='Стандарт', price_per_night=Decimal('1000.00'))
+        self.room = Room.objects.create(room_type=room_type, building=building, room_number='101')
+
+    def test_counters_are_cached_until_write(self):
+        counters = get_dashboard_counters()
+        self.assertEqual(counters['free_rooms_count'], 1)
+        with self.assertNumQueries(0):
+            get_dashboard_counters()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room.status = Room.Status.MAINTENANCE
+            self.room.save()
+        self.assertEqual(get_dashboard_counters()['free_rooms_count'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(
+                client=make_client(), room=self.room, status=Booking.Status.CONFIRMED,
+                checkin_date=datetime.date(2099, 1, 1), checkout_date=datetime.date(2099, 1, 2),
+            )
+        counters = get_dashboard_counters()
+        self.assertEqual(counters['active_bookings_count'], 1)
+        self.assertEqual(len(counters['upcoming_bookings']), 1)
+
+
+    def test_process_local_cache_keeps_counters_briefly(self):
+        get_dashboard_counters()
+        # Запись в другом воркере: его сброс до кэша этого процесса не доходит
+        Room.objects.filter(pk=self.room.pk).update(status=Room.Status.MAINTENANCE)
+        self.assertEqual(get_dashboard_counters()['free_rooms_count'], 1)
+        later = time.time() + LOCAL_DASHBOARD_COUNTERS_TIMEOUT + 1
+        with mock.patch('time.time', return_value=later):
+            self.assertEqual(get_dashboard_counters()['free_rooms_count'], 0)
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory,
+        }}):
+            self.assertEqual(dashboard_counters_timeout(), DASHBOARD_COUNTERS_TIMEOUT)
+
+class ClientSearchTests(TestCase):
+    def setUp(self):
+        self.ivanov = Client.objects.create(
+            first_name='Пётр', last_name='Иванов', middle_name='Ильич',
+            phone='+7 (916) 123-45-67', email='P.Ivanov@Mail.ru', passport_data='4510 123456',
+        )
+        self.smirnova = Client.objects.create(
+            first_name='Анна', last_name='Смирнова', middle_name='Олеговна',
+            phone='8 903 765 43 21', email='anna@example.com', passport_data='4601 654321',
+        )
+
+    def search(self, query):
+        return set(Client.objects.search(query))
+
+    def test_names_are_case_folded(self):
+        self.assertEqual(self.search('иван'), {self.ivanov})
+        self.assertEqual(self.search('ПЕТР'), {self.ivanov})
+        self.assertEqual(self.search('смирнова анна'), {self.smirnova})
+
+    def test_phone_and_passport_digits(self):
+        self.assertEqual(self.search('9161234567'), {self.ivanov})
+        self.assertEqual(self.search('+7 (903) 765'), {self.smirnova})
+        self.assertEqual(self.search('4321'), {self.smirnova})
+        self.assertEqual(self.search('4510123456'), {self.ivanov})
+        self.assertEqual(self.search('654321'), {self.smirnova})
+
+    def test_email(self):
+        self.assertEqual(self.search('p.ivanov@mail'), {self.ivanov})
+        self.assertEqual(self.search('example'), {self.smirnova})
+
+    def test_tokens_follow_updates_and_deletes(self):
+        self.ivanov.last_name = 'Петров'
+        self.ivanov.save()
+        self.assertEqual(self.search('иванов'), set())
+        self.assertEqual(self.search('петров'), {self.ivanov})
+        self.ivanov.delete()
+        self.assertEqual(self.search('петров'), set())
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('staff', password='password'))
+        address = Address.objects.create(city='Москва', street='Тверская', house='1')
+        building = Building.objects.create(name='Центр', description='', capacity=10, address=address)
+        room_type = RoomType.objects.create(name='Стандарт', price_per_night=Decimal('1000.00'))
+        room = Room.objects.create(room_type=room_type, building=building, room_number='101')
+        booking = Booking.objects.create(
+            client=make_client(), room=room,
+            checkin_date=datetime.date(2026, 1, 1), checkout_date=datetime.date(2026, 1, 2),
+        )
+        # Одинаковые даты: порядок внутри дня задаёт id
+        for n in range(45):
+            Payment.objects.create(
+                booking=booking, amount=Decimal(n + 1), payment_method=Payment.Method.CARD, status=Payment.Status.REFUND,
+                payment_date=datetime.date(2026, 1, 1) + datetime.timedelta(days=n // 10),
+            )
+
+    def test_pages_walk_forward_and_back(self):
+        expected = list(Payment.objects.order_by('-payment_date', '-id').values_list('pk', flat=True))
+        pages, query = [], ''
+        while True:
+            response = self.client.get('/payments/?' + query)
+            page = response.context['page_obj']
+            pages.append([p.pk for p in page])
+            if not page.has_next():
+                break
+            query = page.next_query()
+        self.assertEqual([pk for page in pages for pk in page], expected)
+        self.assertEqual([len(page) for page in pages], [20, 20, 5])
+
+        response = self.client.get('/payments/?' + response.context['page_obj'].previous_query())
+        self.assertEqual([p.pk for p in response.context['page_obj']], pages[1])
+
+    def test_receivables_walk_by_decimal_cursor(self):
+        room = Room.objects.get()
+        for n in range(30):
+            Booking.objects.create(
+                client=make_client(n + 2), room=room, status=Booking.Status.CONFIRMED,
+                checkin_date=datetime.date(2026, 2, 1) + datetime.timedelta(days=n),
+                checkout_date=datetime.date(2026, 2, 2) + datetime.timedelta(days=n),
+                total_price=Decimal('1000.50') + n % 3,
+            )
+        expected = list(Booking.objects.filter(outstanding__gt=0).order_by('-outstanding', '-id').values_list(
+            'pk', flat=True,
+        ))
+        self.assertGreater(len(expected), 20)
+        first = self.client.get('/payments/receivables/').context['page_obj']
+        second = self.client.get('/payments/receivables/?' + first.next_query()).context['page_obj']
+        self.assertEqual([b.pk for b in first] + [b.pk for b in second], expected)
+
+    def test_broken_cursor_shows_first_page(self):
+        response = self.client.get('/payments/', {'after': 'мусор'})
+        self.assertEqual(len(response.context['payments']), 20)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+
+class ImportBookingsTests(TestCase):
+    def setUp(self):
+        address = Address.objects.create(city='Москва', street='Тверская', house='1')
+        self.building = Building.objects.create(name='Центр', description='', capacity=10, address=address)
+        room_type = RoomType.objects.create(name='Стандарт', price_per_night=Decimal('1000.00'))
+        self.room = Room.objects.create(room_type=room_type, building=self.building, room_number='101')
+        Room.objects.create(room_type=room_type, building=self.building, room_number='102')
+        self.guest = make_client(1)
+        make_client(2)
+        Booking.objects.create(
+            client=self.guest, room=self.room, status=Booking.Status.CONFIRMED,
+            checkin_date=datetime.date(2026, 3, 10), checkout_date=datetime.date(2026, 3, 12),
+        )
+
+    def run_import(self, text, suffix='.csv', **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bookings' + suffix)
+            report = os.path.join(tmp, 'errors.csv')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            call_command('import_bookings', path, errors=report, stdout=io.StringIO(), **options)
+            if not os.path.exists(report):
+                return []
+            with open(report, encoding='utf-8') as f:
+                return [(int(row[0]), row[1]) for row in list(csv.reader(f))[1:]]
+
+    def test_rejects_overlaps_and_unknown_rows(self):
+        errors = self.run_import(
+            'client,building,room,checkin_date,checkout_date,status\n'
+            '+7 (900) 000-00-01,Центр,101,2026-03-01,2026-03-04,\n'
+            'client2@example.com,Центр,101,2026-03-03,2026-03-05,\n'
+            '4500 000002,Центр,101,2026-03-11,2026-03-13,\n'
+            f'89000000002,{self.building.pk},102,2026-03-11,2026-03-13,Оплачен\n'
+            'client9@example.com,Центр,102,2026-04-01,2026-04-02,\n'
+            'client1@example.com,Центр,102,2026-04-02,2026-04-01,\n'
+            'client1@example.com,Центр,101,2026-03-12,2026-03-20,Отменен\n'
+        )
+        self.assertEqual(errors, [
+            (3, 'Пересекается со строкой 2'),
+            (4, 'Номер недоступен в выбранные даты'),
+            (6, 'Клиент не найден'),
+            (7, 'Дата заезда должна быть раньше даты выезда.'),
+        ])
+        self.assertEqual(Booking.objects.count(), 4)
+        imported = Booking.objects.get(room__room_number='102')
+        self.assertEqual(imported.total_price, Decimal('2000.00'))
+        self.assertEqual(RoomNight.objects.filter(booking=imported).count(), 2)
+        self.assertEqual(RoomNight.objects.count(), 7)
+        stat = DailyStat.objects.get(day=datetime.date(2026, 3, 11))
+        self.assertEqual(stat.occupied_nights, 2)
+
+    def test_json_lines_and_dry_run(self):
+        text = '{"client": "client2@example.com", "building": "Центр", "room": "102", ' \
+               '"checkin_date": "2026-05-01", "checkout_date": "2026-05-03"}\n'
+        self.assertEqual(self.run_import(text, suffix='.jsonl', dry_run=True), [])
+        self.assertEqual(Booking.objects.count(), 1)
+        self.run_import(text, suffix='.jsonl')
+        self.assertEqual(Booking.objects.count(), 2)
+
+
+    def test_imported_bookings_reach_change_feed(self):
+        cache.clear()
+        since = get_last_seq()
+        text = '{"client": "client2@example.com", "building": "Центр", "room": "102", ' \
+               '"checkin_date": "2026-05-01", "checkout_date": "2026-05-03"}\n'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run_import(text, suffix='.jsonl')
+        self.assertGreater(get_last_seq(), since)
+        imported = Booking.objects.get(room__room_number='102')
+        events, _ = get_events(since, self.building.pk)
+        self.assertEqual(
+            [(e['model'], e['object_id'], e['old_status'], e['new_status']) for e in events],
+            [('booking', imported.pk, '', 'Подтвержден')],
+        )
+
+
+def make_stock(quantity):
+    address = Address.objects.create(city='Москва', street='Тверская', house='1')
+    building = Building.objects.create(name='Центр', description='', capacity=10, address=address)
+    room_type = RoomType.objects.create(name='Стандарт', price_per_night=Decimal('1000.00'))
+    room = Room.objects.create(room_type=room_type, building=building, room_number='101')
+    booking = Booking.objects.create(
+        client=make_client(), room=room,
+        checkin_date=datetime.date(2026, 1, 1), checkout_date=datetime.date(2026, 1, 5),
+    )
+    accommodation = Accommodation.objects.create(booking=booking, actual_checkin_date=booking.checkin_date)
+    product = Product.objects.create(name='Вода', description='0,5 л', price=Decimal('150.00'))
+    BuildingProducts.objects.create(product=product, building=building, is_available=True)
+    BuildingProducts.objects.put(product.pk, building.pk, quantity)
+    return accommodation, product
+
+
+class StockLedgerTests(TestCase):
+    def setUp(self):
+        self.accommodation, self.product = make_stock(5)
+
+    def stock(self):
+        return BuildingProducts.objects.get(product=self.product).quantity
+
+    def order(self, quantity):
+        return ProductOrder.objects.create(accommodation=self.accommodation, product=self.product, quantity=quantity)
+
+    def test_order_changes_follow_the_ledger(self):
+        order = self.order(3)
+        self.assertEqual(self.stock(), 2)
+        with self.assertRaises(ValidationError):
+            self.order(3)
+        self.assertEqual(ProductOrder.objects.count(), 1)
+
+        order = ProductOrder.objects.get(pk=order.pk)
+        order.quantity = 5
+        order.save()
+        self.assertEqual(self.stock(), 0)
+        order.delete()
+        self.assertEqual(self.stock(), 5)
+
+        ledger = StockMovement.objects.filter(product=self.product).aggregate(Sum('delta'))['delta__sum']
+        self.assertEqual(ledger, self.stock())
+        self.assertEqual(
+            list(StockMovement.objects.order_by('pk').values_list('reason', 'delta')),
+            [('Поступление', 5), ('Заказ', -3), ('Возврат', 3), ('Заказ', -5), ('Возврат', 5)],
+        )
+
+    def test_unavailable_product_cannot_be_ordered(self):
+        BuildingProducts.objects.update(is_available=False)
+        with self.assertRaisesMessage(ValidationError, 'недоступен'):
+            self.order(1)
+        self.assertEqual(self.stock(), 5)
+
+
+    def test_stock_edits_do_not_overwrite_ledger_quantity(self):
+        stock = BuildingProducts.objects.get(product=self.product)
+        stale = BuildingProducts.objects.get(pk=stock.pk)
+        self.order(4)
+        user = User.objects.create_user('staff', password='password')
+
+        # Форма с экземпляром, прочитанным до заказа
+        form = BuildingProductsForm(data={
+            'building': stock.building_id, 'product': self.product.pk, 'is_available': 'on', 'receipt': '2',
+        }, instance=stale)
+        self.assertTrue(form.is_valid(), form.errors)
+        view = views.BuildingProductsUpdateView(request=RequestFactory().post('/'), object=stale)
+        view.form_valid(form)
+        self.assertEqual(self.stock(), 3)
+
+        # Флаг наличия с таким же устаревшим экземпляром
+        self.client.force_login(user)
+        self.client.post('/buildings/select/', {'building': stock.building_id, 'next': '/inventory/'})
+        with mock.patch.object(BuildingProducts.objects, 'get_or_create', return_value=(stale, False)):
+            self.client.post('/update-availability/', {'product_id': self.product.pk, 'is_available': 'false'})
+        stock.refresh_from_db()
+        self.assertEqual((stock.is_available, stock.quantity), (False, 3))
+        ledger = StockMovement.objects.filter(product=self.product).aggregate(Sum('delta'))['delta__sum']
+        self.assertEqual(ledger, 3)
+
+class FolioTests(TestCase):
+    def setUp(self):
+        self.accommodation, self.product = make_stock(10)
+        self.booking = self.accommodation.booking
+        self.service = Service.objects.create(name='Уборка', description='', price=Decimal('500.00'))
+
+    def folio(self):
+        return Booking.objects.values_list('charges', 'paid', 'outstanding').get(pk=self.booking.pk)
+
+    def test_folio_follows_charges_and_payments(self):
+        # 4 ночи по 1000
+        self.assertEqual(self.folio(), (Decimal('4000'), 0, Decimal('4000')))
+        order = ProductOrder.objects.create(accommodation=self.accommodation, product=self.product, quantity=2)
+        ServiceOrder.objects.create(accommodation=self.accommodation, service=self.service)
+        payment = Payment.objects.create(booking=self.booking, amount=Decimal('3000'), payment_method=Payment.Method.CARD)
+        self.assertEqual(self.folio(), (Decimal('4800'), Decimal('3000'), Decimal('1800')))
+
+        payment = Payment.objects.get(pk=payment.pk)
+        payment.status = Payment.Status.CANCELLED
+        payment.save()
+        order.delete()
+        self.assertEqual(self.folio(), (Decimal('4500'), 0, Decimal('4500')))
+        self.assertEqual(list(Booking.objects.filter(outstanding__gt=0)), [self.booking])
+
+    def test_stale_booking_save_keeps_folio(self):
+        stale = Booking.objects.get(pk=self.booking.pk)
+        Payment.objects.create(booking=self.booking, amount=Decimal('4000'), payment_method=Payment.Method.CARD)
+        stale.status = Booking.Status.CANCELLED
+        stale.save()
+        # Отмена снимает проживание, но не затирает платёж
+        self.assertEqual(self.folio(), (0, Decimal('4000'), Decimal('-4000')))
+
+    def test_money_and_status_stored_as_integers(self):
+        payment = Payment.objects.create(
+            booking=self.booking, amount=Decimal('1234.565'), payment_method=Payment.Method.ONLINE,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT amount, status, payment_method FROM hotel_payment WHERE id = %s', [payment.pk])
+            self.assertEqual(cursor.fetchone(), (123457, Payment.Status.PAID, Payment.Method.ONLINE))
+        self.assertEqual(Payment.objects.get(pk=payment.pk).amount, Decimal('1234.57'))
+        self.assertEqual(Payment.objects.aggregate(total=Sum('amount'))['total'], Decimal('1234.57'))
+        self.assertEqual(self.folio(), (Decimal('4000'), Decimal('1234.57'), Decimal('2765.43')))
+
+
+class StockConcurrencyTests(TransactionTestCase):
+    def test_parallel_orders_never_oversell(self):
+        accommodation, product = make_stock(10)
+        sold, refused = [], []
+
+        def buy():
+            try:
+                for attempt in range(200):
+                    try:
+                        ProductOrder.objects.create(accommodation=accommodation, product=product, quantity=1)
+                        sold.append(1)
+                        return
+                    except ValidationError:
+                        refused.append(1)
+                        return
+                    except OperationalError:
+                        # Занятая база: заказ повторяется, как повторил бы его клиент
+                        time.sleep(0.005)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy) for _ in range(25)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(sold), 10)
+        self.assertEqual(len(refused), 15)
+        self.assertEqual(BuildingProducts.objects.get(product=product).quantity, 0)
+        self.assertEqual(ProductOrder.objects.count(), 10)
+        self.assertEqual(StockMovement.objects.aggregate(Sum('delta'))['delta__sum'], 0)
+
+
+class ActiveBuildingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('staff', password='password'))
+        seed_sample_data(2, 'A')
+        self.first, self.second = Building.objects.order_by('pk')
+        BuildingProducts.objects.filter(building=self.second).update(is_available=False)
+
+    def test_selected_building_scopes_inventory(self):
+        response = self.client.get('/products/')
+        self.assertEqual(response.context['active_building'].pk, self.first.pk)
+        self.assertTrue(response.context['products'][0]['is_available'])
+
+        self.client.post('/buildings/select/', {'building': self.second.pk, 'next': '/products/'})
+        response = self.client.get('/products/')
+        self.assertEqual(response.context['active_building'].pk, self.second.pk)
+        self.assertFalse(response.context['products'][0]['is_available'])
+
+        orders = self.client.get('/inventory/orders/').context['product_orders']
+        self.assertEqual(
+            {item['order'].accommodation.booking.room.building_id for item in orders}, {self.second.pk}
+        )
+
+    def test_reference_data_is_cached_between_requests(self):
+        self.client.get('/products/')
+        with CaptureQueriesContext(connection) as warm:
+            self.client.get('/products/')
+        # Сессия, пользователь, профиль, число товаров и сами товары
+        self.assertEqual(len(warm), BASE_QUERIES + 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BuildingProducts.objects.get(building=self.first).save()
+        self.assertIsNone(cache.get(f'buildings:{self.first.pk}:products'))
+
+
+@override_settings(HOTEL_READ_REPLICAS=['replica1'])
+class ReplicaRoutingTests(SimpleTestCase):
+    def run_request(self, request):
+        seen = {}
+
+        def view(request):
+            seen['booking'] = Booking.objects.all().db
+            seen['user'] = User.objects.all().db
+            return HttpResponse()
+
+        response = ReplicaMiddleware(view)(request)
+        return seen, response
+
+    def test_reads_go_to_replica_and_writes_to_primary(self):
+        self.assertEqual(Booking.objects.all().db, 'default')
+        with read_from_replica():
+            self.assertEqual(Booking.objects.all().db, 'replica1')
+            self.assertEqual(User.objects.all().db, 'default')
+            self.assertEqual(router.db_for_write(Booking), 'default')
+
+    def test_post_pins_session_to_primary(self):
+        factory = RequestFactory()
+        seen, _ = self.run_request(factory.get('/bookings/'))
+        self.assertEqual(seen, {'booking': 'replica1', 'user': 'default'})
+
+        seen, response = self.run_request(factory.post('/bookings/add/'))
+        self.assertEqual(seen['booking'], 'default')
+        pin = response.cookies[REPLICA_PIN_COOKIE].value
+
+        factory.cookies[REPLICA_PIN_COOKIE] = pin
+        seen, _ = self.run_request(factory.get('/bookings/'))
+        self.assertEqual(seen['booking'], 'default')
+
+        factory.cookies[REPLICA_PIN_COOKIE] = '0'
+        seen, _ = self.run_request(factory.get('/bookings/'))
+        self.assertEqual(seen['booking'], 'replica1')
+        self.assertEqual(Booking.objects.all().db, 'default')
+
+    def test_streaming_response_reads_replica_until_closed(self):
+        def view(request):
+            return StreamingHttpResponse(Booking.objects.all().db for _ in range(2))
+
+        response = ReplicaMiddleware(view)(RequestFactory().get('/bookings/export/'))
+        self.assertEqual(list(response.streaming_content), [b'replica1', b'replica1'])
+        response.close()
+        self.assertEqual(Booking.objects.all().db, 'default')
+
+    async def test_async_chain_reads_replica(self):
+        seen = []
+
+        async def view(request):
+            seen.append(Booking.objects.all().db)
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(view)
+        await middleware(RequestFactory().get('/changes/'))
+        response = await middleware(RequestFactory().post('/bookings/add/'))
+        self.assertEqual(seen, ['replica1', 'default'])
+        self.assertIn(REPLICA_PIN_COOKIE, response.cookies)
+        self.assertEqual(Booking.objects.all().db, 'default')
+
+
+class ReplicaCopyTests(TransactionTestCase):
+    def test_copy_to_replica(self):
+        make_client()
+        fd, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        copy_to_replica(path)
+        replica = sqlite3.connect(path)
+        self.addCleanup(replica.close)
+        self.assertEqual(replica.execute('SELECT count(*) FROM hotel_client').fetchone(), (1,))
+
+
+class CatalogPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('staff', password='password'))
+        seed_sample_data(2, 'A')
+        # Первый запрос выдаёт cookie CSRF, без секрета страница не кэшируется
+        self.client.get('/services/')
+
+    def test_repeat_view_is_served_from_cache(self):
+        first = self.client.get('/services/')
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get('/services/')
+        # Только сессия и пользователь
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(first.content, second.content)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/services/?page=1')
+        self.assertGreater(len(queries), 2)
+
+    def test_model_change_invalidates_page(self):
+        self.client.get('/services/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Service.objects.update_or_create(name='Уборка A', defaults={'name': 'Стирка A'})
+        self.assertContains(self.client.get('/services/'), 'Стирка A')
+
+        self.client.get('/staff/positions/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Position.objects.create(name='Портье')
+        self.assertContains(self.client.get('/staff/positions/'), 'Портье')
+
+    def test_sidebar_fragment_is_cached_per_section(self):
+        active = re.compile(r'href="([^"]+)"\s+class="sidebar-link active"')
+        self.assertEqual(active.findall(self.client.get('/clients/').content.decode()), ['/clients/'])
+        self.assertEqual(active.findall(self.client.get('/bookings/').content.decode()), ['/bookings/'])
+        self.assertEqual(active.findall(self.client.get('/clients/').content.decode()), ['/clients/'])
+
+    def test_page_depends_on_active_building(self):
+        first, second = Building.objects.order_by('pk')
+        BuildingProducts.objects.filter(building=second).update(is_available=False)
+        self.client.get('/products/')
+        cached = self.client.get('/products/')
+        self.client.post('/buildings/select/', {'building': second.pk, 'next': '/products/'})
+        other = self.client.get('/products/')
+        self.assertNotEqual(cached.content, other.content)
+        self.assertFalse(other.context['products'][0]['is_available'])
+
+
+class AsyncDashboardTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('staff', password='password'))
+        seed_sample_data(3, 'A')
+        DailyStat.objects.rebuild()
+
+    def test_async_pages_render_same_context(self):
+        keys = {
+            '/': ['active_bookings_count', 'free_rooms_count', 'checked_in_today_count',
+                  'weekly_revenue', 'upcoming_bookings'],
+            '/analytics/': ['occupancy_rate', 'monthly_revenue', 'daily_payments', 'daily_labels', 'daily_sums'],
+        }
+        sync_views = {'/': views.DashboardView, '/analytics/': views.AnalyticsDashboardView}
+        factory = RequestFactory()
+        for url, names in keys.items():
+            with self.subTest(url):
+                cache.clear()
+                # Соединение не в транзакции: агрегаты идут в пуле потоков
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                request = factory.get(url)
+                request.user = response.wsgi_request.user
+                expected = sync_views[url].as_view()(request).context_data
+                self.assertEqual({name: response.context[name] for name in names},
+                                 {name: expected[name] for name in names})
+
+    def test_anonymous_user_is_redirected(self):
+        self.client.logout()
+        response = self.client.get('/analytics/')
+        self.assertRedirects(response, '/accounts/login/?next=/analytics/', fetch_redirect_response=False)
+
+
+class JsonApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('staff', password='password'))
+        seed_sample_data(3, 'A')
+
+    def test_every_api_view_declares_validators(self):
+        # Без версий моделей ETag зависит только от адреса, и клиент навсегда получает 304
+        api_views = [
+            pattern.callback.view_class for pattern in hotel_urls.urlpatterns
+            if issubclass(getattr(pattern.callback, 'view_class', object), ApiListView)
+        ]
+        self.assertEqual(len(api_views), 3)
+        for view_class in api_views:
+            with self.subTest(view_class.__name__):
+                self.assertTrue(
+                    view_class.version_models or view_class.get_validators is not ApiListView.get_validators,
+                )
+
+    def test_field_selection_filters_and_cursor(self):
+        building = Building.objects.order_by('pk').first()
+        response = self.client.get('/api/rooms/', {'fields': 'room_number,status', 'building': building.pk})
+        self.assertEqual(response.json()['results'], [{'room_number': '0', 'status': Room.Status.OCCUPIED}])
+
+        self.assertEqual(self.client.get('/api/rooms/', {'fields': 'passport'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/bookings/', {'date_from': 'вчера'}).status_code, 400)
+
+        seen = []
+        params = {'limit': 2, 'fields': 'id'}
+        while True:
+            data = self.client.get('/api/bookings/', params).json()
+            seen += [row['id'] for row in data['results']]
+            if not data['next']:
+                break
+            params['after'] = data['next']
+        self.assertEqual(seen, list(Booking.objects.order_by('-created_at', '-id').values_list('id', flat=True)))
+
+        paid = self.client.get('/api/payments/', {'status': 'Оплачен'}).json()['results']
+        self.assertEqual(paid, [])
+
+    def test_unchanged_poll_returns_304_without_heavy_queries(self):
+        for url, queries_on_304 in [('/api/rooms/', 2), ('/api/bookings/', 3), ('/api/payments/', 2)]:
+            with self.subTest(url):
+                first = self.client.get(url)
+                self.assertEqual(first.status_code, 200)
+                with CaptureQueriesContext(connection) as queries:
+                    second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+                self.assertEqual(second.status_code, 304)
+                self.assertEqual(second.content, b'')
+                self.assertEqual(len(queries), queries_on_304)
+
+    def test_changes_produce_new_etag(self):
+        rooms = self.client.get('/api/rooms/')['ETag']
+        bookings = self.client.get('/api/bookings/')['ETag']
+        room = Room.objects.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            room.status = Room.Status.MAINTENANCE
+            room.save()
+        self.assertNotEqual(self.client.get('/api/rooms/', HTTP_IF_NONE_MATCH=rooms).status_code, 304)
+
+        # Платёж меняет счёт брони через update(): updated_at тоже сдвигается
+        booking = Booking.objects.first()
+        Booking.objects.filter(pk=booking.pk).update(updated_at=booking.updated_at - datetime.timedelta(days=1))
+        bookings = self.client.get('/api/bookings/')['ETag']
+        Payment.objects.create(booking=booking, amount=Decimal('100.00'), payment_method=Payment.Method.CARD)
+        self.assertEqual(self.client.get('/api/bookings/', HTTP_IF_NONE_MATCH=bookings).status_code, 200)
+
+    def test_anonymous_gets_403(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/api/rooms/').status_code, 403)
+
+
+class CSVExportTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('staff', password='password'))
+        seed_sample_data(3, 'A')
+
+    def read_csv(self, url, params=None):
+        response = self.client.get(url, params or {})
+        self.assertTrue(response.streaming)
+        return list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+
+    def test_bookings_filtered_by_date_and_building(self):
+        rows = self.read_csv('/bookings/export/')
+        self.assertEqual(rows[0][:3], ['ID', 'Фамилия', 'Имя'])
+        self.assertEqual(len(rows), 4)
+
+        today = datetime.date.today()
+        rows = self.read_csv('/bookings/export/', {'date_from': today + datetime.timedelta(days=1)})
+        self.assertEqual(len(rows), 3)
+
+        building = Building.objects.get(name='Корпус A-2')
+        rows = self.read_csv('/bookings/export/', {'building': building.pk})
+        self.assertEqual([row[4] for row in rows[1:]], ['Корпус A-2'])
+
+    def test_orders_combine_products_and_services(self):
+        rows = self.read_csv('/inventory/orders/export/')
+        self.assertEqual([row[0] for row in rows[1:]], ['Товар'] * 3 + ['Услуга'] * 3)
+        self.assertEqual(rows[-1][8], '1')
+
+    def test_employees_keep_positions(self):
+        rows = self.read_csv('/staff/employees/export/')
+        self.assertEqual(rows[1][3], 'Администратор A')
+
+    def test_bad_filter_is_rejected(self):
+        self.assertEqual(self.client.get('/payments/export/', {'date_from': '01.01.2026'}).status_code, 400)
+
+
+# === Бюджет SQL-запросов для страниц ===
+# Любая страница на base.html читает сессию, пользователя и его профиль.
+# Остальное — сама страница; число запросов не должно зависеть
+# от количества строк в таблицах.
+BASE_QUERIES = 3
+
+QUERY_BUDGETS = {
+    'dashboard': BASE_QUERIES + 5,
+    'client_list': BASE_QUERIES + 1,
+    'client_add': BASE_QUERIES,
+    'client_detail': BASE_QUERIES + 2,
+    'client_edit': BASE_QUERIES + 1,
+    'client_delete': 2 + 1,
+    'booking_list': BASE_QUERIES + 1,
+    'booking_add': BASE_QUERIES + 2,
+    'booking_detail': BASE_QUERIES + 1,
+    'booking_edit': BASE_QUERIES + 3,
+    'accommodation_list': BASE_QUERIES + 1,
+    'accommodation_add': BASE_QUERIES + 1,
+    'accommodation_edit': BASE_QUERIES + 2,
+    'accommodation_delete': BASE_QUERIES + 1,
+    'payment_list': BASE_QUERIES + 3,
+    'payment_add': BASE_QUERIES + 1,
+    'room_list': BASE_QUERIES + 2,
+    'room_availability': 2 + 1,
+    'room_add': BASE_QUERIES + 2,
+    'room_edit': BASE_QUERIES + 3,
+    'room_delete': 2 + 1,
+    'employee_list': BASE_QUERIES + 3,
+    'employee_add': BASE_QUERIES + 2,
+    'employee_edit': BASE_QUERIES + 4,
+    'employee_delete': 2 + 1,
+    'employee_export': 2 + 2,
+    'booking_export': 2 + 1,
+    'payment_export': 2 + 1,
+    'receivables': BASE_QUERIES + 2,
+    'inventory_orders_export': 2 + 2,
+    # Без шаблона: сессия, пользователь, валидатор (для броней) и страница
+    'api_rooms': 2 + 1,
+    'api_bookings': 2 + 2,
+    'api_payments': 2 + 1,
+    'changes': 2 + 2,
+    'changes_stream': 2 + 2,
+    # Сессия и пользователь для проверки is_staff
+    'metrics': 2,
+    'position_list': BASE_QUERIES + 2,
+    'position_add': BASE_QUERIES,
+    'position_edit': BASE_QUERIES + 1,
+    'position_delete': 2 + 1,
+    'building_list': BASE_QUERIES + 1,
+    'building_add': BASE_QUERIES + 1,
+    'building_edit': BASE_QUERIES + 2,
+    'building_delete': 2 + 1,
+    'address_list': BASE_QUERIES + 1,
+    'address_add': BASE_QUERIES,
+    'address_edit': BASE_QUERIES + 1,
+    'address_delete': 2 + 1,
+    'product_list': BASE_QUERIES + 4,
+    'product_add': BASE_QUERIES,
+    'product_edit': BASE_QUERIES + 1,
+    'product_delete': BASE_QUERIES + 1,
+    'buildingproduct_list': BASE_QUERIES + 2,
+    'buildingproduct_edit': BASE_QUERIES + 3,
+    'service_list': BASE_QUERIES + 2,
+    'service_add': BASE_QUERIES,
+    'service_edit': BASE_QUERIES + 1,
+    'service_delete': BASE_QUERIES + 1,
+    'inventory_list': BASE_QUERIES + 1,
+    'inventory_orders': BASE_QUERIES + 3,
+    'productorder_add': BASE_QUERIES + 2,
+    'productorder_edit': BASE_QUERIES + 3,
+    'productorder_delete': BASE_QUERIES + 1,
+    'serviceorder_list': BASE_QUERIES + 2,
+    'serviceorder_add': BASE_QUERIES + 3,
+    'serviceorder_edit': BASE_QUERIES + 3,
+    'serviceorder_delete': BASE_QUERIES + 1,
+    'analytics': BASE_QUERIES + 4,
+}
+
+# Страницы, принимающие только POST, проверяются своими запросами
+POST_BUDGETS = {
+    'booking_checkin': 14,
+    'booking_checkout': 9,
+    'booking_cancel': 9,
+    'update_availability': 6,
+    'building_select': 5,
+}
+POST_ONLY = set(POST_BUDGETS)
+
+
+class SaveCascadeTests(TransactionTestCase):
+    # Вне транзакции теста: видны BEGIN/COMMIT и отсутствие точек сохранения
+    def setUp(self):
+        address = Address.objects.create(city='Москва', street='Тверская', house='1')
+        building = Building.objects.create(name='Центр', description='', capacity=10, address=address)
+        room_type = RoomType.objects.create(name='Стандарт', price_per_night=Decimal('1000.00'))
+        self.room = Room.objects.create(room_type=room_type, building=building, room_number='101')
+        self.booking = Booking.objects.create(
+            client=make_client(), room=self.room, status=Booking.Status.CONFIRMED,
+            checkin_date=datetime.date(2026, 1, 10), checkout_date=datetime.date(2026, 1, 12),
+        )
+
+    def statements(self, action):
+        with CaptureQueriesContext(connection) as queries:
+            action()
+        return [query['sql'].split()[0] for query in queries]
+
+    def test_check_in_and_check_out(self):
+        booking = Booking.objects.select_related('room').get(pk=self.booking.pk)
+        self.assertEqual(
+            self.statements(lambda: Accommodation.objects.create(booking=booking, actual_checkin_date=booking.checkin_date)),
+            ['BEGIN', 'INSERT', 'INSERT', 'UPDATE', 'INSERT', 'UPDATE', 'INSERT', 'SELECT', 'UPDATE', 'DELETE', 'COMMIT'],
+        )
+        self.assertEqual(Room.objects.get().status, Room.Status.OCCUPIED)
+        self.assertEqual(Booking.objects.get().status, Booking.Status.COMPLETED)
+        self.assertEqual(Booking.objects.get().total_price, Decimal('2000.00'))
+        self.assertFalse(RoomNight.objects.exists())
+
+        accommodation = Accommodation.objects.select_related('booking__room').get()
+        self.assertEqual(
+            self.statements(lambda: accommodation.check_out(datetime.date(2026, 1, 12))),
+            ['BEGIN', 'UPDATE', 'INSERT', 'UPDATE', 'INSERT', 'COMMIT'],
+        )
+        self.assertEqual(Room.objects.get().status, Room.Status.CLEANING)
+
+        # Повторное сохранение выехавшего гостя не пачкает убранный номер
+        Room.objects.get().set_status(Room.Status.FREE)
+        accommodation = Accommodation.objects.get()
+        accommodation.save()
+        self.assertEqual(Room.objects.get().status, Room.Status.FREE)
+
+    def test_payment_marks_booking_paid_without_repricing(self):
+        RoomType.objects.update(price_per_night=Decimal('5000.00'))
+        booking = Booking.objects.get(pk=self.booking.pk)
+        self.assertEqual(
+            self.statements(lambda: Payment.objects.create(
+                booking=booking, amount=Decimal('500.00'), payment_method=Payment.Method.CARD,
+                payment_date=booking.checkin_date,
+            )),
+            ['BEGIN', 'INSERT', 'SELECT', 'UPDATE', 'UPDATE', 'UPDATE', 'INSERT', 'COMMIT'],
+        )
+        booking = Booking.objects.get()
+        self.assertEqual((booking.status, booking.total_price), (Booking.Status.PAID, Decimal('2000.00')))
+        self.assertEqual((booking.paid, booking.outstanding), (Decimal('500.00'), Decimal('1500.00')))
+        self.assertEqual(RoomNight.objects.count(), 2)
+
+        # Завершённая бронь от нового платежа статус не меняет
+        Booking.objects.filter(pk=booking.pk).update(status=Booking.Status.COMPLETED)
+        Payment.objects.create(booking=Booking.objects.get(), amount=Decimal('100.00'), payment_method=Payment.Method.CARD)
+        self.assertEqual(Booking.objects.get().status, Booking.Status.COMPLETED)
+
+
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('staff', password='password'))
+        seed_sample_data(2, 'A')
+
+    def test_status_changes_are_recorded(self):
+        booking = Booking.objects.order_by('pk').first()
+        changes = list(
+            ChangeEvent.objects.filter(object_id__in=[booking.pk, booking.room_id])
+            .exclude(model='accommodation').values_list('model', 'old_status', 'new_status')
+        )
+        self.assertEqual(changes, [
+            ('room', '', 'Свободен'),
+            ('booking', '', 'Подтвержден'),
+            ('room', 'Свободен', 'Занят'),
+            ('booking', 'Подтвержден', 'Завершен'),
+        ])
+
+        last = ChangeEvent.objects.last().seq
+        room = Room.objects.get(pk=booking.room_id)
+        room.room_number = '101'
+        room.save()
+        self.assertEqual(ChangeEvent.objects.last().seq, last)
+
+    def test_removals_survive_building_cascade(self):
+        building, other = Building.objects.order_by('pk')
+        room = Room.objects.get(building=building)
+        booking = Booking.objects.get(room=room)
+        accommodation = Accommodation.objects.get(booking=booking)
+        other_room = Room.objects.get(building=other)
+        last = ChangeEvent.objects.last().seq
+        with self.captureOnCommitCallbacks(execute=True):
+            building.delete()
+            Booking.objects.filter(room=other_room).delete()
+        # Внешние ключи SQLite проверяет при коммите, которого в TestCase нет
+        connection.check_constraints()
+        removed = ChangeEvent.objects.filter(seq__gt=last, new_status='')
+        self.assertEqual(
+            set(removed.filter(building=None).values_list('model', 'object_id')),
+            {('room', room.pk), ('booking', booking.pk), ('accommodation', accommodation.pk)},
+        )
+        # Гостиница, которая осталась, сохраняется в событии
+        self.assertEqual(set(removed.exclude(building=None).values_list('model', 'building_id')), {
+            ('booking', other.pk), ('accommodation', other.pk),
+        })
+        self.assertEqual(get_last_seq(), ChangeEvent.objects.last().seq)
+
+    def test_long_poll_returns_events_after_since(self):
+        last = self.client.get('/changes/').json()['last_seq']
+        self.assertEqual(last, ChangeEvent.objects.last().seq)
+
+        empty = self.client.get('/changes/', {'since': last, 'timeout': 0}).json()
+        self.assertEqual(empty, {'events': [], 'last_seq': last})
+
+        room = Room.objects.order_by('pk').first()
+        room.status = Room.Status.CLEANING
+        room.save()
+        data = self.client.get('/changes/', {'since': last, 'timeout': 0}).json()
+        self.assertEqual(
+            [(event['model'], event['object_id'], event['new_status']) for event in data['events']],
+            [('room', room.pk, 'Требует уборки')],
+        )
+        self.assertEqual(data['last_seq'], data['events'][0]['seq'])
+
+        # Чужая гостиница: событий нет, но курсор продвигается
+        other = Building.objects.exclude(pk=room.building_id).first()
+        data = self.client.get('/changes/', {'since': last, 'timeout': 0, 'building': other.pk}).json()
+        self.assertEqual(data['events'], [])
+        self.assertEqual(data['last_seq'], last + 1)
+
+        self.assertEqual(self.client.get('/changes/', {'since': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/changes/', {'timeout': 3600}).status_code, 400)
+
+    def test_stream_resumes_from_last_event_id(self):
+        first = ChangeEvent.objects.order_by('seq')[1].seq
+        response = self.client.get('/changes/stream/', {'timeout': 0}, HTTP_LAST_EVENT_ID=str(first))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response).decode()
+        ids = [int(line[4:]) for line in body.splitlines() if line.startswith('id: ')]
+        self.assertEqual(ids, list(ChangeEvent.objects.filter(seq__gt=first).values_list('seq', flat=True)))
+        self.assertIn('event: room\ndata: {', body)
+
+
+class ChangeNotifierTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('staff', password='password'))
+        seed_sample_data(1, 'A')
+
+    def test_waiting_poll_wakes_on_commit(self):
+        last = self.client.get('/changes/').json()['last_seq']
+        room = Room.objects.get()
+
+        def free_room():
+            time.sleep(0.3)
+            room.status = Room.Status.FREE
+            room.save()
+            connection.close()
+
+        worker = threading.Thread(target=free_room)
+        worker.start()
+        started = time.monotonic()
+        data = self.client.get('/changes/', {'since': last, 'timeout': 10}).json()
+        worker.join()
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual([event['new_status'] for event in data['events']], ['Свободен'])
+
+    async def test_poll_does_not_wait_for_first_request(self):
+        # Опрос запускается в запросе первого подписчика, но не должен
+        # ждать его поток: тот может быть занят синхронной работой
+        notifier = get_notifier()
+        notifier.last_seq = last = await sync_to_async(get_last_seq)()
+        room = await Room.objects.aget()
+
+        def save_room():
+            room.save()
+            connection.close()
+
+        async def first_request():
+            async with ThreadSensitiveContext():
+                await notifier.wait(last, 0.1)
+                await sync_to_async(time.sleep)(3)
+
+        async def free_room():
+            await asyncio.sleep(0.5)
+            room.status = Room.Status.FREE
+            # Не в потоке запросов: его держит первый запрос
+            await sync_to_async(save_room, thread_sensitive=False)()
+            return time.monotonic()
+
+        async def second_request():
+            self.assertTrue(await notifier.wait(last, 10))
+            return time.monotonic()
+
+        _, changed, woken = await asyncio.gather(first_request(), free_room(), second_request())
+        self.assertLess(woken - changed, 1.5)
+
+    @override_settings(DEBUG=True)
+    def test_asgi_chain_has_no_sync_middleware(self):
+        # Синхронный middleware занимал бы поток на всё время ожидания
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            ASGIHandler()
+
+
+class ViewQueryBudgetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Сотрудник с is_staff: ему доступны и метрики
+        self.client.force_login(User.objects.create_user('staff', password='password', is_staff=True))
+
+    def get_url(self, pattern):
+        url = '/' + str(pattern.pattern)
+        if '<int:pk>' in url:
+            url = url.replace('<int:pk>', str(self.pks[pattern.name]))
+        if pattern.name == 'room_availability':
+            url += '?checkin=2026-01-01&checkout=2026-01-05'
+        if pattern.name in ('changes', 'changes_stream'):
+            url += '?since=0&timeout=0'
+        return url
+
+    def count_queries(self):
+        counts = {}
+        for pattern in hotel_urls.urlpatterns:
+            if pattern.name in POST_ONLY:
+                continue
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(self.get_url(pattern))
+                if response.streaming:
+                    # Асинхронный поток под синхронным клиентом читается через итерацию ответа
+                    b''.join(response)
+            self.assertEqual(response.status_code, 200, pattern.name)
+            counts[pattern.name] = len(queries)
+        return counts
+
+    def test_every_view_has_budget(self):
+        names = {pattern.name for pattern in hotel_urls.urlpatterns}
+        self.assertEqual(names - POST_ONLY, set(QUERY_BUDGETS))
+
+    def test_query_count_does_not_grow_with_rows(self):
+        seed_sample_data(2, 'A')
+        self.pks = {
+            name: model.objects.order_by('pk').values_list('pk', flat=True).first()
+            for names, model in [
+                (['client_detail', 'client_edit', 'client_delete'], Client),
+                (['booking_detail', 'booking_edit'], Booking),
+                (['accommodation_edit', 'accommodation_delete'], Accommodation),
+                (['room_edit', 'room_delete'], Room),
+                (['employee_edit', 'employee_delete'], Employee),
+                (['position_edit', 'position_delete'], Position),
+                (['building_edit', 'building_delete'], Building),
+                (['address_edit', 'address_delete'], Address),
+                (['product_edit', 'product_delete'], Product),
+                (['buildingproduct_edit'], BuildingProducts),
+                (['service_edit', 'service_delete'], Service),
+                (['productorder_edit', 'productorder_delete'], ProductOrder),
+                (['serviceorder_edit', 'serviceorder_delete'], ServiceOrder),
+            ]
+            for name in names
+        }
+        small = self.count_queries()
+        seed_sample_data(12, 'B')
+        cache.clear()
+        large = self.count_queries()
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(name):
+                self.assertEqual(large[name], small[name], 'число запросов растёт вместе с данными')
+                self.assertLessEqual(large[name], budget)
+
+    def count_post_queries(self, tag):
+        room = Room.objects.create(
+            room_type=RoomType.objects.first(), building=Building.objects.first(), room_number=f'P{tag}',
+        )
+        client = Client.objects.first()
+        checkin = datetime.date.today() + datetime.timedelta(days=400)
+        stay, cancelled = [
+            Booking.objects.create(
+                client=client, room=room, status=Booking.Status.CONFIRMED,
+                checkin_date=checkin + datetime.timedelta(days=offset),
+                checkout_date=checkin + datetime.timedelta(days=offset + 3),
+            )
+            for offset in (0, 10)
+        ]
+        requests = {
+            'booking_checkin': (f'/bookings/{stay.pk}/checkin/', {}),
+            'booking_checkout': (f'/bookings/{stay.pk}/checkout/', {}),
+            'booking_cancel': (f'/bookings/{cancelled.pk}/cancel/', {}),
+            'update_availability': ('/update-availability/', {
+                'product_id': Product.objects.first().pk, 'is_available': 'false',
+            }),
+            'building_select': ('/buildings/select/', {
+                'building': Building.objects.last().pk, 'next': '/inventory/',
+            }),
+        }
+        counts = {}
+        for name, (url, data) in requests.items():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(url, data)
+            self.assertIn(response.status_code, (200, 302), name)
+            counts[name] = len(queries)
+        return counts
+
+    def test_post_query_count_does_not_grow_with_rows(self):
+        seed_sample_data(2, 'A')
+        small = self.count_post_queries('A')
+        seed_sample_data(12, 'B')
+        cache.clear()
+        large = self.count_post_queries('B')
+        for name, budget in POST_BUDGETS.items():
+            with self.subTest(name):
+                self.assertEqual(large[name], small[name], 'число запросов растёт вместе с данными')
+                self.assertLessEqual(large[name], budget)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics_registry.reset()
+        self.client.force_login(User.objects.create_user('staff', password='password', is_staff=True))
+        make_client()
+
+    @override_settings(HOTEL_METRICS_TOKEN='scrape-token')
+    def test_metrics_require_token_or_staff(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code, 403)
+        self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer scrape-token'}).status_code, 200)
+        self.client.force_login(User.objects.create_user('clerk', password='password'))
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    def test_server_timing_and_histograms_per_route(self):
+        response = self.client.get('/clients/')
+        timing = re.fullmatch(
+            r'app;dur=([\d.]+), db;dur=([\d.]+);desc="(\d+) queries", tpl;dur=([\d.]+)', response['Server-Timing'],
+        )
+        self.assertIsNotNone(timing, response['Server-Timing'])
+        self.assertGreater(int(timing[3]), 0)
+        self.assertGreater(float(timing[4]), 0)
+        self.client.get('/no-such-page/')
+
+        text = self.client.get('/metrics').content.decode()
+        self.assertIn('hotel_request_duration_seconds_count{view="client_list",method="GET"} 1\n', text)
+        self.assertIn(f'hotel_request_db_queries_sum{{view="client_list",method="GET"}} {timing[3]}\n', text)
+        self.assertIn('hotel_request_template_seconds_bucket{view="client_list",method="GET",le="+Inf"} 1\n', text)
+        self.assertIn('hotel_requests_total{view="client_list",method="GET",status="200"} 1\n', text)
+        self.assertIn('hotel_requests_total{view="unmatched",method="GET",status="404"} 1\n', text)
+
+    def test_snapshots_of_other_processes_are_summed(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(HOTEL_METRICS_DIR=directory):
+            self.client.get('/clients/')
+            metrics_registry.flush()
+            # Снимок «другого воркера» — копия своего
+            with open(os.path.join(directory, f'{os.getpid()}.json'), encoding='utf-8') as f:
+                snapshot = f.read()
+            with open(os.path.join(directory, '1.json'), 'w', encoding='utf-8') as f:
+                f.write(snapshot)
+            text = self.client.get('/metrics').content.decode()
+        self.assertIn('hotel_request_duration_seconds_count{view="client_list",method="GET"} 2\n', text)
+        self.assertIn('hotel_requests_total{view="client_list",method="GET",status="200"} 2\n', text)
+
+
+class SeedHotelTests(TestCase):
+    TODAY = datetime.date(2024, 6, 1)
+
+    def seed(self):
+        return HotelSeeder(
+            addresses=2, buildings=2, rooms_per_building=4, room_types=3, clients=40, years=1, seed=7,
+            today=self.TODAY,
+        ).run()
+
+    def fingerprint(self):
+        return list(Booking.objects.order_by('pk').values_list(
+            'room__room_number', 'checkin_date', 'checkout_date', 'status', 'charges', 'paid', 'created_at',
+        ))
+
+    def test_derived_rows_match_model_logic(self):
+        counts = self.seed()
+        self.assertEqual(counts[Booking], Booking.objects.count())
+        self.assertGreater(counts[Booking], 100)
+        # Занятые ночи — только у активных броней, без пересечений
+        active = Booking.objects.filter(status__in=Booking.ACTIVE_STATUSES)
+        self.assertEqual(RoomNight.objects.count(), sum((b.checkout_date - b.checkin_date for b in active), datetime.timedelta()).days)
+        # Счёт брони: проживание и заказы против проведённых платежей
+        for booking in Booking.objects.filter(pk__in=Booking.objects.order_by('?').values('pk')[:30]):
+            orders = (
+                ProductOrder.objects.filter(accommodation__booking=booking).aggregate(total=Sum('total_price'))['total']
+                or 0
+            ) + (
+                ServiceOrder.objects.filter(accommodation__booking=booking).aggregate(total=Sum('total_price'))['total']
+                or 0
+            )
+            paid = booking.payments.filter(status=Payment.Status.PAID).aggregate(total=Sum('amount'))['total'] or 0
+            charges = Booking.room_charge(booking.status, booking.total_price) + orders
+            self.assertEqual((booking.charges, booking.paid, booking.outstanding), (charges, paid, charges - paid))
+        # Остатки сходятся с журналом склада
+        for stock in BuildingProducts.objects.all():
+            moved = StockMovement.objects.filter(
+                product=stock.product_id, building=stock.building_id,
+            ).aggregate(total=Sum('delta'))['total'] or 0
+            self.assertEqual(stock.quantity, moved)
+        self.assertEqual(ClientSearchToken.objects.values('client').distinct().count(), 40)
+        client = Client.objects.first()
+        self.assertIn(client, Client.objects.search(client.last_name))
+        # Сводка по дням совпадает с пересчётом с нуля
+        fields = ('building', 'room_type', 'day', 'revenue', 'occupied_nights', 'available_nights')
+        seeded = list(DailyStat.objects.order_by(*fields[:3]).values_list(*fields))
+        DailyStat.objects.rebuild()
+        self.assertEqual(seeded, list(DailyStat.objects.order_by(*fields[:3]).values_list(*fields)))
+
+    def test_same_seed_gives_same_data(self):
+        self.seed()
+        first = self.fingerprint()
+        self.assertTrue(all(created.date() < self.TODAY for *_, created in first))
+        Address.objects.all().delete()
+        Client.objects.all().delete()
+        self.seed()
+        self.assertEqual(self.fingerprint(), first)
+
+
+class BenchSuiteTests(TestCase):
+    def test_suite_runs_every_case(self):
+        HotelSeeder(addresses=1, buildings=2, rooms_per_building=6, room_types=2, clients=30, years=1).run()
+        results = run_suite(list(CASES), repeat=2)
+        self.assertEqual(set(results), set(CASES))
+        for name, result in results.items():
+            with self.subTest(name):
+                self.assertEqual(result['ops'], 2)
+                self.assertGreater(result['queries'], 0)
+                self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+
+    def test_compare_flags_slowdown_and_extra_queries(self):
+        baseline = {name: {'p50_ms': 10.0, 'queries': 5} for name in ('a', 'b', 'c')}
+        results = {
+            'a': {'p50_ms': 12.0, 'queries': 5},
+            'b': {'p50_ms': 14.0, 'queries': 5},
+            'c': {'p50_ms': 9.0, 'queries': 6},
+            'd': {'p50_ms': 1.0, 'queries': 1},
+        }
+        flags = {row[0]: row[-1] for row in compare(results, baseline, 0.3)}
+        self.assertEqual(flags, {'a': False, 'b': True, 'c': True, 'd': False})
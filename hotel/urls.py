@@ -1,11 +1,10 @@
 from django.urls import path
 from . import views
 
-app_name = 'hotel'
-
 urlpatterns = [
     # === Панель управления ===
-    path('', views.DashboardView.as_view(), name='dashboard'),
+    path('', views.AsyncDashboardView.as_view(), name='dashboard'),
+    path('analytics/', views.AsyncAnalyticsDashboardView.as_view(), name='analytics'),
 
     # === Клиенты ===
     path('clients/', views.ClientListView.as_view(), name='client_list'),
@@ -16,6 +15,7 @@ urlpatterns = [
 
     # === Бронирования и проживания ===
     path('bookings/', views.BookingListView.as_view(), name='booking_list'),
+    path('bookings/export/', views.BookingExportView.as_view(), name='booking_export'),
     path('bookings/add/', views.BookingCreateView.as_view(), name='booking_add'),
     path('bookings/<int:pk>/', views.BookingDetailView.as_view(), name='booking_detail'),
     path('bookings/<int:pk>/edit/', views.BookingUpdateView.as_view(), name='booking_edit'),
@@ -29,10 +29,13 @@ urlpatterns = [
 
     # === Платежи ===
     path('payments/', views.PaymentListView.as_view(), name='payment_list'),
+    path('payments/export/', views.PaymentExportView.as_view(), name='payment_export'),
+    path('payments/receivables/', views.ReceivablesView.as_view(), name='receivables'),
     path('payments/add/', views.PaymentCreateView.as_view(), name='payment_add'),
 
     # === Номера ===
     path('rooms/', views.RoomListView.as_view(), name='room_list'),
+    path('rooms/availability/', views.RoomAvailabilityView.as_view(), name='room_availability'),
     path('rooms/add/', views.RoomCreateView.as_view(), name='room_add'),
     path('rooms/<int:pk>/edit/', views.RoomUpdateView.as_view(), name='room_edit'),
     path('rooms/<int:pk>/delete/', views.RoomDeleteView.as_view(), name='room_delete'),
@@ -42,6 +45,7 @@ urlpatterns = [
     path('staff/employees/add/', views.EmployeeCreateView.as_view(), name='employee_add'),
     path('staff/employees/<int:pk>/edit/', views.EmployeeUpdateView.as_view(), name='employee_edit'),
     path('staff/employees/<int:pk>/delete/', views.EmployeeDeleteView.as_view(), name='employee_delete'),
+    path('staff/employees/export/', views.EmployeeExportView.as_view(), name='employee_export'),
     path('staff/positions/', views.PositionListView.as_view(), name='position_list'),
     path('staff/positions/add/', views.PositionCreateView.as_view(), name='position_add'),
     path('staff/positions/<int:pk>/edit/', views.PositionUpdateView.as_view(), name='position_edit'),
@@ -62,7 +66,9 @@ urlpatterns = [
     path('products/add/', views.ProductCreateView.as_view(), name='product_add'),
     path('products/<int:pk>/edit/', views.ProductUpdateView.as_view(), name='product_edit'),
     path('products/<int:pk>/delete/', views.ProductDeleteView.as_view(), name='product_delete'),
+    path('inventory/building-products/', views.BuildingProductsListView.as_view(), name='buildingproduct_list'),
     path('inventory/building-products/<int:pk>/edit/', views.BuildingProductsUpdateView.as_view(), name='buildingproduct_edit'),
+    path('buildings/select/', views.BuildingSelectView.as_view(), name='building_select'),
     path('update-availability/', views.update_availability, name='update_availability'),
 
     # === Услуги ===
@@ -71,9 +77,22 @@ urlpatterns = [
     path('services/<int:pk>/edit/', views.ServiceUpdateView.as_view(), name='service_edit'),
     path('services/<int:pk>/delete/', views.ServiceDeleteView.as_view(), name='service_delete'),
 
+    # === JSON API ===
+    path('api/rooms/', views.RoomApiView.as_view(), name='api_rooms'),
+    path('api/bookings/', views.BookingApiView.as_view(), name='api_bookings'),
+    path('api/payments/', views.PaymentApiView.as_view(), name='api_payments'),
+
+    # === Лента изменений ===
+    path('changes/', views.ChangeFeedView.as_view(), name='changes'),
+    path('changes/stream/', views.ChangeStreamView.as_view(), name='changes_stream'),
+
+    # === Метрики ===
+    path('metrics', views.metrics, name='metrics'),
+
     # === Инвентарь и заказы ===
     path('inventory/', views.InventoryListView.as_view(), name='inventory_list'),
     path('inventory/orders/', views.InventoryOrderListView.as_view(), name='inventory_orders'),
+    path('inventory/orders/export/', views.InventoryOrderExportView.as_view(), name='inventory_orders_export'),
     path('inventory/orders/add/', views.ProductOrderCreateView.as_view(), name='productorder_add'),
     path('inventory/orders/<int:pk>/edit/', views.ProductOrderUpdateView.as_view(), name='productorder_edit'),
     path('inventory/orders/<int:pk>/delete/', views.ProductOrderDeleteView.as_view(), name='productorder_delete'),
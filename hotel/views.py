@@ -1,25 +1,47 @@
-from django.http import HttpResponse, JsonResponse
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.views import View
 from django.views.generic import (
     ListView, CreateView, UpdateView, DetailView, TemplateView, DeleteView
 )
 from django.core.paginator import Paginator
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.views.decorators.http import require_POST
+from django.core.exceptions import PermissionDenied, ValidationError
 from django.utils import timezone
-from django.db.models import Q, Sum
-from django.db.models.functions import TruncDay
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum, Value
 
-import csv
 import datetime
 
 from .models import (
     Client, Service, Product, Booking, Payment, Room, ProductOrder, ServiceOrder,
-    Accommodation, BuildingProducts, BuildingServices, Building, Employee, Position, Address
+    Accommodation, BuildingProducts, BuildingServices, Building, Employee, Position, Address,
+    DailyStat, RoomType
 )
+from .availability import find_available_rooms, group_available_rooms
+from .aggregates import gather_aggregates, run_in_order
+from .counters import aget_dashboard_counters, get_dashboard_counters
+from .pagination import KeysetPaginationMixin
+from .pagecache import CachedPageMixin
+from .buildings import BUILDING_SESSION_KEY, get_buildings
+from .api import ApiListView
+from .changes import (
+    CHANGES_MAX_WAIT, CHANGES_STREAM_SECONDS, get_events, get_last_seq, get_notifier, parse_feed_params,
+    stream_events,
+)
+from .exports import CSVExportMixin
+from .metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE, is_authorized as is_metrics_authorized, registry as metrics_registry,
+    render_metrics,
+)
+from .fields import choice_label, choices_matching
+from .reservations import save_booking
 from .forms import (
     BuildingForm, AccommodationForm, ClientForm, BookingForm, PaymentForm,
     ProductOrderForm, ServiceOrderForm, EmployeeForm, PositionForm,
@@ -32,23 +54,18 @@ class ProtectedView(LoginRequiredMixin, View):
 
 
 # === Клиенты ===
-class ClientListView(ProtectedView, ListView):
+class ClientListView(ProtectedView, KeysetPaginationMixin, ListView):
     model = Client
     template_name = 'hotel/client_list.html'
     context_object_name = 'clients'
     paginate_by = 10
+    keyset_fields = ('registration_date', 'id')
 
     def get_queryset(self):
         queryset = super().get_queryset()
         search_query = self.request.GET.get('q', '').strip()
         if search_query:
-            queryset = queryset.filter(
-                Q(first_name__icontains=search_query) |
-                Q(last_name__icontains=search_query) |
-                Q(phone__icontains=search_query) |
-                Q(email__icontains=search_query) |
-                Q(passport_data__icontains=search_query)
-            )
+            queryset = queryset.search(search_query)
         return queryset
 
 
@@ -84,21 +101,34 @@ class ClientDeleteView(ProtectedView, DeleteView):
 
 
 # === Бронирования ===
-class BookingListView(ProtectedView, ListView):
+class BookingFormMixin:
+    # Номер могли занять между проверкой формы и сохранением, поэтому
+    # save_booking повторяет проверку под блокировкой номера.
+    def form_valid(self, form):
+        try:
+            self.object = save_booking(form.instance)
+        except ValidationError as e:
+            form.add_error(None, e)
+            return self.form_invalid(form)
+        return redirect(self.get_success_url())
+
+
+class BookingListView(ProtectedView, KeysetPaginationMixin, ListView):
     model = Booking
+    queryset = Booking.objects.select_related('client', 'room__room_type')
     template_name = 'hotel/booking_list.html'
     context_object_name = 'bookings'
     paginate_by = 10
 
 
-class BookingCreateView(ProtectedView, CreateView):
+class BookingCreateView(ProtectedView, BookingFormMixin, CreateView):
     model = Booking
     form_class = BookingForm
     template_name = 'hotel/booking_form.html'
     success_url = reverse_lazy('booking_list')
 
 
-class BookingUpdateView(ProtectedView, UpdateView):
+class BookingUpdateView(ProtectedView, BookingFormMixin, UpdateView):
     model = Booking
     form_class = BookingForm
     template_name = 'hotel/booking_form.html'
@@ -107,21 +137,21 @@ class BookingUpdateView(ProtectedView, UpdateView):
 
 class BookingDetailView(ProtectedView, DetailView):
     model = Booking
+    queryset = Booking.objects.select_related('client', 'room__room_type')
     template_name = 'hotel/booking_detail.html'
     context_object_name = 'booking'
 
 
 class BookingCancelView(ProtectedView, View):
     def post(self, request, pk):
-        booking = get_object_or_404(Booking, pk=pk)
-        booking.status = 'Отменен'
-        booking.save()
+        booking = get_object_or_404(Booking.objects.select_related('room'), pk=pk)
+        booking.set_status(Booking.Status.CANCELLED)
         return redirect('booking_list')
 
 
 class CheckInView(ProtectedView, View):
     def post(self, request, pk):
-        booking = get_object_or_404(Booking, pk=pk, status='Подтвержден')
+        booking = get_object_or_404(Booking.objects.select_related('room'), pk=pk, status=Booking.Status.CONFIRMED)
         Accommodation.objects.create(
             booking=booking,
             actual_checkin_date=timezone.now().date()
@@ -131,18 +161,39 @@ class CheckInView(ProtectedView, View):
 
 class CheckOutView(ProtectedView, View):
     def post(self, request, pk):
-        accommodation = get_object_or_404(Accommodation, booking_id=pk)
-        accommodation.actual_checkout_date = timezone.now().date()
-        accommodation.status = 'Выехал'
-        accommodation.save()
+        accommodation = get_object_or_404(Accommodation.objects.select_related('booking__room'), booking_id=pk)
+        accommodation.check_out(timezone.now().date())
         return redirect('booking_detail', pk=pk)
 
 
+class BookingExportView(ProtectedView, CSVExportMixin, View):
+    model = Booking
+    filename = 'bookings.csv'
+    date_field = 'checkin_date'
+    building_field = 'room__building'
+    columns = (
+        ('ID', 'id'),
+        ('Фамилия', 'client__last_name'),
+        ('Имя', 'client__first_name'),
+        ('Телефон', 'client__phone'),
+        ('Гостиница', 'room__building__name'),
+        ('Номер', 'room__room_number'),
+        ('Тип номера', 'room__room_type__name'),
+        ('Дата заезда', 'checkin_date'),
+        ('Дата выезда', 'checkout_date'),
+        ('Стоимость', 'total_price'),
+        ('Статус', choice_label('status', Booking.Status)),
+        ('Создано', 'created_at'),
+    )
+
+
 # === Платежи ===
-class PaymentListView(ProtectedView, ListView):
+class PaymentListView(ProtectedView, KeysetPaginationMixin, ListView):
     model = Payment
     template_name = 'hotel/payment_list.html'
     context_object_name = 'payments'
+    paginate_by = 20
+    keyset_fields = ('payment_date', 'id')
 
     def get_queryset(self):
         queryset = super().get_queryset().select_related('booking', 'booking__client')
@@ -151,16 +202,37 @@ class PaymentListView(ProtectedView, ListView):
             queryset = queryset.filter(
                 Q(booking__client__first_name__icontains=search_query) |
                 Q(booking__client__last_name__icontains=search_query) |
-                Q(payment_method__icontains=search_query) |
-                Q(status__icontains=search_query)
+                Q(payment_method__in=choices_matching(Payment.Method, search_query)) |
+                Q(status__in=choices_matching(Payment.Status, search_query))
             )
         return queryset.order_by('-payment_date')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = 'Платежи и отчёты'
-        context['total_paid'] = self.get_queryset().aggregate(Sum('amount'))['amount__sum'] or 0
-        context['unpaid_bookings'] = Booking.objects.filter(payments__isnull=True)
+        if self.request.GET.get('q'):
+            context['total_paid'] = self.get_queryset().aggregate(Sum('amount'))['amount__sum'] or 0
+        else:
+            # Без фильтра сумма берётся из сводки по дням, а не из всех платежей
+            context['total_paid'] = DailyStat.objects.aggregate(Sum('revenue'))['revenue__sum'] or 0
+        # Частичный индекс по outstanding > 0: читаются только должники
+        context['unpaid_bookings'] = Booking.objects.filter(outstanding__gt=0).select_related(
+            'client'
+        ).order_by('-outstanding', '-id')[:10]
+        return context
+
+
+class ReceivablesView(ProtectedView, KeysetPaginationMixin, ListView):
+    model = Booking
+    queryset = Booking.objects.filter(outstanding__gt=0).select_related('client', 'room__building')
+    template_name = 'hotel/receivables.html'
+    context_object_name = 'bookings'
+    paginate_by = 20
+    keyset_fields = ('outstanding', 'id')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['total_outstanding'] = self.queryset.aggregate(Sum('outstanding'))['outstanding__sum'] or 0
         return context
 
 
@@ -175,10 +247,38 @@ class PaymentCreateView(ProtectedView, CreateView):
         context['title'] = 'Добавление платежа'
         return context
 
+    def form_valid(self, form):
+        # Проведённый платёж переводит бронь в «Оплачен» и занимает её ночи;
+        # если их уже заняла другая бронь, платёж не сохраняется
+        try:
+            return super().form_valid(form)
+        except ValidationError as e:
+            form.add_error('booking', e)
+            return self.form_invalid(form)
+
+
+class PaymentExportView(ProtectedView, CSVExportMixin, View):
+    model = Payment
+    filename = 'payments.csv'
+    date_field = 'payment_date'
+    building_field = 'booking__room__building'
+    columns = (
+        ('ID', 'id'),
+        ('Бронирование', 'booking_id'),
+        ('Фамилия', 'booking__client__last_name'),
+        ('Имя', 'booking__client__first_name'),
+        ('Гостиница', 'booking__room__building__name'),
+        ('Дата платежа', 'payment_date'),
+        ('Сумма', 'amount'),
+        ('Метод оплаты', choice_label('payment_method', Payment.Method)),
+        ('Статус', choice_label('status', Payment.Status)),
+    )
+
 
 # === Проживания ===
 class AccommodationListView(ProtectedView, ListView):
     model = Accommodation
+    queryset = Accommodation.objects.select_related('booking__client', 'booking__room__room_type')
     template_name = 'hotel/accommodations_list.html'
     context_object_name = 'accommodations'
 
@@ -209,6 +309,7 @@ class AccommodationUpdateView(ProtectedView, UpdateView):
 
 class AccommodationDeleteView(ProtectedView, DeleteView):
     model = Accommodation
+    queryset = Accommodation.objects.select_related('booking__client', 'booking__room')
     template_name = 'hotel/accommodation_confirm_delete.html'
     success_url = reverse_lazy('accommodation_list')
 
@@ -216,11 +317,40 @@ class AccommodationDeleteView(ProtectedView, DeleteView):
 # === Номера ===
 class RoomListView(ProtectedView, ListView):
     model = Room
+    queryset = Room.objects.select_related('building', 'room_type')
     template_name = 'hotel/room_list.html'
     context_object_name = 'rooms'
     paginate_by = 20
 
 
+class RoomAvailabilityView(ProtectedView, View):
+    def get(self, request):
+        try:
+            checkin_date = datetime.date.fromisoformat(request.GET.get('checkin', ''))
+            checkout_date = datetime.date.fromisoformat(request.GET.get('checkout', ''))
+        except ValueError:
+            return JsonResponse({'status': 'error', 'message': 'Укажите даты checkin и checkout в формате ГГГГ-ММ-ДД'}, status=400)
+        if checkin_date >= checkout_date:
+            return JsonResponse({'status': 'error', 'message': 'Дата заезда должна быть раньше даты выезда.'}, status=400)
+        building = request.GET.get('building', '')
+        room_type = request.GET.get('room_type', '')
+        if not all(value.isdigit() for value in (building, room_type) if value):
+            return JsonResponse({'status': 'error', 'message': 'Некорректный идентификатор здания или типа номера'}, status=400)
+        nights = (checkout_date - checkin_date).days
+        rows = find_available_rooms(
+            checkin_date, checkout_date,
+            building=building or None,
+            room_type=room_type or None,
+        )
+        return JsonResponse({
+            'status': 'success',
+            'checkin': checkin_date.isoformat(),
+            'checkout': checkout_date.isoformat(),
+            'nights': nights,
+            'buildings': group_available_rooms(rows, nights),
+        })
+
+
 class RoomCreateView(ProtectedView, CreateView):
     model = Room
     form_class = RoomForm
@@ -230,6 +360,7 @@ class RoomCreateView(ProtectedView, CreateView):
 
 class RoomUpdateView(ProtectedView, UpdateView):
     model = Room
+    queryset = Room.objects.select_related('room_type')
     form_class = RoomForm
     template_name = 'hotel/room_form.html'
     success_url = reverse_lazy('room_list')
@@ -242,27 +373,23 @@ class RoomDeleteView(ProtectedView, DeleteView):
 
 
 # === Товары ===
-class ProductListView(ProtectedView, ListView):
+class ProductListView(ProtectedView, CachedPageMixin, ListView):
     model = Product
+    cache_models = (Product, BuildingProducts, Building)
+    cache_per_building = True
     template_name = 'hotel/product_list.html'
     context_object_name = 'products'
     paginate_by = 10
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        building = Building.objects.first()
+        # Наличие в текущей гостинице берётся из кэша справочников
+        stocks = self.request.building.products
         products_with_availability = []
         for product in context['products']:
-            try:
-                stock = BuildingProducts.objects.get(product=product, building=building)
-                is_available = stock.is_available
-            except BuildingProducts.DoesNotExist:
-                stock = None
-                is_available = False
             products_with_availability.append({
                 'product': product,
-                'stock': stock,
-                'is_available': is_available
+                'is_available': stocks.get(product.pk, False)
             })
         context['products'] = products_with_availability
         return context
@@ -289,8 +416,9 @@ class ProductDeleteView(ProtectedView, DeleteView):
 
 
 # === Услуги ===
-class ServiceListView(ProtectedView, ListView):
+class ServiceListView(ProtectedView, CachedPageMixin, ListView):
     model = Service
+    cache_models = (Service,)
     template_name = 'hotel/service_list.html'
     context_object_name = 'services'
     paginate_by = 10
@@ -325,33 +453,41 @@ class ProductOrderListView(ProtectedView, ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        paginator = Paginator(ProductOrder.objects.all(), 10)
+        paginator = Paginator(ProductOrder.objects.filter(
+            accommodation__booking__room__building=self.request.building.pk
+        ).select_related('product', 'accommodation__booking__client'), 10)
         page_number = self.request.GET.get('page')
         context['page_obj'] = paginator.get_page(page_number)
         return context
 
 
-class ProductOrderCreateView(ProtectedView, CreateView):
-    model = ProductOrder
-    form_class = ProductOrderForm
-    template_name = 'hotel/productorder_form.html'
-    success_url = reverse_lazy('inventory_orders')
+class BuildingFormMixin:
+    # Выбор проживаний и позиций ограничен текущей гостиницей
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['building'] = self.request.building
+        return kwargs
 
+
+class ProductOrderFormMixin(BuildingFormMixin):
+    # Наличие и остаток проверяются при списании со склада гостиницы,
+    # в которой живёт гость; нехватка товара возвращается в форму.
     def form_valid(self, form):
-        product = form.cleaned_data['product']
-        building = Building.objects.first()
         try:
-            stock = BuildingProducts.objects.get(product=product, building=building)
-            if not stock.is_available:
-                form.add_error('product', 'Этот товар недоступен для заказа.')
-                return self.form_invalid(form)
-        except BuildingProducts.DoesNotExist:
-            form.add_error('product', 'Информация о наличии товара отсутствует.')
+            return super().form_valid(form)
+        except ValidationError as e:
+            form.add_error('quantity', e)
             return self.form_invalid(form)
-        return super().form_valid(form)
 
 
-class ProductOrderUpdateView(ProtectedView, UpdateView):
+class ProductOrderCreateView(ProtectedView, ProductOrderFormMixin, CreateView):
+    model = ProductOrder
+    form_class = ProductOrderForm
+    template_name = 'hotel/productorder_form.html'
+    success_url = reverse_lazy('inventory_orders')
+
+
+class ProductOrderUpdateView(ProtectedView, ProductOrderFormMixin, UpdateView):
     model = ProductOrder
     form_class = ProductOrderForm
     template_name = 'hotel/productorder_form.html'
@@ -367,18 +503,22 @@ class ProductOrderDeleteView(ProtectedView, DeleteView):
 # === Заказы услуг ===
 class ServiceOrderListView(ProtectedView, ListView):
     model = ServiceOrder
+    queryset = ServiceOrder.objects.select_related('service', 'accommodation__booking__client', 'accommodation__booking__room')
     template_name = 'hotel/serviceorder_list.html'
     paginate_by = 20
 
+    def get_queryset(self):
+        return super().get_queryset().filter(accommodation__booking__room__building=self.request.building.pk)
+
 
-class ServiceOrderCreateView(ProtectedView, CreateView):
+class ServiceOrderCreateView(ProtectedView, BuildingFormMixin, CreateView):
     model = ServiceOrder
     form_class = ServiceOrderForm
     template_name = 'hotel/serviceorder_form.html'
     success_url = reverse_lazy('inventory_orders')
 
 
-class ServiceOrderUpdateView(ProtectedView, UpdateView):
+class ServiceOrderUpdateView(ProtectedView, BuildingFormMixin, UpdateView):
     model = ServiceOrder
     form_class = ServiceOrderForm
     template_name = 'hotel/serviceorder_form.html'
@@ -397,9 +537,9 @@ class InventoryListView(ProtectedView, TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        building = Building.objects.first()
-        context['products'] = BuildingProducts.objects.filter(building=building)
-        context['services'] = BuildingServices.objects.filter(building=building)
+        building = self.request.building
+        context['products'] = BuildingProducts.objects.filter(building=building.pk)
+        context['services'] = BuildingServices.objects.filter(building=building.pk)
         return context
 
 
@@ -408,27 +548,27 @@ class InventoryOrderListView(ProtectedView, ListView):
     context_object_name = 'product_orders'
 
     def get_queryset(self):
-        building = Building.objects.first()
+        building = self.request.building.pk
         product_orders = ProductOrder.objects.select_related(
-            'product', 'accommodation__booking__client', 'accommodation__booking__room__building'
-        ).all()
+            'product', 'accommodation__booking__client'
+        ).filter(accommodation__booking__room__building=building)
         service_orders = ServiceOrder.objects.select_related(
             'service', 'accommodation__booking__client'
-        ).all()
+        ).filter(accommodation__booking__room__building=building)
+        stocks = {
+            stock.product_id: stock
+            for stock in BuildingProducts.objects.filter(
+                building=building, product__in=product_orders.values('product'),
+            )
+        }
         combined_orders = []
         for order in product_orders:
-            building = order.accommodation.booking.room.building
-            try:
-                stock = BuildingProducts.objects.get(product=order.product, building=building)
-                is_available = stock.is_available
-            except BuildingProducts.DoesNotExist:
-                stock = None
-                is_available = False
+            stock = stocks.get(order.product_id)
             combined_orders.append({
                 'order': order,
                 'stock': stock,
                 'is_service': False,
-                'is_available': is_available
+                'is_available': stock.is_available if stock else False
             })
         for order in service_orders:
             combined_orders.append({
@@ -439,24 +579,86 @@ class InventoryOrderListView(ProtectedView, ListView):
             })
         return combined_orders
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['product_orders'] = self.get_queryset()
-        return context
+
+class InventoryOrderExportView(ProtectedView, CSVExportMixin, View):
+    filename = 'orders.csv'
+    date_field = 'order_date'
+    building_field = 'accommodation__booking__room__building'
+    product_columns = (
+        ('ID', 'id'),
+        ('Дата заказа', 'order_date'),
+        ('Гостиница', 'accommodation__booking__room__building__name'),
+        ('Номер', 'accommodation__booking__room__room_number'),
+        ('Фамилия', 'accommodation__booking__client__last_name'),
+        ('Имя', 'accommodation__booking__client__first_name'),
+        ('Позиция', 'product__name'),
+        ('Количество', 'quantity'),
+        ('Сумма', 'total_price'),
+    )
+    # У услуг нет количества — в этом столбце всегда единица
+    service_columns = (
+        ('ID', 'id'),
+        ('Дата заказа', 'order_date'),
+        ('Гостиница', 'accommodation__booking__room__building__name'),
+        ('Номер', 'accommodation__booking__room__room_number'),
+        ('Фамилия', 'accommodation__booking__client__last_name'),
+        ('Имя', 'accommodation__booking__client__first_name'),
+        ('Позиция', 'service__name'),
+        ('Количество', Value(1)),
+        ('Сумма', 'total_price'),
+    )
+
+    def get_header(self):
+        return ['Тип'] + [header for header, field in self.product_columns]
+
+    def get_rows(self, filters):
+        # Товары и услуги идут двумя последовательными потоками
+        for kind, model, columns in (
+            ('Товар', ProductOrder, self.product_columns),
+            ('Услуга', ServiceOrder, self.service_columns),
+        ):
+            queryset = filters.apply(model.objects.order_by('pk'), self.date_field, self.building_field)
+            for row in self.iter_values(queryset, columns):
+                yield (kind,) + row
 
 
 # === Остатки товаров ===
 class BuildingProductsListView(ProtectedView, ListView):
     model = BuildingProducts
+    queryset = BuildingProducts.objects.select_related('building', 'product').order_by('product__name')
     template_name = 'hotel/buildingproducts_list.html'
     paginate_by = 20
 
+    def get_queryset(self):
+        return super().get_queryset().filter(building=self.request.building.pk)
+
 
 class BuildingProductsUpdateView(ProtectedView, UpdateView):
     model = BuildingProducts
     form_class = BuildingProductsForm
     template_name = 'hotel/buildingproducts_form.html'
-    success_url = reverse_lazy('product_list')
+    success_url = reverse_lazy('buildingproduct_list')
+
+    def form_valid(self, form):
+        # Остаток меняется только через журнал движений, не прямой записью:
+        # форма сохраняет лишь свои поля, иначе прочитанный до take/put
+        # quantity перезаписал бы остаток
+        receipt = form.cleaned_data.get('receipt')
+        try:
+            with transaction.atomic():
+                self.object = form.save(commit=False)
+                self.object.save(update_fields=form._meta.fields)
+                response = redirect(self.get_success_url())
+                if receipt and receipt > 0:
+                    BuildingProducts.objects.put(self.object.product_id, self.object.building_id, receipt)
+                elif receipt:
+                    BuildingProducts.objects.take(
+                        self.object.product_id, self.object.building_id, -receipt, reason='Списание',
+                    )
+        except ValidationError as e:
+            form.add_error('receipt', e)
+            return self.form_invalid(form)
+        return response
 
 
 # === Доступность услуг ===
@@ -476,6 +678,7 @@ class BuildingServicesUpdateView(ProtectedView, UpdateView):
 # === Сотрудники ===
 class EmployeeListView(ProtectedView, ListView):
     model = Employee
+    queryset = Employee.objects.select_related('building').prefetch_related('positions')
     template_name = 'hotel/employee_list.html'
     paginate_by = 20
 
@@ -503,26 +706,35 @@ class EmployeeUpdateView(ProtectedView, UpdateView):
 
 class EmployeeDeleteView(ProtectedView, DeleteView):
     model = Employee
-    template_name = 'hotel/employee_confirm_delete.html'
+    template_name = 'hotel/instant_delete.html'
     success_url = reverse_lazy('employee_list')
 
 
-class EmployeeExportView(ProtectedView, View):
-    def get(self, request, *args, **kwargs):
-        response = HttpResponse(content_type='text/csv; charset=utf-8')
-        response['Content-Disposition'] = 'attachment; filename="employees.csv"'
-        writer = csv.writer(response)
-        writer.writerow(['ФИО', 'Телефон', 'Гостиница', 'Должности'])
-        for emp in Employee.objects.select_related('building').prefetch_related('positions').all():
+class EmployeeExportView(ProtectedView, CSVExportMixin, View):
+    model = Employee
+    filename = 'employees.csv'
+    building_field = 'building'
+
+    def get_header(self):
+        return ['ФИО', 'Телефон', 'Гостиница', 'Должности']
+
+    def get_rows(self, filters):
+        # Должности — связь многие-ко-многим, в values_list их не собрать;
+        # iterator с prefetch_related подгружает их отдельно для каждой порции
+        queryset = filters.apply(
+            Employee.objects.select_related('building').prefetch_related('positions').order_by('pk'),
+            building_field=self.building_field,
+        )
+        for emp in queryset.iterator(chunk_size=self.chunk_size):
             fio = f"{emp.last_name} {emp.first_name} {emp.middle_name}"
             positions = ', '.join(p.name for p in emp.positions.all())
-            writer.writerow([fio, emp.phone, emp.building.name, positions])
-        return response
+            yield [fio, emp.phone, emp.building.name, positions]
 
 
 # === Должности ===
-class PositionListView(ProtectedView, ListView):
+class PositionListView(ProtectedView, CachedPageMixin, ListView):
     model = Position
+    cache_models = (Position,)
     template_name = 'hotel/position_list.html'
     paginate_by = 20
 
@@ -543,13 +755,15 @@ class PositionUpdateView(ProtectedView, UpdateView):
 
 class PositionDeleteView(ProtectedView, DeleteView):
     model = Position
-    template_name = 'hotel/position_confirm_delete.html'
+    template_name = 'hotel/instant_delete.html'
     success_url = reverse_lazy('position_list')
 
 
 # === Гостиницы ===
-class BuildingListView(ProtectedView, ListView):
+class BuildingListView(ProtectedView, CachedPageMixin, ListView):
     model = Building
+    cache_models = (Building, Address)
+    queryset = Building.objects.select_related('address')
     template_name = 'hotel/building_list.html'
     context_object_name = 'buildings'
 
@@ -575,8 +789,9 @@ class BuildingDeleteView(ProtectedView, DeleteView):
 
 
 # === Адреса ===
-class AddressListView(ProtectedView, ListView):
+class AddressListView(ProtectedView, CachedPageMixin, ListView):
     model = Address
+    cache_models = (Address,)
     template_name = 'hotel/address_list.html'
     context_object_name = 'addresses'
 
@@ -602,28 +817,39 @@ class AddressDeleteView(ProtectedView, DeleteView):
 
 
 # === Аналитика ===
+def analytics_queries(today):
+    period_start = today - timezone.timedelta(days=30)
+
+    # Читаем готовую сводку по дням вместо платежей и броней
+    stats = DailyStat.objects.filter(day__gte=period_start)
+    return {
+        'total_rooms': Room.objects.count,
+        'occupied': lambda: stats.filter(day=today).aggregate(total=Sum('occupied_nights'))['total'] or 0,
+        'monthly_revenue': lambda: stats.aggregate(total=Sum('revenue'))['total'] or 0,
+        'daily_payments': lambda: list(
+            stats.exclude(revenue=0).values('day').annotate(sum=Sum('revenue')).order_by('day')
+        ),
+    }
+
+
+def analytics_context(results):
+    total_rooms, occupied = results['total_rooms'], results['occupied']
+    return {
+        'occupancy_rate': round(occupied / total_rooms * 100, 2) if total_rooms else 0,
+        'monthly_revenue': results['monthly_revenue'],
+        'daily_payments': results['daily_payments'],
+        'daily_labels': [row['day'] for row in results['daily_payments']],
+        'daily_sums': [row['sum'] for row in results['daily_payments']],
+    }
+
+
 class AnalyticsDashboardView(ProtectedView, TemplateView):
     template_name = 'hotel/analytics.html'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         today = timezone.now().date()
-        period_start = today - timezone.timedelta(days=30)
-
-        total_rooms = Room.objects.count()
-        occupied = Booking.objects.filter(
-            status__in=['Подтвержден', 'Оплачен'],
-            checkin_date__lte=today,
-            checkout_date__gt=today
-        ).count()
-        context['occupancy_rate'] = round(occupied / total_rooms * 100, 2) if total_rooms else 0
-
-        payments = Payment.objects.filter(payment_date__gte=period_start)
-        context['monthly_revenue'] = payments.aggregate(total=Sum('amount'))['total'] or 0
-
-        daily = payments.annotate(day=TruncDay('payment_date')).values('day') \
-            .annotate(sum=Sum('amount')).order_by('day')
-        context['daily_payments'] = list(daily)
+        context.update(analytics_context(run_in_order(analytics_queries(today))))
         return context
 
 
@@ -633,40 +859,184 @@ class DashboardView(ProtectedView, TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        today = timezone.localdate()
-        week_ago = today - datetime.timedelta(days=7)
-
-        context['active_bookings_count'] = Booking.objects.filter(
-            status__in=['Подтвержден', 'Оплачен']
-        ).count()
-        context['free_rooms_count'] = Room.objects.filter(status='Свободен').count()
-        context['checked_in_today_count'] = Accommodation.objects.filter(
-            actual_checkin_date=today
-        ).count()
-        context['weekly_revenue'] = Booking.objects.filter(
-            status__in=['Оплачен', 'Завершен'],
-            created_at__date__gte=week_ago
-        ).aggregate(total=Sum('total_price'))['total'] or 0
-        context['upcoming_bookings'] = Booking.objects.filter(
-            status='Подтвержден',
-            checkin_date__gte=today
-        ).order_by('checkin_date')[:5]
+        context.update(get_dashboard_counters())
         return context
 
 
+# === Асинхронные панели ===
+# Те же страницы, но независимые запросы выполняются параллельно
+# (см. aggregates.py). Маршруты панели и аналитики ведут сюда; под WSGI
+# Django запускает их в собственном цикле событий.
+class AsyncProtectedView(View):
+    login_url = '/accounts/login/'
+
+    async def dispatch(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path(), self.login_url)
+        # Шаблон читает request.user синхронно: отдаём уже загруженного
+        request.user = user
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncAnalyticsDashboardView(AsyncProtectedView, TemplateView):
+    template_name = 'hotel/analytics.html'
+
+    async def get(self, request, *args, **kwargs):
+        context = self.get_context_data(**kwargs)
+        today = timezone.now().date()
+        context.update(analytics_context(await gather_aggregates(analytics_queries(today))))
+        return self.render_to_response(context)
+
+
+class AsyncDashboardView(AsyncProtectedView, TemplateView):
+    template_name = 'hotel/dashboard.html'
+
+    async def get(self, request, *args, **kwargs):
+        context = self.get_context_data(**kwargs)
+        context.update(await aget_dashboard_counters())
+        return self.render_to_response(context)
+
+
+# === JSON API ===
+class ApiProtectedView(ProtectedView):
+    # Клиенты API получают 403, а не перенаправление на форму входа
+    raise_exception = True
+
+
+class RoomApiView(ApiProtectedView, ApiListView):
+    model = Room
+    keyset_fields = ('id',)
+    building_field = 'building_id'
+    status_choices = Room.Status
+    fields = {
+        'id': 'id',
+        'room_number': 'room_number',
+        'status': 'status',
+        'building_id': 'building_id',
+        'building_name': 'building__name',
+        'room_type_id': 'room_type_id',
+        'room_type_name': 'room_type__name',
+        'price_per_night': 'room_type__price_per_night',
+    }
+    version_models = (Room, Building, RoomType)
+
+
+class BookingApiView(ApiProtectedView, ApiListView):
+    model = Booking
+    keyset_fields = ('created_at', 'id')
+    date_field = 'checkin_date'
+    building_field = 'room__building_id'
+    status_choices = Booking.Status
+    # Только собственные поля брони: их изменение отражается в updated_at
+    fields = {
+        'id': 'id',
+        'client_id': 'client_id',
+        'room_id': 'room_id',
+        'status': 'status',
+        'checkin_date': 'checkin_date',
+        'checkout_date': 'checkout_date',
+        'total_price': 'total_price',
+        'charges': 'charges',
+        'paid': 'paid',
+        'outstanding': 'outstanding',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+    }
+
+    def get_queryset(self):
+        return Booking.objects.order_by()
+
+    def get_validators(self, queryset):
+        # Число строк ловит удаления, которых не видно по updated_at
+        state = queryset.aggregate(last=Max('updated_at'), count=Count('id'))
+        return [state['last'], state['count']], state['last']
+
+
+class PaymentApiView(ApiProtectedView, ApiListView):
+    model = Payment
+    keyset_fields = ('payment_date', 'id')
+    date_field = 'payment_date'
+    building_field = 'booking__room__building_id'
+    status_choices = Payment.Status
+    fields = {
+        'id': 'id',
+        'booking_id': 'booking_id',
+        'amount': 'amount',
+        'payment_date': 'payment_date',
+        'payment_method': 'payment_method',
+        'status': 'status',
+    }
+    version_models = (Payment,)
+
+
+# === Лента изменений ===
+class ChangeFeedView(AsyncProtectedView):
+    # Длинный опрос: ответ сразу, если после since уже есть события,
+    # иначе при первом новом событии или по истечении timeout
+    async def get(self, request, *args, **kwargs):
+        try:
+            since, building, timeout = parse_feed_params(request.GET, CHANGES_MAX_WAIT)
+        except ValueError:
+            return JsonResponse({'status': 'error', 'message': 'Неверные параметры ленты'}, status=400)
+        if since is None:
+            # Первый запрос: клиент узнаёт, с какого номера ждать
+            return JsonResponse({'events': [], 'last_seq': await sync_to_async(get_last_seq)()})
+        events, last_seq = await sync_to_async(get_events)(since, building)
+        if not events and await get_notifier().wait(last_seq, timeout):
+            events, last_seq = await sync_to_async(get_events)(last_seq, building)
+        return JsonResponse({'events': events, 'last_seq': last_seq})
+
+
+class ChangeStreamView(AsyncProtectedView):
+    async def get(self, request, *args, **kwargs):
+        try:
+            since, building, timeout = parse_feed_params(
+                request.GET, CHANGES_STREAM_SECONDS, since=request.headers.get('Last-Event-ID'),
+            )
+        except ValueError:
+            return JsonResponse({'status': 'error', 'message': 'Неверные параметры ленты'}, status=400)
+        response = StreamingHttpResponse(stream_events(since, building, timeout), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Иначе nginx копит поток в буфере
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+# === Выбор гостиницы ===
+class BuildingSelectView(ProtectedView, View):
+    def post(self, request):
+        building = request.POST.get('building', '')
+        if building.isdigit() and int(building) in dict(get_buildings()):
+            request.session[BUILDING_SESSION_KEY] = int(building)
+        next_url = request.POST.get('next', '')
+        if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+            next_url = reverse('dashboard')
+        return redirect(next_url)
+
+
 # === Обновление доступности товаров ===
 @require_POST
 @login_required
 def update_availability(request):
     product_id = request.POST.get('product_id')
     is_available = request.POST.get('is_available') == 'true'
-    building = Building.objects.first()
+    building = request.building
+    if not building:
+        return JsonResponse({'status': 'error', 'message': 'Не выбрана гостиница'}, status=400)
     try:
         product = Product.objects.get(pk=product_id)
-        stock, created = BuildingProducts.objects.get_or_create(product=product, building=building)
+        stock, created = BuildingProducts.objects.get_or_create(product=product, building_id=building.pk)
         stock.is_available = is_available
-        stock.save()
+        # Только флаг: остаток ведёт журнал движений, прочитанное значение могло устареть
+        stock.save(update_fields=['is_available'])
         return JsonResponse({'status': 'success', 'is_available': is_available})
     except Product.DoesNotExist:
         return JsonResponse({'status': 'error', 'message': 'Product not found'}, status=404)
 
+
+# === Метрики Prometheus ===
+def metrics(request):
+    if not is_metrics_authorized(request):
+        raise PermissionDenied
+    return HttpResponse(render_metrics(metrics_registry.collect()), content_type=METRICS_CONTENT_TYPE)
@@ -38,11 +38,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'hotel.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'hotel.routing.ReplicaMiddleware',
+    'hotel.buildings.ActiveBuildingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 
@@ -55,13 +58,21 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [ BASE_DIR / 'templates' ],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Шаблоны компилируются один раз на процесс; при DEBUG кэш
+            # сбрасывается автоперезагрузкой при изменении файлов
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'hotel.buildings.active_building',
             ],
         },
     },
@@ -91,9 +102,84 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Сколько секунд ждать блокировку записи. Транзакции отложенные;
+            # брони открываются с BEGIN IMMEDIATE (hotel.reservations).
+            'timeout': 20,
+        },
     }
 }
 
+# Профиль production (HOTEL_DB_PROFILE=production): WAL-журнал, чтобы
+# чтение не ждало запись; synchronous=NORMAL (в режиме WAL база не
+# портится при сбое, теряются лишь последние транзакции до checkpoint);
+# отображение файла в память и кэш страниц на 64 МБ; соединение живёт
+# между запросами (CONN_MAX_AGE) и проверяется перед повторным использованием.
+SQLITE_PRODUCTION_PRAGMAS = ';'.join([
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA cache_size=-65536',
+    'PRAGMA busy_timeout=20000',
+    'PRAGMA temp_store=MEMORY',
+])
+
+if os.environ.get('HOTEL_DB_PROFILE') == 'production':
+    DATABASES['default']['OPTIONS']['init_command'] = SQLITE_PRODUCTION_PRAGMAS
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('HOTEL_DB_CONN_MAX_AGE', 600))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Реплики для чтения: HOTEL_DB_REPLICAS — список файлов SQLite через запятую
+# (локально их наполняет manage.py sync_replicas). Списки, аналитика и
+# экспорт читают с реплик, запись и чтение после POST — с основной базы.
+HOTEL_READ_REPLICAS = []
+for number, path in enumerate(filter(None, os.environ.get('HOTEL_DB_REPLICAS', '').split(',')), 1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': path.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    HOTEL_READ_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['hotel.routing.ReplicaRouter']
+
+# Потоков для параллельных агрегатов асинхронных панелей; 0 — запросы
+# по очереди (на одном ядре параллельность только добавляет переключения)
+HOTEL_AGGREGATE_WORKERS = int(os.environ.get('HOTEL_AGGREGATE_WORKERS', 4))
+
+
+# Cache
+# По умолчанию кэш в памяти процесса. При нескольких воркерах укажите
+# HOTEL_CACHE_DIR, чтобы сброс счётчиков был виден всем процессам; без
+# него счётчики панели кэшируются лишь на 30 секунд (hotel.counters).
+
+if os.environ.get('HOTEL_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['HOTEL_CACHE_DIR'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'hotel',
+        }
+    }
+
+
+# Метрики запросов (/metrics)
+# Без каталога гистограммы видны только в своём процессе. Под gunicorn с
+# несколькими воркерами укажите HOTEL_METRICS_DIR — общий каталог, куда
+# процессы сбрасывают снимки; очищайте его при перезапуске сервиса.
+
+HOTEL_METRICS_DIR = os.environ.get('HOTEL_METRICS_DIR')
+# Токен сборщика метрик (Authorization: Bearer ...); без него /metrics
+# открыт только сотрудникам с is_staff
+HOTEL_METRICS_TOKEN = os.environ.get('HOTEL_METRICS_TOKEN', '')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators